@@ -0,0 +1,153 @@
+"""読み取り専用エンドポイントのレスポンスキャッシュ
+
+マスタ・統計・カタログはデータ更新（年2回のインポート）でしか変わらないので、
+レスポンスJSONをバイト列のままメモリに持ち、データバージョンが変わるまで使い回す。
+データバージョンは DATA_DATE とSQLiteファイルの stat から作るので、確認にSQLiteは触らない。
+
+    @cached_endpoint("kaigo_services", KaigoSessionLocal, model=List[KaigoServiceMasterOut])
+    def _kaigo_services(db):
+        return get_kaigo_services(db)
+
+    @router.get("/services", response_model=List[KaigoServiceMasterOut])
+    def kaigo_services(request: Request):
+        return cached_response(request, "kaigo_services")
+
+レスポンスには ETag / Cache-Control を付け、If-None-Match が一致すれば304を返す。
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Callable, Dict, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from .config import DATA_DATE, CACHE_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+# name → (build, session_factories, TypeAdapter or None, files)
+_builders: Dict[str, Tuple[Callable, tuple, object, tuple]] = {}
+
+# (name, params) → (version, body, etag)
+_entries: Dict[tuple, Tuple[str, bytes, str]] = {}
+
+
+def cached_endpoint(name: str, *session_factories, model=None, files=()):
+    """キャッシュ対象のレスポンス生成関数を登録するデコレータ
+
+    build(*sessions, **params) の戻り値は model（response_model と同じ型）で検証・整形する。
+    files に渡したパス（DB以外の生成物）の更新もデータバージョンに含める。
+    """
+    adapter = TypeAdapter(model) if model is not None else None
+
+    def decorator(build):
+        _builders[name] = (build, session_factories, adapter, tuple(files))
+        return build
+    return decorator
+
+
+def _file_version(engine) -> str:
+    """SQLiteファイル（とWAL）の更新時刻・サイズ。ファイルでなければ空文字"""
+    path = engine.url.database if engine.url.get_backend_name() == "sqlite" else None
+    if not path or path == ":memory:":
+        return ""
+    return "/".join(filter(None, (_path_version(p) for p in (path, path + "-wal"))))
+
+
+def _path_version(path) -> str:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ""
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def engine_version(engine) -> str:
+    """1つのDBのデータバージョン（DATA_DATE + ファイルstat）"""
+    return f"{DATA_DATE}|{_file_version(engine)}"
+
+
+def source_version(engine) -> str:
+    """ファイルに書き出すインデックスの元データの版（DATA_DATE + DBファイルのstat + WALのサイズ）
+
+    WAL の更新時刻は接続のたびに変わるので含めない（書き込みがあればサイズが変わる）。
+    """
+    path = engine.url.database if engine.url.get_backend_name() == "sqlite" else None
+    if not path or path == ":memory:":
+        return ""
+    try:
+        wal = os.stat(path + "-wal").st_size
+    except OSError:
+        wal = 0
+    return f"{DATA_DATE}|{_path_version(path)}|{wal}"
+
+
+def data_version(session_factories, files=()) -> str:
+    return "|".join(
+        [DATA_DATE]
+        + [_file_version(f.kw["bind"]) for f in session_factories]
+        + [_path_version(p) for p in files]
+    )
+
+
+def _build(name: str, params: tuple, version: str) -> Tuple[str, bytes, str]:
+    build, factories, adapter, _ = _builders[name]
+    sessions = [f() for f in factories]
+    try:
+        result = build(*sessions, **dict(params))
+    finally:
+        for s in sessions:
+            s.close()
+    if adapter is not None:
+        content = adapter.dump_python(adapter.validate_python(result, from_attributes=True), mode="json")
+    else:
+        content = jsonable_encoder(result)
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    entry = (version, body, etag)
+    _entries[(name, params)] = entry
+    return entry
+
+
+def get_entry(name: str, **params) -> Tuple[str, bytes, str]:
+    """(version, body, etag)。未生成・データ更新後なら作り直す"""
+    key = tuple(sorted(params.items()))
+    _, factories, _, files = _builders[name]
+    version = data_version(factories, files)
+    entry = _entries.get((name, key))
+    if entry is None or entry[0] != version:
+        entry = _build(name, key, version)
+    return entry
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def cached_response(request: Request, name: str, **params) -> Response:
+    """キャッシュ済みJSONを返す（If-None-Match一致なら304）"""
+    _, body, etag = get_entry(name, **params)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={CACHE_MAX_AGE}"}
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def preload() -> int:
+    """登録済みレスポンスをパラメータなしで全て生成（起動時用）。生成数を返す"""
+    count = 0
+    for name in list(_builders):
+        try:
+            get_entry(name)
+            count += 1
+        except Exception as e:
+            logger.warning(f"Cache preload failed for {name} (non-fatal): {e}")
+    return count
+
+
+def clear():
+    _entries.clear()
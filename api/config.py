@@ -9,6 +9,18 @@ DATABASE_URL = os.getenv(
     f"sqlite:///{BASE_DIR / 'data' / 'medical.db'}"
 )
 
+# SQLite の接続プロファイル（医療・介護の両DBに適用）
+#   default    WAL・外部キーのみ（インポート・スクリプト用）
+#   read       読み取り専用の配信用: mmap / 大きめのページキャッシュ / 一時表をメモリに / query_only
+#   immutable  read ＋ ?immutable=1 で開く（ロック・変更検知なし。配信中にDBファイルを書き換えない運用のみ）
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default")
+SQLITE_PROFILES = ("default", "read", "immutable")
+if SQLITE_PROFILE not in SQLITE_PROFILES:
+    raise ValueError(f"SQLITE_PROFILE は {' / '.join(SQLITE_PROFILES)} のいずれかです: {SQLITE_PROFILE}")
+SQLITE_READ_ONLY = SQLITE_PROFILE != "default"
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(1024 * 1024 * 1024)))   # バイト（DBより大きければ全体）
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", str(64 * 1024)))              # 接続ごとのページキャッシュ
+
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
 DATA_DATE = os.getenv("DATA_DATE", "20251201")
@@ -17,3 +29,25 @@ KAIGO_DATABASE_URL = os.getenv(
     "KAIGO_DATABASE_URL",
     f"sqlite:///{BASE_DIR / 'data' / 'kaigo.db'}"
 )
+
+# 高速JSONレスポンス（Pydantic再検証をスキップ、orjsonがあれば使用）
+# "all" で全ルーター、"facilities,kaigo" のようにルーター単位でも指定可
+FAST_JSON = os.getenv("FAST_JSON", "")
+
+# マスタ・統計・カタログのレスポンスに付ける Cache-Control max-age（秒）
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "3600"))
+
+# ベクトルタイル（MBTiles）。scripts/build_tiles.py で生成
+TILES_PATH = Path(os.getenv("TILES_PATH", str(BASE_DIR / "data" / "tiles.mbtiles")))
+
+# 分析用の列指向スナップショット（Parquet + manifest.json）。scripts/build_snapshots.py で生成
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", str(BASE_DIR / "data" / "snapshots")))
+
+# ビットマップインデックス（ID・座標・属性値・診療時間）のフラットファイル。各ワーカーが mmap で共有する
+# インポート時（scripts/build_indexes.py）に生成。無い・古い場合は SQLite から作る
+INDEX_DIR = Path(os.getenv("INDEX_DIR", str(BASE_DIR / "data" / "index")))
+
+# 1kmメッシュのカバレッジ分析結果（データ公開日ごとのJSON）。scripts/build_coverage.py で一括生成
+COVERAGE_DIR = Path(os.getenv("COVERAGE_DIR", str(BASE_DIR / "data" / "coverage")))
+# 計算に使うプロセス数（0 は CPU数）
+COVERAGE_WORKERS = int(os.getenv("COVERAGE_WORKERS", "0"))
@@ -1,24 +1,63 @@
 """DB接続・セッション管理"""
+import sqlite3
+from urllib.parse import quote
+
 from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
-from .config import DATABASE_URL, KAIGO_DATABASE_URL
+from .config import (
+    DATABASE_URL, KAIGO_DATABASE_URL, SQLITE_PROFILE, SQLITE_MMAP_SIZE, SQLITE_CACHE_KB,
+)
 
-# --- 医療DB ---
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args["check_same_thread"] = False
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args, echo=False)
+def make_engine(url: str, profile: str = SQLITE_PROFILE):
+    """SQLite なら接続プロファイル（config.SQLITE_PROFILE）の PRAGMA を接続ごとに設定したエンジン"""
+    if not url.startswith("sqlite"):
+        return create_engine(url, echo=False)
+
+    options = {}
+    path = make_url(url).database
+    if profile == "immutable" and path and path != ":memory:":
+        # URL はそのまま（engine.url.database でファイルの版を見るため）、接続だけ URI で開く
+        uri = f"file:{quote(path)}?immutable=1"
+        options["creator"] = lambda: sqlite3.connect(uri, uri=True, check_same_thread=False)
+    engine = create_engine(url, connect_args={"check_same_thread": False}, echo=False, **options)
 
-if DATABASE_URL.startswith("sqlite"):
     @event.listens_for(engine, "connect")
     def set_sqlite_pragma(dbapi_conn, connection_record):
         cursor = dbapi_conn.cursor()
-        cursor.execute("PRAGMA journal_mode=WAL")
         cursor.execute("PRAGMA foreign_keys=ON")
+        if profile == "default":
+            cursor.execute("PRAGMA journal_mode=WAL")
+        else:
+            # 読み取り専用: ファイルをページキャッシュ越しに直接読み、ソート・一時表はメモリで行う
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA query_only=ON")
         cursor.close()
 
+    return engine
+
+
+def checkpoint(engine) -> bool:
+    """WAL を本体に書き戻して空にする（書き戻せなければ False）
+
+    読みかけの結果を持ったままプールに戻った接続があると TRUNCATE が busy になるので、
+    プールの接続を閉じてから新しい接続で行う。
+    """
+    if engine.url.get_backend_name() != "sqlite":
+        return True
+    engine.dispose()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        busy = conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").one()[0]
+    return not busy
+
+
+# --- 医療DB ---
+engine = make_engine(DATABASE_URL)
+
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 
@@ -36,19 +75,7 @@ def get_db():
 
 
 # --- 介護DB ---
-kaigo_connect_args = {}
-if KAIGO_DATABASE_URL.startswith("sqlite"):
-    kaigo_connect_args["check_same_thread"] = False
-
-kaigo_engine = create_engine(KAIGO_DATABASE_URL, connect_args=kaigo_connect_args, echo=False)
-
-if KAIGO_DATABASE_URL.startswith("sqlite"):
-    @event.listens_for(kaigo_engine, "connect")
-    def set_kaigo_sqlite_pragma(dbapi_conn, connection_record):
-        cursor = dbapi_conn.cursor()
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.execute("PRAGMA foreign_keys=ON")
-        cursor.close()
+kaigo_engine = make_engine(KAIGO_DATABASE_URL)
 
 KaigoSessionLocal = sessionmaker(bind=kaigo_engine, autocommit=False, autoflush=False)
 
@@ -0,0 +1,37 @@
+"""高速JSONレスポンス — 一覧系エンドポイントのPydantic再検証をスキップする
+
+通常の経路: 行ごとに FacilityListOut を生成 → FastAPIが response_model で再検証 →
+jsonable_encoder → 標準json。FAST_JSON を有効にしたルーターでは、行から組み立てたdictを
+FastJSONResponse で直接bytesにする。response_model はそのまま残すのでOpenAPIスキーマは変わらない。
+"""
+import json
+
+from fastapi.responses import Response
+
+from .config import FAST_JSON
+
+try:
+    import orjson
+except ImportError:  # 任意依存
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def fast_json_enabled(router_name: str) -> bool:
+    """FAST_JSON=all または ルーター名を含む場合にTrue"""
+    names = {n.strip() for n in FAST_JSON.split(",") if n.strip()}
+    return "all" in names or router_name in names
@@ -1,6 +1,6 @@
 """介護事業所 SQLAlchemy モデル定義"""
 from datetime import datetime
-from sqlalchemy import Column, String, Text, Integer, Float, DateTime, Index
+from sqlalchemy import Column, String, Text, Integer, Float, Boolean, DateTime, Index, LargeBinary
 from .database import KaigoBase
 
 
@@ -26,6 +26,7 @@ class KaigoFacility(KaigoBase):
     corporate_number = Column(String(13), index=True)
     corporate_name = Column(Text)
     available_days = Column(Text)  # JSON
+    available_days_mask = Column(Integer)  # mon=1, tue=2, ... sun=64, holiday=128
     available_days_note = Column(Text)
     capacity = Column(Integer)
     website_url = Column(Text)
@@ -40,6 +41,7 @@ class KaigoFacility(KaigoBase):
     __table_args__ = (
         Index("idx_kaigo_latlng", "latitude", "longitude"),
         Index("idx_kaigo_pref_city", "prefecture_code", "city_code"),
+        Index("idx_kaigo_available_days", "available_days_mask"),
     )
 
 
@@ -50,3 +52,20 @@ class KaigoServiceMaster(KaigoBase):
     code = Column(String(5), primary_key=True)
     name = Column(Text, nullable=False)
     category = Column(Text)
+
+
+class KaigoDocument(KaigoBase):
+    """事業所詳細レスポンスの事前レンダリング済みJSON（事業所番号単位）"""
+    __tablename__ = "kaigo_documents"
+
+    id = Column(String(10), primary_key=True)
+    body = Column(LargeBinary, nullable=False)   # /kaigo/{id} のレスポンスそのもの
+
+
+class KaigoDocumentVersion(KaigoBase):
+    """事前レンダリング済みドキュメントの版（models.DocumentVersion と同じ形）"""
+    __tablename__ = "document_versions"
+
+    name = Column(String(40), primary_key=True)
+    version = Column(Text, nullable=False)
+    compressed = Column(Boolean, nullable=False, default=False)
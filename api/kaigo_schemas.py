@@ -1,6 +1,12 @@
 """介護事業所 Pydantic スキーマ定義"""
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from .schemas import FacetOut, LineQuery, PolygonQuery
+from .services.kaigo_search import DAY_BITS
+
+_DAY = "|".join(DAY_BITS)
+AVAILABLE_DAY_PATTERN = rf"^({_DAY})(,({_DAY}))*$"
 
 
 class KaigoFacilityListOut(BaseModel):
@@ -76,6 +82,7 @@ class PaginationOut(BaseModel):
 class KaigoListResponse(BaseModel):
     data: List[KaigoFacilityListOut]
     pagination: PaginationOut
+    facets: Optional[Dict[str, List[FacetOut]]] = None
 
 
 class KaigoStatsOut(BaseModel):
@@ -84,3 +91,30 @@ class KaigoStatsOut(BaseModel):
     by_service: Dict[str, int]
     by_category: Dict[str, int]
     by_prefecture: Dict[str, int]
+
+
+class KaigoShapeFilters(BaseModel):
+    """/kaigo/within・/kaigo/along の絞り込み（/kaigo と同じ）"""
+    q: Optional[str] = Field(None, description="フリーワード（名称・住所）")
+    service: Optional[str] = Field(None, description="サービス種別名・カテゴリ（訪問系など）またはコード")
+    prefecture: Optional[str] = Field(None, description="都道府県コード (01-47)")
+    city: Optional[str] = Field(None, description="市区町村コード")
+    corporate_number: Optional[str] = Field(None, description="法人番号")
+    available_day: Optional[str] = Field(
+        None, pattern=AVAILABLE_DAY_PATTERN,
+        description="利用可能曜日（カンマ区切りで全曜日を満たすもの）",
+    )
+
+    def filters(self) -> dict:
+        return dict(
+            q=self.q, service=self.service, prefecture=self.prefecture, city=self.city,
+            corporate_number=self.corporate_number, available_day=self.available_day,
+        )
+
+
+class KaigoWithinRequest(KaigoShapeFilters, PolygonQuery):
+    pass
+
+
+class KaigoAlongRequest(KaigoShapeFilters, LineQuery):
+    pass
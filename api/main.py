@@ -10,17 +10,50 @@ from fastapi.responses import FileResponse
 from .routes.facilities import router as facilities_router
 from .routes.catalog import router as catalog_router
 from .routes.kaigo import router as kaigo_router
-from .database import SessionLocal
+from .routes.nearby import router as nearby_router
+from .routes.map import router as map_router
+from .routes.tiles import router as tiles_router
+from .routes.export import router as export_router
+from .routes.analytics import router as analytics_router
+from .config import SQLITE_PROFILE, SQLITE_READ_ONLY
+from .database import SessionLocal, KaigoSessionLocal
+from .services.spatial import get_spatial_index
+from .services.bitmap_index import get_facility_bitmap_index, get_kaigo_bitmap_index
+from .services.open_now_set import start_refresher, stop_refresher
+from .services.clusters import get_facility_clusters, get_kaigo_clusters
 from .services.fts import create_fts_table, rebuild_fts_index, IS_SQLITE
+from .services.kaigo_search import ensure_available_days_mask
+from .services.calendar import ensure_packed_schedules
+from . import cache
+from .services.documents import (
+    build_facility_documents, build_kaigo_documents,
+    facility_documents_stale, kaigo_documents_stale,
+)
 
 logger = logging.getLogger(__name__)
 
 STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """起動時にFTS5インデックスを確認・構築"""
+def _ensure_documents(session_factory, is_stale, build, label):
+    """事前レンダリング済み詳細JSONが未生成・元データと不一致なら再構築"""
+    db = session_factory()
+    try:
+        if is_stale(db):
+            logger.info(f"Documents: building {label} documents...")
+            count = build(db)
+            logger.info(f"Documents: Rendered {count:,} {label} documents")
+        else:
+            logger.info(f"Documents: {label} documents up to date")
+    except Exception as e:
+        logger.warning(f"Documents init failed for {label} (non-fatal): {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def _prepare_databases():
+    """FTS5インデックス・診療時間のパック表現・介護の曜日マスク列・詳細ドキュメントを確認し、無い・古ければ作る（DBに書き込む）"""
     if IS_SQLITE:
         db = SessionLocal()
         try:
@@ -47,7 +80,68 @@ async def lifespan(app: FastAPI):
             logger.warning(f"FTS5 init failed (non-fatal): {e}")
         finally:
             db.close()
+
+        db = SessionLocal()
+        try:
+            filled = ensure_packed_schedules(db)
+            if filled:
+                logger.info(f"Schedules: Packed {filled:,} schedule rows")
+        except Exception as e:
+            logger.warning(f"Schedule packing migration failed (non-fatal): {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+        db = KaigoSessionLocal()
+        try:
+            if ensure_available_days_mask(db):
+                logger.info("Kaigo: Added available_days_mask column")
+        except Exception as e:
+            logger.warning(f"Kaigo available_days_mask migration failed (non-fatal): {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    _ensure_documents(SessionLocal, facility_documents_stale, build_facility_documents, "facility")
+    _ensure_documents(KaigoSessionLocal, kaigo_documents_stale, build_kaigo_documents, "kaigo")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動時にFTS5インデックス・詳細ドキュメントを確認・構築し、レスポンスキャッシュを生成
+
+    読み取り専用の接続プロファイル（SQLITE_PROFILE=read / immutable）では DB に書き込む確認は行わない
+    （インポート時に作ってあるものをそのまま使う）。
+    open_now 用の診療中の施設の集合は、停止までバックグラウンドスレッドで更新し続ける
+    """
+    if SQLITE_READ_ONLY:
+        logger.info(f"SQLite: {SQLITE_PROFILE} profile, skipping FTS5 / document checks")
+    else:
+        _prepare_databases()
+
+    # マスタ・統計・カタログを先に生成しておく（初回リクエストでもSQLiteに触れない）
+    logger.info(f"Cache: Preloaded {cache.preload()} responses")
+
+    # 空間インデックス・ビットマップインデックス・地図クラスタ（メモリ上）
+    for session_factory, build in (
+        (SessionLocal, get_spatial_index),
+        (SessionLocal, get_facility_bitmap_index),
+        (KaigoSessionLocal, get_kaigo_bitmap_index),
+        (SessionLocal, get_facility_clusters),
+        (KaigoSessionLocal, get_kaigo_clusters),
+    ):
+        db = session_factory()
+        try:
+            build(db)
+        except Exception as e:
+            logger.warning(f"{build.__name__} failed (non-fatal): {e}")
+        finally:
+            db.close()
+
+    # 診療中の施設の集合を診療時間の境界ごとに作り直す
+    start_refresher(SessionLocal)
     yield
+    stop_refresher()
 
 
 app = FastAPI(
@@ -71,6 +165,11 @@ app.add_middleware(
 app.include_router(facilities_router)
 app.include_router(catalog_router)
 app.include_router(kaigo_router)
+app.include_router(nearby_router)
+app.include_router(map_router)
+app.include_router(tiles_router)
+app.include_router(export_router)
+app.include_router(analytics_router)
 
 
 @app.get("/")
@@ -2,7 +2,7 @@
 from datetime import datetime, date
 from sqlalchemy import (
     Column, String, Text, SmallInteger, Integer, Float, Boolean,
-    Date, DateTime, ForeignKey, JSON, Index
+    Date, DateTime, ForeignKey, JSON, Index, LargeBinary
 )
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -60,7 +60,6 @@ class Facility(Base):
     closed_weekly = Column(JSON)      # {"mon":true,"tue":false,...}
     closed_weeks = Column(JSON)       # {"week1":{"mon":true,...},...}
     corporate_number = Column(String(13), index=True)  # 法人番号（13桁）
-    raw_data = Column(JSON)           # 種別固有の全カラム
     data_date = Column(Date)          # データ基準日
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -84,10 +83,12 @@ class Specialty(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     facility_id = Column(String(13), ForeignKey("facilities.id"), nullable=False, index=True)
     specialty_code = Column(String(10), index=True)
-    specialty_name = Column(Text, nullable=False)
+    specialty_name = Column(Text)   # コンパクト版ではマスタと同名ならNULL
     time_slot = Column(String(10))  # 診療時間帯
-    schedule = Column(JSON, nullable=False)    # 曜日別診療時間
-    reception = Column(JSON)                    # 曜日別受付時間
+    schedule = Column(JSON)         # 曜日別診療時間（コンパクト版ではNULL）
+    reception = Column(JSON)        # 曜日別受付時間（コンパクト版ではNULL）
+    schedule_packed = Column(LargeBinary)   # services/schedule.py のパック表現（カレンダー・open_now が読む）
+    reception_packed = Column(LargeBinary)
 
     facility = relationship("Facility", back_populates="specialities")
 
@@ -121,6 +122,24 @@ class BusinessHour(Base):
     facility_id = Column(String(13), ForeignKey("facilities.id"), nullable=False, index=True)
     slot_number = Column(SmallInteger, nullable=False)  # 1-4
     hour_type = Column(String(20), nullable=False)      # "business" / "reception"
-    schedule = Column(JSON, nullable=False)              # 曜日別の開始/終了時間
+    schedule = Column(JSON)                              # 曜日別の開始/終了時間
+    schedule_packed = Column(LargeBinary)                # パック表現（カレンダー・open_now が読む）
 
     facility = relationship("Facility", back_populates="business_hours")
+
+
+class FacilityDocument(Base):
+    """施設詳細レスポンスの事前レンダリング済みJSON（インポート時に生成）"""
+    __tablename__ = "facility_documents"
+
+    id = Column(String(13), primary_key=True)
+    body = Column(LargeBinary, nullable=False)   # /facilities/{id} のレスポンスそのもの
+
+
+class DocumentVersion(Base):
+    """事前レンダリング済みドキュメントの版（起動時に作り直すかの判定に使う）"""
+    __tablename__ = "document_versions"
+
+    name = Column(String(40), primary_key=True)   # ドキュメントのテーブル名
+    version = Column(Text, nullable=False)         # DATA_DATE|レンダリングの版|元の件数
+    compressed = Column(Boolean, nullable=False, default=False)   # body を zlib で圧縮したか
@@ -0,0 +1,19 @@
+"""横断近隣検索 Pydantic スキーマ定義"""
+from typing import Annotated, Literal, Union
+from pydantic import Field
+
+from .schemas import FacilityListOut
+from .kaigo_schemas import KaigoFacilityListOut
+
+
+class NearbyMedicalOut(FacilityListOut):
+    """医療施設（kind="medical"）"""
+    kind: Literal["medical"] = "medical"
+
+
+class NearbyKaigoOut(KaigoFacilityListOut):
+    """介護事業所（kind="kaigo"）"""
+    kind: Literal["kaigo"] = "kaigo"
+
+
+NearbyOut = Annotated[Union[NearbyMedicalOut, NearbyKaigoOut], Field(discriminator="kind")]
@@ -0,0 +1,35 @@
+"""分析エンドポイント"""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..config import CACHE_MAX_AGE
+from ..database import get_db
+from ..fastjson import FastJSONResponse
+from ..schemas import CoverageOut
+from ..services.coverage import get_coverage, resolve_specialty
+from ..services.search import get_prefecture_names
+
+router = APIRouter(prefix="/api/v1/analytics", tags=["analytics"])
+
+
+@router.get("/coverage", response_model=CoverageOut)
+def coverage(
+    prefecture: str = Query(..., pattern=r"^\d{2}$", description="都道府県コード (01-47)"),
+    specialty: Optional[str] = Query(None, description="最寄り病院をこの診療科（マスタのコード・名称、または1つに決まる名称の一部）のある病院に限る"),
+    db: Session = Depends(get_db),
+):
+    """都道府県内の1kmメッシュ（3次メッシュ）ごとの最寄り病院までの距離と2km以内の薬局数
+
+    データ公開日ごとに保存した結果を返す（未計算なら計算して保存するので、初回は数秒〜数十秒かかる）。
+    """
+    if prefecture not in get_prefecture_names(db):
+        raise HTTPException(status_code=404, detail="都道府県が見つかりません")
+    code = None
+    if specialty:
+        try:
+            code = resolve_specialty(db, specialty)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    result = get_coverage(db, prefecture, code)
+    return FastJSONResponse(result, headers={"Cache-Control": f"public, max-age={CACHE_MAX_AGE}"})
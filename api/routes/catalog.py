@@ -1,10 +1,14 @@
 """DCAT カタログエンドポイント — データスペース連携用メタデータ"""
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from ..database import get_db, get_kaigo_db
+from ..config import SNAPSHOT_DIR
+from ..database import SessionLocal, KaigoSessionLocal
 from ..models import Facility
+from ..cache import cached_endpoint, cached_response
+from ..services.snapshots import load_manifest, snapshot_path, MANIFEST_NAME, PARQUET_MEDIA_TYPE
 
 router = APIRouter(tags=["catalog"])
 
@@ -12,8 +16,36 @@ BASE_URL = "https://mods.bon-soleil.com"
 
 
 @router.get("/api/v1/catalog")
-def dcat_catalog(db: Session = Depends(get_db), kaigo_db: Session = Depends(get_kaigo_db)):
+def dcat_catalog(request: Request):
     """DCAT-AP準拠のデータカタログ（JSON-LD）"""
+    return cached_response(request, "catalog")
+
+
+def _snapshot_distributions(manifest, names) -> list:
+    """manifest.json に載っているスナップショットを dcat:Distribution に"""
+    if manifest is None:
+        return []
+    return [
+        {
+            "@type": "dcat:Distribution",
+            "dcat:downloadURL": f"{BASE_URL}/api/v1/snapshots/{f['path']}",
+            "dcat:mediaType": f["media_type"],
+            "dct:format": "Parquet",
+            "dct:title": f"{f['name']} スナップショット（{f['rows']:,}行）",
+            "dct:issued": manifest["generated_at"],
+            "dcat:byteSize": f["bytes"],
+            "spdx:checksum": {
+                "@type": "spdx:Checksum",
+                "spdx:algorithm": "spdx:checksumAlgorithm_sha256",
+                "spdx:checksumValue": f["sha256"],
+            },
+        }
+        for f in manifest["files"] if f["name"] in names
+    ]
+
+
+@cached_endpoint("catalog", SessionLocal, KaigoSessionLocal, files=(SNAPSHOT_DIR / MANIFEST_NAME,))
+def _catalog(db: Session, kaigo_db: Session):
     total = db.query(func.count(Facility.id)).scalar()
     latest_date = db.query(func.max(Facility.data_date)).scalar()
 
@@ -24,12 +56,15 @@ def dcat_catalog(db: Session = Depends(get_db), kaigo_db: Session = Depends(get_
     except Exception:
         kaigo_total = 0
 
+    manifest = load_manifest()
+
     return {
         "@context": {
             "dcat": "http://www.w3.org/ns/dcat#",
             "dct": "http://purl.org/dc/terms/",
             "foaf": "http://xmlns.com/foaf/0.1/",
             "vcard": "http://www.w3.org/2006/vcard/ns#",
+            "spdx": "http://spdx.org/rdf/terms#",
         },
         "@type": "dcat:Catalog",
         "dct:title": "MODS — Medical Open Data Search",
@@ -67,6 +102,7 @@ def dcat_catalog(db: Session = Depends(get_db), kaigo_db: Session = Depends(get_
                         "dct:format": "application/json",
                         "dct:title": "OpenAPI仕様",
                     },
+                    *_snapshot_distributions(manifest, ("facilities", "specialities", "beds")),
                 ],
             },
             {
@@ -89,7 +125,25 @@ def dcat_catalog(db: Session = Depends(get_db), kaigo_db: Session = Depends(get_
                         "dct:format": "application/json",
                         "dct:title": "介護事業所近隣検索API",
                     },
+                    *_snapshot_distributions(manifest, ("kaigo",)),
                 ],
             },
         ],
     }
+
+
+@router.get("/api/v1/snapshots")
+def snapshot_manifest():
+    """列指向スナップショット（Parquet）の一覧・行数・チェックサム"""
+    manifest = load_manifest()
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="スナップショットが未生成です（scripts/build_snapshots.py）")
+    return manifest
+
+
+@router.get("/api/v1/snapshots/{name}", response_class=FileResponse)
+def snapshot_file(name: str):
+    path = snapshot_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="スナップショットが見つかりません")
+    return FileResponse(path, media_type=PARQUET_MEDIA_TYPE, filename=name)
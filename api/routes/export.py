@@ -0,0 +1,64 @@
+"""一括エクスポートエンドポイント"""
+from datetime import date
+from typing import Optional, List, Literal
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from ..database import SessionLocal, KaigoSessionLocal
+from ..services.export import export_facilities, export_kaigo, MEDIA_TYPES
+from .kaigo import AVAILABLE_DAY_PATTERN
+
+router = APIRouter(prefix="/api/v1", tags=["export"])
+
+
+def _stream(session_factory, export, fmt: str, gzip: bool, filters: dict):
+    # StreamingResponse は依存関係の後始末後も読み続けるので専用セッションを使う
+    db = session_factory()
+    try:
+        yield from export(db, fmt, gzip=gzip, **filters)
+    finally:
+        db.close()
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {
+        "description": "絞り込み結果の全件（ID順）。gzip=true のときは .gz の添付ファイル",
+        "content": {media_type: {} for media_type in MEDIA_TYPES.values()},
+    }},
+)
+def export(
+    dataset: Literal["facilities", "kaigo"] = Query("facilities", description="facilities: 医療施設 / kaigo: 介護事業所"),
+    format: Literal["ndjson", "csv", "geojson"] = Query("ndjson", description="出力形式"),
+    gzip: bool = Query(False, description="gzip圧縮して返す"),
+    q: Optional[str] = Query(None, description="フリーワード（名称・住所）"),
+    prefecture: Optional[str] = Query(None, description="都道府県コード (01-47)"),
+    city: Optional[str] = Query(None, description="市区町村コード"),
+    type: Optional[List[int]] = Query(None, description="医療: 施設種別"),
+    specialty: Optional[str] = Query(None, description="医療: 診療科名（部分一致）またはコード"),
+    service: Optional[str] = Query(None, description="介護: サービス種別名・カテゴリまたはコード"),
+    corporate_number: Optional[str] = Query(None, description="介護: 法人番号"),
+    available_day: Optional[str] = Query(None, pattern=AVAILABLE_DAY_PATTERN, description="介護: 利用可能曜日"),
+):
+    """/facilities・/kaigo と同じ絞り込みで全件をストリーミング出力する（ページングなし）"""
+    if dataset == "facilities":
+        filters = dict(q=q, facility_types=type, prefecture=prefecture, city=city, specialty=specialty)
+        body = _stream(SessionLocal, export_facilities, format, gzip, filters)
+    else:
+        filters = dict(
+            q=q, service=service, prefecture=prefecture, city=city,
+            corporate_number=corporate_number, available_day=available_day,
+        )
+        body = _stream(KaigoSessionLocal, export_kaigo, format, gzip, filters)
+
+    filename = f"{dataset}_{date.today():%Y%m%d}.{format}"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    else:
+        media_type = MEDIA_TYPES[format]
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,39 +1,54 @@
 """施設エンドポイント"""
 import json
 import math
-import time
-from typing import Optional, List
-from functools import lru_cache
-from fastapi import APIRouter, Depends, Query, HTTPException
+from datetime import datetime
+from typing import Dict, Optional, List
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..database import get_db, SessionLocal, engine
 from ..schemas import (
     FacilityListOut, FacilityDetailOut, FacilityListResponse,
-    PaginationOut, SpecialtyOut, BedOut, StatsOut,
-    PrefectureOut, SpecialtyMasterOut,
+    PaginationOut, StatsOut,
+    PrefectureOut, SpecialtyMasterOut, NearbyBatchRequest, NearestByTypeOut,
+    FacilityWithinRequest, FacilityAlongRequest, OPEN_WITHIN_MAX,
 )
 from ..services.search import (
-    search_facilities, search_nearby, get_facility_detail, get_stats,
-    FACILITY_TYPE_NAMES,
+    search_facilities, search_facilities_near, search_facilities_within, search_facilities_along,
+    search_nearby, get_facility_detail, get_stats,
+    get_specialty_names, get_prefecture_names, FACILITY_TYPE_NAMES,
 )
+from ..services.documents import get_facility_document, render_facility_detail
+from ..services.spatial import search_nearby_batch, search_nearest_by_type
+from ..services.geo import MAX_LAT, MAX_LNG, MIN_LAT, MIN_LNG
+from ..services.facets import facility_facets, parse_facets, FACILITY_FACETS
+from ..services.open_now_set import open_now_status
+from ..services.calendar import check_open_at
+from ..services.shapes import parse_lines, parse_polygons
 from ..models import Prefecture, SpecialtyMaster
+from ..fastjson import FastJSONResponse, fast_json_enabled, dumps
+from ..cache import cached_endpoint, cached_response, get_entry
+from .params import NEAR_RADIUS_MAX, near_requested
 
-# キャッシュ: 読み取り専用マスタデータ（TTL付き）
-_cache = {}
-CACHE_TTL = 3600  # 1時間
+router = APIRouter(prefix="/api/v1", tags=["facilities"])
 
+# FAST_JSON=all / facilities で一覧系をPydanticを通さず直接シリアライズ
+FAST_JSON = fast_json_enabled("facilities")
 
-def _cached(key, fn):
-    """シンプルなTTLキャッシュ"""
-    now = time.time()
-    if key in _cache and now - _cache[key][1] < CACHE_TTL:
-        return _cache[key][0]
-    result = fn()
-    _cache[key] = (result, now)
-    return result
+OPEN_AT_DESCRIPTION = "指定日時に診療中の施設のみ（ISO 8601。タイムゾーン省略時はJST、祝日・第n週の休診を考慮）"
+OPEN_WITHIN_DESCRIPTION = "open_at（省略時は現在）から指定分数後までのどこかで診療している施設のみ"
 
-router = APIRouter(prefix="/api/v1", tags=["facilities"])
+_FACET = "|".join(FACILITY_FACETS)
+FACETS_PATTERN = rf"^({_FACET})(,({_FACET}))*$"
+
+
+def _check_open_at(open_at: Optional[datetime]):
+    if open_at is not None:
+        try:
+            check_open_at(open_at)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
 
 
 def _facility_to_list(fac, distance_km=None) -> FacilityListOut:
@@ -53,6 +68,23 @@ def _facility_to_list(fac, distance_km=None) -> FacilityListOut:
     )
 
 
+def _facility_row(fac, pref_names: dict, distance_km=None) -> dict:
+    """高速経路用: FacilityListOut と同じキー順のdict"""
+    return {
+        "id": fac.id,
+        "facility_type": fac.facility_type,
+        "name": fac.name,
+        "prefecture_code": fac.prefecture_code,
+        "prefecture_name": pref_names.get(fac.prefecture_code),
+        "city_code": fac.city_code,
+        "address": fac.address,
+        "latitude": fac.latitude,
+        "longitude": fac.longitude,
+        "website_url": fac.website_url,
+        "distance_km": distance_km,
+    }
+
+
 @router.get("/facilities", response_model=FacilityListResponse)
 def list_facilities(
     q: Optional[str] = Query(None, description="フリーワード（名称・住所）"),
@@ -61,24 +93,56 @@ def list_facilities(
     city: Optional[str] = Query(None, description="市区町村コード"),
     specialty: Optional[str] = Query(None, description="診療科名（部分一致）またはコード"),
     open_now: bool = Query(False, description="現在診療中の施設のみ"),
+    open_at: Optional[datetime] = Query(None, description=OPEN_AT_DESCRIPTION),
+    open_within: Optional[int] = Query(None, ge=0, le=OPEN_WITHIN_MAX, description=OPEN_WITHIN_DESCRIPTION),
+    lat: Optional[float] = Query(None, ge=MIN_LAT, le=MAX_LAT, description="緯度（lng と併せて指定すると近い順、座標の無い施設は除く）"),
+    lng: Optional[float] = Query(None, ge=MIN_LNG, le=MAX_LNG, description="経度"),
+    radius: Optional[float] = Query(None, ge=0.1, le=NEAR_RADIUS_MAX, description="lat/lng からの半径 (km)。省略時は範囲を限らない"),
+    facets: Optional[str] = Query(
+        None, pattern=FACETS_PATTERN,
+        description="件数を集計するファセット（type,prefecture,city,specialty のカンマ区切り）",
+    ),
+    facet_limit: int = Query(50, ge=1, le=2000, description="ファセットごとの最大件数（件数の多い順）"),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db),
 ):
-    facilities, total = search_facilities(
-        db, q=q, facility_types=type,
-        prefecture=prefecture, city=city, specialty=specialty,
-        open_now=open_now, page=page, per_page=per_page,
+    near = near_requested(lat, lng, radius)
+    _check_open_at(open_at)
+    conditions = dict(
+        q=q, facility_types=type, prefecture=prefecture, city=city, specialty=specialty,
+        open_now=open_now, open_at=open_at, open_within=open_within,
     )
+    if near:
+        results, total = search_facilities_near(db, lat, lng, radius_km=radius, page=page, per_page=per_page, **conditions)
+    else:
+        facilities, total = search_facilities(db, page=page, per_page=per_page, **conditions)
+        results = [(f, None) for f in facilities]
+    facet_counts = None
+    if facets:
+        facet_counts = facility_facets(
+            db, parse_facets(facets), limit=facet_limit,
+            near=(lat, lng, radius) if near and radius is not None else None, **conditions,
+        )
+
+    pagination = {
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": math.ceil(total / per_page) if per_page else 0,
+    }
+    if FAST_JSON:
+        pref_names = get_prefecture_names(db)
+        return FastJSONResponse({
+            "data": [_facility_row(f, pref_names, dist) for f, dist in results],
+            "pagination": pagination,
+            "facets": facet_counts,
+        })
 
     return FacilityListResponse(
-        data=[_facility_to_list(f) for f in facilities],
-        pagination=PaginationOut(
-            page=page,
-            per_page=per_page,
-            total=total,
-            pages=math.ceil(total / per_page) if per_page else 0,
-        ),
+        data=[_facility_to_list(f, dist) for f, dist in results],
+        pagination=PaginationOut(**pagination),
+        facets=facet_counts,
     )
 
 
@@ -90,86 +154,179 @@ def nearby_facilities(
     type: Optional[List[int]] = Query(None, description="施設種別"),
     specialty: Optional[str] = Query(None, description="診療科名"),
     open_now: bool = Query(False, description="現在診療中の施設のみ"),
+    open_at: Optional[datetime] = Query(None, description=OPEN_AT_DESCRIPTION),
+    open_within: Optional[int] = Query(None, ge=0, le=OPEN_WITHIN_MAX, description=OPEN_WITHIN_DESCRIPTION),
     limit: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db),
 ):
+    _check_open_at(open_at)
     results = search_nearby(
         db, lat=lat, lng=lng, radius_km=radius,
         facility_types=type, specialty=specialty,
-        open_now=open_now, limit=limit,
+        open_now=open_now, open_at=open_at, open_within=open_within, limit=limit,
     )
+    if FAST_JSON:
+        pref_names = get_prefecture_names(db)
+        return FastJSONResponse([_facility_row(fac, pref_names, dist) for fac, dist in results])
     return [_facility_to_list(fac, dist) for fac, dist in results]
 
 
+@router.get("/facilities/nearest-by-type", response_model=List[NearestByTypeOut])
+def nearest_by_type(
+    lat: float = Query(..., ge=MIN_LAT, le=MAX_LAT, description="緯度（北緯20〜46度）"),
+    lng: float = Query(..., ge=MIN_LNG, le=MAX_LNG, description="経度（東経122〜154度）"),
+    max_distance: float = Query(50.0, ge=0.1, le=200, description="探索する最大距離 (km)"),
+    type: Optional[List[int]] = Query(None, description="対象の施設種別（省略時は全種別）"),
+    specialty: Optional[str] = Query(None, description="診療科名"),
+    db: Session = Depends(get_db),
+):
+    """種別ごとの最寄り施設（病院・診療所・歯科・助産所・薬局を1回で）。範囲内に無い種別は含まない"""
+    results = search_nearest_by_type(
+        db, lat=lat, lng=lng, max_km=max_distance, facility_types=type, specialty=specialty,
+    )
+    pref_names = get_prefecture_names(db)
+    return [{
+        "facility_type": facility_type,
+        "facility_type_name": FACILITY_TYPE_NAMES.get(facility_type),
+        "facility": _facility_row(fac, pref_names, dist),
+    } for facility_type, fac, dist in results]
+
+
+def _batch_lines(req: NearbyBatchRequest):
+    # StreamingResponse は依存関係の後始末後も読み続けるので専用セッションを使う
+    db = SessionLocal()
+    try:
+        pref_names = get_prefecture_names(db)
+        points = [(p.lat, p.lng) for p in req.points]
+        for i, results in search_nearby_batch(
+            db, points, radius_km=req.radius, facility_types=req.type,
+            specialty=req.specialty, limit=req.limit,
+        ):
+            lat, lng = points[i]
+            yield dumps({
+                "index": i, "lat": lat, "lng": lng,
+                "results": [_facility_row(f, pref_names, dist) for f, dist in results],
+            }) + b"\n"
+    finally:
+        db.close()
+
+
+@router.post(
+    "/facilities/nearby:batch",
+    response_class=StreamingResponse,
+    responses={200: {
+        "description": '入力地点ごとに1行のNDJSON: {"index", "lat", "lng", "results": [FacilityListOut]}',
+        "content": {"application/x-ndjson": {}},
+    }},
+)
+def nearby_batch(req: NearbyBatchRequest):
+    """複数地点の近隣検索 — メモリ上の空間インデックスで全地点を処理し、地点ごとにNDJSONで逐次返す"""
+    return StreamingResponse(_batch_lines(req), media_type="application/x-ndjson")
+
+
+def _shape_response(db: Session, results, total: int, page: int, per_page: int):
+    pagination = {
+        "page": page, "per_page": per_page, "total": total,
+        "pages": math.ceil(total / per_page) if per_page else 0,
+    }
+    if FAST_JSON:
+        pref_names = get_prefecture_names(db)
+        return FastJSONResponse({
+            "data": [_facility_row(f, pref_names, dist) for f, dist in results], "pagination": pagination,
+        })
+    return FacilityListResponse(
+        data=[_facility_to_list(f, dist) for f, dist in results], pagination=PaginationOut(**pagination),
+    )
+
+
+@router.post("/facilities/within", response_model=FacilityListResponse)
+def facilities_within(req: FacilityWithinRequest, db: Session = Depends(get_db)):
+    """GeoJSON の多角形（二次医療圏・浸水想定区域など）内の施設（/facilities と同じ絞り込み、ID順）"""
+    facilities, total = search_facilities_within(
+        db, parse_polygons(req.geometry), page=req.page, per_page=req.per_page, **req.conditions(),
+    )
+    return _shape_response(db, [(f, None) for f in facilities], total, req.page, req.per_page)
+
+
+@router.post("/facilities/along", response_model=FacilityListResponse)
+def facilities_along(req: FacilityAlongRequest, db: Session = Depends(get_db)):
+    """GeoJSON の経路から buffer km 以内の施設（distance_km は経路までの距離、ID順）"""
+    results, total = search_facilities_along(
+        db, parse_lines(req.line), req.buffer, page=req.page, per_page=req.per_page, **req.conditions(),
+    )
+    return _shape_response(db, results, total, req.page, req.per_page)
+
+
 @router.get("/facilities/{facility_id}", response_model=FacilityDetailOut)
 def facility_detail(facility_id: str, db: Session = Depends(get_db)):
+    # インポート時に生成した詳細JSONがあればそのまま返す（ORM・検証なし）
+    body = get_facility_document(db, facility_id)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+
     fac = get_facility_detail(db, facility_id)
     if not fac:
         raise HTTPException(status_code=404, detail="施設が見つかりません")
+    return render_facility_detail(fac, get_specialty_names(db))
 
-    pref_name = fac.prefecture.name if fac.prefecture else None
 
-    return FacilityDetailOut(
-        id=fac.id,
-        facility_type=fac.facility_type,
-        facility_type_name=FACILITY_TYPE_NAMES.get(fac.facility_type),
-        name=fac.name,
-        name_kana=fac.name_kana,
-        name_short=fac.name_short,
-        name_en=fac.name_en,
-        prefecture_code=fac.prefecture_code,
-        prefecture_name=pref_name,
-        city_code=fac.city_code,
-        address=fac.address,
-        latitude=fac.latitude,
-        longitude=fac.longitude,
-        website_url=fac.website_url,
-        closed_holiday=fac.closed_holiday,
-        closed_other=fac.closed_other,
-        closed_weekly=fac.closed_weekly,
-        corporate_number=fac.corporate_number,
-        closed_weeks=json.loads(fac.closed_weeks) if isinstance(fac.closed_weeks, str) else fac.closed_weeks,
-        data_date=str(fac.data_date) if fac.data_date else None,
-        business_hours=[{
-            "slot": bh.slot_number,
-            "type": bh.hour_type,
-            "schedule": json.loads(bh.schedule) if isinstance(bh.schedule, str) else bh.schedule,
-        } for bh in fac.business_hours] if fac.business_hours else None,
-        specialities=[SpecialtyOut(
-            specialty_code=s.specialty_code,
-            specialty_name=s.specialty_name,
-            time_slot=s.time_slot,
-            schedule=json.loads(s.schedule) if isinstance(s.schedule, str) else s.schedule,
-            reception=json.loads(s.reception) if isinstance(s.reception, str) else s.reception,
-        ) for s in fac.specialities],
-        beds=BedOut.model_validate(fac.beds) if fac.beds else None,
-    )
+# 読み取り専用マスタ・統計はデータバージョン単位でキャッシュ（api/cache.py）
+@cached_endpoint("specialities", SessionLocal, model=List[SpecialtyMasterOut])
+def _specialities(db, category=None):
+    query = db.query(SpecialtyMaster)
+    if category:
+        query = query.filter(SpecialtyMaster.category == category)
+    return query.order_by(SpecialtyMaster.code).all()
+
+
+@cached_endpoint("prefectures", SessionLocal, model=List[PrefectureOut])
+def _prefectures(db):
+    return db.query(Prefecture).order_by(Prefecture.code).all()
+
+
+@cached_endpoint("stats", SessionLocal, model=StatsOut)
+def _stats(db):
+    return get_stats(db)
+
+
+# 診療科マスタのカテゴリ（一覧のETag → カテゴリの集合）
+_categories: Dict[str, frozenset] = {}
+
+
+def _specialty_categories() -> frozenset:
+    """キャッシュ済みの診療科一覧にあるカテゴリ（データ更新でETagが変われば作り直す）"""
+    _, body, etag = get_entry("specialities")
+    categories = _categories.get(etag)
+    if categories is None:
+        _categories.clear()
+        categories = _categories[etag] = frozenset(s["category"] for s in json.loads(body) if s["category"])
+    return categories
 
 
 @router.get("/specialities", response_model=List[SpecialtyMasterOut])
 def list_specialities(
+    request: Request,
     category: Optional[str] = Query(None, description="カテゴリ（内科系, 外科系, etc）"),
-    db: Session = Depends(get_db),
 ):
-    cache_key = f"specialities:{category or 'all'}"
-    def fetch():
-        query = db.query(SpecialtyMaster)
-        if category:
-            query = query.filter(SpecialtyMaster.category == category)
-        return query.order_by(SpecialtyMaster.code).all()
-    return _cached(cache_key, fetch)
+    if category:
+        # マスタに無いカテゴリは空の一覧（任意の文字列ごとにキャッシュを作らない）
+        if category not in _specialty_categories():
+            return []
+        return cached_response(request, "specialities", category=category)
+    return cached_response(request, "specialities")
 
 
 @router.get("/prefectures", response_model=List[PrefectureOut])
-def list_prefectures(db: Session = Depends(get_db)):
-    return _cached("prefectures", lambda: db.query(Prefecture).order_by(Prefecture.code).all())
+def list_prefectures(request: Request):
+    return cached_response(request, "prefectures")
 
 
 @router.get("/stats", response_model=StatsOut)
-def stats(db: Session = Depends(get_db)):
-    return _cached("stats", lambda: get_stats(db))
+def stats(request: Request):
+    return cached_response(request, "stats")
 
 
 @router.get("/health")
 def health():
-    return {"status": "ok"}
+    # open_now.stale_seconds: 診療中の集合が有効期限（次の診療時間の境界）を過ぎて作り直されていない秒数
+    return {"status": "ok", "open_now": open_now_status(engine)}
@@ -1,30 +1,34 @@
 """介護事業所エンドポイント"""
-import json
 import math
 from typing import Optional, List
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
-from ..database import get_kaigo_db
+from ..database import get_kaigo_db, KaigoSessionLocal
 from ..kaigo_schemas import (
     KaigoFacilityListOut, KaigoFacilityDetailOut, KaigoListResponse,
     PaginationOut, KaigoStatsOut, KaigoServiceMasterOut,
+    KaigoWithinRequest, KaigoAlongRequest, AVAILABLE_DAY_PATTERN,
 )
 from ..services.kaigo_search import (
-    search_kaigo, search_kaigo_nearby, get_kaigo_detail,
-    get_kaigo_services, get_kaigo_stats,
+    search_kaigo, search_kaigo_near, search_kaigo_nearby, search_kaigo_within, search_kaigo_along,
+    get_kaigo_detail, get_kaigo_services, get_kaigo_stats, parse_available_days,
 )
+from ..services.shapes import parse_lines, parse_polygons
+from ..services.documents import get_kaigo_document, render_kaigo_detail
+from ..services.geo import MAX_LAT, MAX_LNG, MIN_LAT, MIN_LNG
+from ..services.facets import kaigo_facets, parse_facets, KAIGO_FACETS
+from ..fastjson import FastJSONResponse, fast_json_enabled
+from ..cache import cached_endpoint, cached_response
+from .params import NEAR_RADIUS_MAX, near_requested
 
 router = APIRouter(prefix="/api/v1/kaigo", tags=["kaigo"])
 
+# FAST_JSON=all / kaigo で一覧系をPydanticを通さず直接シリアライズ
+FAST_JSON = fast_json_enabled("kaigo")
 
-def _parse_days(fac) -> Optional[dict]:
-    if fac.available_days:
-        try:
-            return json.loads(fac.available_days) if isinstance(fac.available_days, str) else fac.available_days
-        except (json.JSONDecodeError, TypeError):
-            return None
-    return None
+_FACET = "|".join(KAIGO_FACETS)
+FACETS_PATTERN = rf"^({_FACET})(,({_FACET}))*$"
 
 
 def _to_list(fac, distance_km=None) -> KaigoFacilityListOut:
@@ -43,34 +47,85 @@ def _to_list(fac, distance_km=None) -> KaigoFacilityListOut:
         phone=fac.phone,
         corporate_name=fac.corporate_name,
         capacity=fac.capacity,
-        available_days=_parse_days(fac),
+        available_days=parse_available_days(fac),
         distance_km=distance_km,
     )
 
 
+def _kaigo_row(fac, distance_km=None) -> dict:
+    """高速経路用: KaigoFacilityListOut と同じキー順のdict"""
+    return {
+        "id": fac.id,
+        "service_code": fac.service_code,
+        "service_type": fac.service_type,
+        "name": fac.name,
+        "prefecture_code": fac.prefecture_code,
+        "prefecture_name": fac.prefecture_name,
+        "city_code": fac.city_code,
+        "city_name": fac.city_name,
+        "address": fac.address,
+        "latitude": fac.latitude,
+        "longitude": fac.longitude,
+        "phone": fac.phone,
+        "corporate_name": fac.corporate_name,
+        "capacity": fac.capacity,
+        "available_days": parse_available_days(fac),
+        "distance_km": distance_km,
+    }
+
+
 @router.get("", response_model=KaigoListResponse)
 def list_kaigo(
     q: Optional[str] = Query(None, description="フリーワード（名称・住所）"),
-    service: Optional[str] = Query(None, description="サービス種別名またはコード"),
+    service: Optional[str] = Query(None, description="サービス種別名・カテゴリ（訪問系など）またはコード"),
     prefecture: Optional[str] = Query(None, description="都道府県コード (01-47)"),
     city: Optional[str] = Query(None, description="市区町村コード"),
     corporate_number: Optional[str] = Query(None, description="法人番号"),
-    available_day: Optional[str] = Query(None, description="利用可能曜日 (mon/tue/.../sun/holiday)"),
+    available_day: Optional[str] = Query(
+        None, pattern=AVAILABLE_DAY_PATTERN,
+        description="利用可能曜日 (mon/tue/.../sun/holiday)。カンマ区切りで全曜日を満たすもの (例: sat,sun)",
+    ),
+    lat: Optional[float] = Query(None, ge=MIN_LAT, le=MAX_LAT, description="緯度（lng と併せて指定すると近い順、座標の無い事業所は除く）"),
+    lng: Optional[float] = Query(None, ge=MIN_LNG, le=MAX_LNG, description="経度"),
+    radius: Optional[float] = Query(None, ge=0.1, le=NEAR_RADIUS_MAX, description="lat/lng からの半径 (km)。省略時は範囲を限らない"),
+    facets: Optional[str] = Query(
+        None, pattern=FACETS_PATTERN,
+        description="件数を集計するファセット（service,prefecture,city,available_day のカンマ区切り）",
+    ),
+    facet_limit: int = Query(50, ge=1, le=2000, description="ファセットごとの最大件数（件数の多い順）"),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_kaigo_db),
 ):
-    facilities, total = search_kaigo(
-        db, q=q, service=service, prefecture=prefecture, city=city,
+    filters = dict(
+        q=q, service=service, prefecture=prefecture, city=city,
         corporate_number=corporate_number, available_day=available_day,
-        page=page, per_page=per_page,
     )
+    near = near_requested(lat, lng, radius)
+    if near:
+        results, total = search_kaigo_near(db, lat, lng, radius_km=radius, page=page, per_page=per_page, **filters)
+    else:
+        facilities, total = search_kaigo(db, **filters, page=page, per_page=per_page)
+        results = [(f, None) for f in facilities]
+    facet_counts = None
+    if facets:
+        facet_counts = kaigo_facets(
+            db, parse_facets(facets), limit=facet_limit,
+            near=(lat, lng, radius) if near and radius is not None else None, **filters,
+        )
+    pagination = {
+        "page": page, "per_page": per_page, "total": total,
+        "pages": math.ceil(total / per_page) if per_page else 0,
+    }
+    if FAST_JSON:
+        return FastJSONResponse({
+            "data": [_kaigo_row(f, dist) for f, dist in results], "pagination": pagination, "facets": facet_counts,
+        })
+
     return KaigoListResponse(
-        data=[_to_list(f) for f in facilities],
-        pagination=PaginationOut(
-            page=page, per_page=per_page, total=total,
-            pages=math.ceil(total / per_page) if per_page else 0,
-        ),
+        data=[_to_list(f, dist) for f, dist in results],
+        pagination=PaginationOut(**pagination),
+        facets=facet_counts,
     )
 
 
@@ -79,57 +134,74 @@ def nearby_kaigo(
     lat: float = Query(..., description="緯度"),
     lng: float = Query(..., description="経度"),
     radius: float = Query(5.0, ge=0.1, le=50, description="半径 (km)"),
-    service: Optional[str] = Query(None, description="サービス種別名またはコード"),
+    service: Optional[str] = Query(None, description="サービス種別名・カテゴリ（訪問系など）またはコード"),
     limit: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_kaigo_db),
 ):
     results = search_kaigo_nearby(db, lat=lat, lng=lng, radius_km=radius, service=service, limit=limit)
+    if FAST_JSON:
+        return FastJSONResponse([_kaigo_row(fac, dist) for fac, dist in results])
     return [_to_list(fac, dist) for fac, dist in results]
 
 
-@router.get("/services", response_model=List[KaigoServiceMasterOut])
-def kaigo_services(db: Session = Depends(get_kaigo_db)):
+def _shape_response(results, total: int, page: int, per_page: int):
+    pagination = {
+        "page": page, "per_page": per_page, "total": total,
+        "pages": math.ceil(total / per_page) if per_page else 0,
+    }
+    if FAST_JSON:
+        return FastJSONResponse({"data": [_kaigo_row(f, dist) for f, dist in results], "pagination": pagination})
+    return KaigoListResponse(
+        data=[_to_list(f, dist) for f, dist in results], pagination=PaginationOut(**pagination),
+    )
+
+
+@router.post("/within", response_model=KaigoListResponse)
+def kaigo_within(req: KaigoWithinRequest, db: Session = Depends(get_kaigo_db)):
+    """GeoJSON の多角形内の事業所×サービス（/kaigo と同じ絞り込み、事業所番号順）"""
+    facilities, total = search_kaigo_within(
+        db, parse_polygons(req.geometry), page=req.page, per_page=req.per_page, **req.filters(),
+    )
+    return _shape_response([(f, None) for f in facilities], total, req.page, req.per_page)
+
+
+@router.post("/along", response_model=KaigoListResponse)
+def kaigo_along(req: KaigoAlongRequest, db: Session = Depends(get_kaigo_db)):
+    """GeoJSON の経路から buffer km 以内の事業所×サービス（distance_km は経路までの距離、事業所番号順）"""
+    results, total = search_kaigo_along(
+        db, parse_lines(req.line), req.buffer, page=req.page, per_page=req.per_page, **req.filters(),
+    )
+    return _shape_response(results, total, req.page, req.per_page)
+
+
+@cached_endpoint("kaigo_services", KaigoSessionLocal, model=List[KaigoServiceMasterOut])
+def _kaigo_services(db):
     return get_kaigo_services(db)
 
 
-@router.get("/stats", response_model=KaigoStatsOut)
-def kaigo_stats(db: Session = Depends(get_kaigo_db)):
+@cached_endpoint("kaigo_stats", KaigoSessionLocal, model=KaigoStatsOut)
+def _kaigo_stats(db):
     return get_kaigo_stats(db)
 
 
+@router.get("/services", response_model=List[KaigoServiceMasterOut])
+def kaigo_services(request: Request):
+    return cached_response(request, "kaigo_services")
+
+
+@router.get("/stats", response_model=KaigoStatsOut)
+def kaigo_stats(request: Request):
+    return cached_response(request, "kaigo_stats")
+
+
 @router.get("/{facility_id}", response_model=List[KaigoFacilityDetailOut])
 def kaigo_detail(facility_id: str, db: Session = Depends(get_kaigo_db)):
+    # インポート時に生成した詳細JSONがあればそのまま返す
+    body = get_kaigo_document(db, facility_id)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+
     facilities = get_kaigo_detail(db, facility_id)
     if not facilities:
         raise HTTPException(status_code=404, detail="事業所が見つかりません")
-    result = []
-    for fac in facilities:
-        result.append(KaigoFacilityDetailOut(
-            id=fac.id,
-            service_code=fac.service_code,
-            service_type=fac.service_type,
-            name=fac.name,
-            name_kana=fac.name_kana,
-            prefecture_code=fac.prefecture_code,
-            prefecture_name=fac.prefecture_name,
-            city_code=fac.city_code,
-            city_name=fac.city_name,
-            address=fac.address,
-            address_detail=fac.address_detail,
-            latitude=fac.latitude,
-            longitude=fac.longitude,
-            phone=fac.phone,
-            fax=fac.fax,
-            corporate_number=fac.corporate_number,
-            corporate_name=fac.corporate_name,
-            available_days=_parse_days(fac),
-            available_days_note=fac.available_days_note,
-            capacity=fac.capacity,
-            website_url=fac.website_url,
-            shared_service=fac.shared_service,
-            nursing_care_standard=fac.nursing_care_standard,
-            welfare_standard=fac.welfare_standard,
-            note=fac.note,
-            data_date=fac.data_date,
-        ))
-    return result
+    return [render_kaigo_detail(fac) for fac in facilities]
@@ -0,0 +1,60 @@
+"""地図表示用エンドポイント（サーバー側クラスタリング）"""
+from typing import Optional, List, Tuple
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy.orm import Session
+
+from ..database import get_db, get_kaigo_db
+from ..schemas import ClusterResponse
+from ..services.clusters import get_facility_clusters, get_kaigo_clusters, MAX_ZOOM
+from ..services.kaigo_search import service_codes
+
+router = APIRouter(prefix="/api/v1/map", tags=["map"])
+
+_NUM = r"-?\d+(\.\d+)?"
+BBOX_PATTERN = rf"^{_NUM}(,{_NUM}){{3}}$"
+BBOX_DESCRIPTION = "表示範囲 西経度,南緯度,東経度,北緯度 (例: 139.6,35.6,139.9,35.8)"
+
+
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    west, south, east, north = (float(v) for v in bbox.split(","))
+    if west > east or south > north:
+        raise HTTPException(status_code=400, detail="bbox は 西,南,東,北 の順で指定してください")
+    return west, south, east, north
+
+
+def _response(clusters, zoom: int) -> dict:
+    return {
+        "zoom": min(zoom, MAX_ZOOM),
+        "total": sum(c[0] for c in clusters),
+        "clusters": [
+            {"lat": lat, "lng": lng, "count": count, "id": item_id}
+            for count, lat, lng, item_id in clusters
+        ],
+    }
+
+
+@router.get("/clusters", response_model=ClusterResponse)
+def facility_clusters(
+    bbox: str = Query(..., pattern=BBOX_PATTERN, description=BBOX_DESCRIPTION),
+    zoom: int = Query(..., ge=0, le=22, description="地図のズームレベル"),
+    type: Optional[List[int]] = Query(None, description="施設種別"),
+    db: Session = Depends(get_db),
+):
+    """医療施設のクラスタ（起動時に作るズーム別グリッドから bbox 内のセルを返す）"""
+    clusters = get_facility_clusters(db).query(_parse_bbox(bbox), zoom, type)
+    return _response(clusters, zoom)
+
+
+@router.get("/kaigo/clusters", response_model=ClusterResponse)
+def kaigo_clusters(
+    bbox: str = Query(..., pattern=BBOX_PATTERN, description=BBOX_DESCRIPTION),
+    zoom: int = Query(..., ge=0, le=22, description="地図のズームレベル"),
+    service: Optional[str] = Query(None, description="サービス種別名・カテゴリ（訪問系など）またはコード"),
+    db: Session = Depends(get_kaigo_db),
+):
+    """介護事業所のクラスタ（サービスコードで絞り込み可）"""
+    codes = None
+    if service:
+        codes = service_codes(db, service)
+    clusters = get_kaigo_clusters(db).query(_parse_bbox(bbox), zoom, codes)
+    return _response(clusters, zoom)
@@ -0,0 +1,40 @@
+"""横断近隣検索エンドポイント（医療＋介護）"""
+from typing import Optional, List, Literal
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..nearby_schemas import NearbyOut
+from ..services.nearby import search_all_nearby, KINDS
+from ..services.search import get_prefecture_names
+from .facilities import _facility_row
+from .kaigo import _kaigo_row
+
+router = APIRouter(prefix="/api/v1/nearby", tags=["nearby"])
+
+
+@router.get("/all", response_model=List[NearbyOut])
+def nearby_all(
+    lat: float = Query(..., description="緯度"),
+    lng: float = Query(..., description="経度"),
+    radius: float = Query(5.0, ge=0.1, le=50, description="半径 (km)"),
+    kind: Optional[List[Literal["medical", "kaigo"]]] = Query(
+        None, description="対象 (medical / kaigo)。省略時は両方",
+    ),
+    type: Optional[List[int]] = Query(None, description="医療: 施設種別"),
+    specialty: Optional[str] = Query(None, description="医療: 診療科名"),
+    open_now: bool = Query(False, description="医療: 現在診療中の施設のみ"),
+    service: Optional[str] = Query(None, description="介護: サービス種別名・カテゴリまたはコード"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """医療施設と介護事業所を距離順にまとめて返す（各要素の kind で種別を判別）"""
+    results = search_all_nearby(
+        lat=lat, lng=lng, radius_km=radius, kinds=kind or KINDS,
+        facility_types=type, specialty=specialty, open_now=open_now, service=service, limit=limit,
+    )
+    pref_names = get_prefecture_names(db)
+    return [
+        {"kind": k, **(_facility_row(obj, pref_names, dist) if k == "medical" else _kaigo_row(obj, dist))}
+        for k, obj, dist in results
+    ]
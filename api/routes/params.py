@@ -0,0 +1,15 @@
+"""施設・介護の両エンドポイントで共通のクエリパラメータの確認"""
+from typing import Optional
+
+from fastapi import HTTPException
+
+NEAR_RADIUS_MAX = 200
+
+
+def near_requested(lat: Optional[float], lng: Optional[float], radius: Optional[float]) -> bool:
+    """一覧を近い順にするか（lat と lng は両方必要、radius は位置と一緒にのみ）"""
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat と lng は両方指定してください")
+    if radius is not None and lat is None:
+        raise HTTPException(status_code=400, detail="radius は lat と lng と一緒に指定してください")
+    return lat is not None
@@ -0,0 +1,35 @@
+"""ベクトルタイル（MVT）エンドポイント"""
+from fastapi import APIRouter, HTTPException, Path, Response
+
+from ..config import CACHE_MAX_AGE
+from ..services.tiles import get_tile, tiles_available
+
+router = APIRouter(tags=["tiles"])
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+
+@router.get(
+    "/tiles/{z}/{x}/{y}.mvt",
+    response_class=Response,
+    responses={200: {"content": {MVT_MEDIA_TYPE: {}}, "description": "gzip圧縮済みのMVT"}},
+)
+def vector_tile(
+    z: int = Path(..., ge=0, le=22),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+):
+    """施設レイヤー（facilities / kaigo）のベクトルタイル。生成済みのバイト列をそのまま返す"""
+    if x >= 1 << z or y >= 1 << z:
+        raise HTTPException(status_code=404, detail="タイル座標が範囲外です")
+    tile = get_tile(z, x, y)
+    if tile is None:
+        if not tiles_available():
+            raise HTTPException(status_code=404, detail="タイルが未生成です（scripts/build_tiles.py）")
+        # 範囲外のズーム・地物の無いタイル
+        return Response(status_code=204, headers={"Cache-Control": f"public, max-age={CACHE_MAX_AGE}"})
+    return Response(
+        content=tile,
+        media_type=MVT_MEDIA_TYPE,
+        headers={"Content-Encoding": "gzip", "Cache-Control": f"public, max-age={CACHE_MAX_AGE}"},
+    )
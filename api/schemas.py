@@ -1,6 +1,13 @@
 """Pydantic スキーマ定義"""
+import json
+from datetime import datetime
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from .services.calendar import check_open_at
+from .services.geo import MAX_LAT, MAX_LNG, MIN_LAT, MIN_LNG
+from .services.schedule import unpack_schedule
+from .services.shapes import parse_lines, parse_polygons
 
 
 # === レスポンス ===
@@ -29,6 +36,16 @@ class SpecialtyOut(BaseModel):
     class Config:
         from_attributes = True
 
+    @field_validator("schedule", "reception", mode="before")
+    @classmethod
+    def _decode_schedule(cls, v):
+        """互換レイヤ: パック表現(bytes)・JSON文字列を従来のdict形式にする"""
+        if isinstance(v, (bytes, bytearray, memoryview)):
+            return unpack_schedule(bytes(v))
+        if isinstance(v, str):
+            return json.loads(v)
+        return v
+
 
 class BedOut(BaseModel):
     general: Optional[int] = None
@@ -58,6 +75,27 @@ class FacilityListOut(BaseModel):
         from_attributes = True
 
 
+class NearestByTypeOut(BaseModel):
+    """種別ごとの最寄り施設"""
+    facility_type: int
+    facility_type_name: Optional[str] = None
+    facility: FacilityListOut
+
+
+class ClusterOut(BaseModel):
+    """地図クラスタ（count=1 のときだけ id が入る）"""
+    lat: float
+    lng: float
+    count: int
+    id: Optional[str] = None
+
+
+class ClusterResponse(BaseModel):
+    zoom: int
+    total: int
+    clusters: List[ClusterOut]
+
+
 class FacilityDetailOut(BaseModel):
     """詳細用"""
     id: str
@@ -94,9 +132,17 @@ class PaginationOut(BaseModel):
     pages: int
 
 
+class FacetOut(BaseModel):
+    value: str
+    label: Optional[str] = None
+    count: int
+    prefecture_code: Optional[str] = None  # city ファセットのみ
+
+
 class FacilityListResponse(BaseModel):
     data: List[FacilityListOut]
     pagination: PaginationOut
+    facets: Optional[Dict[str, List[FacetOut]]] = None
 
 
 class StatsOut(BaseModel):
@@ -104,3 +150,108 @@ class StatsOut(BaseModel):
     by_type: Dict[str, int]
     by_prefecture: Dict[str, int]
     total_specialities: int
+
+
+class CoverageCellOut(BaseModel):
+    mesh: str                                    # 3次メッシュコード（8桁）
+    lat: float                                   # メッシュ中心
+    lng: float
+    nearest_hospital_km: Optional[float] = None  # 100km以内に無ければ null
+    pharmacies_2km: int
+
+
+class CoverageSummaryOut(BaseModel):
+    cells: int
+    median_hospital_km: Optional[float] = None
+    max_hospital_km: Optional[float] = None
+    cells_hospital_over_10km: int
+    cells_without_pharmacy: int
+
+
+class CoverageOut(BaseModel):
+    prefecture: str
+    specialty: Optional[str] = None              # 診療科マスタのコード
+    specialty_name: Optional[str] = None
+    data_date: str
+    mesh: str
+    summary: CoverageSummaryOut
+    cells: List[CoverageCellOut]
+
+
+# === リクエスト ===
+
+NEARBY_BATCH_MAX_POINTS = 10000
+OPEN_WITHIN_MAX = 7 * 24 * 60
+
+
+class LatLng(BaseModel):
+    """地点（施設データのある日本の範囲内）"""
+    lat: float = Field(..., ge=MIN_LAT, le=MAX_LAT)
+    lng: float = Field(..., ge=MIN_LNG, le=MAX_LNG)
+
+
+class NearbyBatchRequest(BaseModel):
+    """複数地点の近隣検索（フィルタは全地点共通）"""
+    points: List[LatLng] = Field(..., min_length=1, max_length=NEARBY_BATCH_MAX_POINTS)
+    radius: float = Field(5.0, ge=0.1, le=50, description="半径 (km)")
+    type: Optional[List[int]] = Field(None, description="施設種別")
+    specialty: Optional[str] = Field(None, description="診療科名")
+    limit: int = Field(5, ge=1, le=100, description="地点あたりの件数")
+
+
+class PolygonQuery(BaseModel):
+    """多角形内の検索 — geometry は GeoJSON の Polygon / MultiPolygon（またはそれを持つ Feature）、座標は [経度, 緯度]"""
+    geometry: Dict[str, Any] = Field(..., description="GeoJSON Polygon / MultiPolygon / Feature")
+    page: int = Field(1, ge=1)
+    per_page: int = Field(100, ge=1, le=1000)
+
+    @field_validator("geometry")
+    @classmethod
+    def _check_polygons(cls, v):
+        parse_polygons(v)
+        return v
+
+
+class LineQuery(BaseModel):
+    """経路沿いの検索 — line は GeoJSON の LineString / MultiLineString（またはそれを持つ Feature）"""
+    line: Dict[str, Any] = Field(..., description="GeoJSON LineString / MultiLineString / Feature")
+    buffer: float = Field(1.0, gt=0, le=50, description="経路からの距離 (km)")
+    page: int = Field(1, ge=1)
+    per_page: int = Field(100, ge=1, le=1000)
+
+    @field_validator("line")
+    @classmethod
+    def _check_lines(cls, v):
+        parse_lines(v)
+        return v
+
+
+class FacilityShapeFilters(BaseModel):
+    """/facilities/within・/facilities/along の絞り込み（/facilities と同じ）"""
+    q: Optional[str] = Field(None, description="フリーワード（名称・住所）")
+    type: Optional[List[int]] = Field(None, description="施設種別")
+    prefecture: Optional[str] = Field(None, description="都道府県コード (01-47)")
+    city: Optional[str] = Field(None, description="市区町村コード")
+    specialty: Optional[str] = Field(None, description="診療科名（部分一致）またはコード")
+    open_now: bool = Field(False, description="現在診療中の施設のみ")
+    open_at: Optional[datetime] = Field(None, description="指定日時に診療中の施設のみ")
+    open_within: Optional[int] = Field(None, ge=0, le=OPEN_WITHIN_MAX, description="open_at（省略時は現在）から指定分数後までに診療")
+
+    @field_validator("open_at")
+    @classmethod
+    def _open_at_range(cls, v):
+        return v if v is None else check_open_at(v)
+
+    def conditions(self) -> dict:
+        return dict(
+            q=self.q, facility_types=self.type, prefecture=self.prefecture, city=self.city, specialty=self.specialty,
+            open_now=self.open_now, open_at=self.open_at, open_within=self.open_within,
+        )
+
+
+class FacilityWithinRequest(FacilityShapeFilters, PolygonQuery):
+    pass
+
+
+class FacilityAlongRequest(FacilityShapeFilters, LineQuery):
+    pass
@@ -0,0 +1,241 @@
+"""roaring風の圧縮ビットセット
+
+整数（施設の通し番号）を上位16ビットごとのコンテナに分けて持つ。
+コンテナは要素数が少なければソート済み array('H')、ARRAY_MAX を超えたら
+65536ビットの Python int（ビット演算はCで一括処理される）に切り替える。
+
+    a = Bitmap.from_sorted([1, 5, 70000])
+    b = Bitmap.from_sorted(range(0, 100000, 5))
+    len(a & b), list(a & b)      # → 2, [5, 70000]
+
+演算結果は新しい Bitmap を返し、元の Bitmap は変更しない（インデックスで共有するため）。
+to_bytes / from_buffer でファイルに書き出せ、mmap から読んだ array コンテナはコピーせず
+memoryview（'H'）のまま使う（演算は array と同じく反復・len・添字だけで行う）。
+"""
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Union
+
+ARRAY_MAX = 4096           # これを超える要素数のコンテナはビットセットにする
+CONTAINER_BITS = 1 << 16
+BITSET = 0xFFFFFFFF        # to_bytes のコンテナ表で「ビットセット」を表す要素数
+
+Container = Union[array, memoryview, int]
+
+# 1バイト中の立っているビット位置
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
+
+def _card(c: Container) -> int:
+    return c.bit_count() if isinstance(c, int) else len(c)
+
+
+def _to_bits(values) -> int:
+    buf = bytearray(CONTAINER_BITS // 8)
+    for v in values:
+        buf[v >> 3] |= 1 << (v & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _from_bits(bits: int) -> array:
+    out = array("H")
+    data = bits.to_bytes(CONTAINER_BITS // 8, "little")
+    for i, byte in enumerate(data):
+        if byte:
+            base = i << 3
+            out.extend(base + b for b in _BYTE_BITS[byte])
+    return out
+
+
+def _normalize(c: Container):
+    """空ならNone、要素数に応じて array / int を選び直す"""
+    if isinstance(c, int):
+        n = c.bit_count()
+        if n == 0:
+            return None
+        return _from_bits(c) if n <= ARRAY_MAX else c
+    if not c:
+        return None
+    return _to_bits(c) if len(c) > ARRAY_MAX else c
+
+
+def _and(a: Container, b: Container):
+    if isinstance(a, int) and isinstance(b, int):
+        return _normalize(a & b)
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        return _normalize(array("H", (v for v in a if b >> v & 1)))
+    if len(a) > len(b):
+        a, b = b, a
+    other = set(b)
+    return _normalize(array("H", (v for v in a if v in other)))
+
+
+def _or(a: Container, b: Container):
+    if isinstance(a, int) or isinstance(b, int) or len(a) + len(b) > ARRAY_MAX:
+        a = a if isinstance(a, int) else _to_bits(a)
+        b = b if isinstance(b, int) else _to_bits(b)
+        return _normalize(a | b)
+    return _normalize(array("H", sorted(set(a).union(b))))
+
+
+def _sub(a: Container, b: Container):
+    if isinstance(a, int):
+        return _normalize(a & ~(b if isinstance(b, int) else _to_bits(b)))
+    if isinstance(b, int):
+        return _normalize(array("H", (v for v in a if not b >> v & 1)))
+    other = set(b)
+    return _normalize(array("H", (v for v in a if v not in other)))
+
+
+def _values(c: Container) -> array:
+    return _from_bits(c) if isinstance(c, int) else c
+
+
+class Bitmap:
+    __slots__ = ("containers",)
+
+    def __init__(self, containers: Dict[int, Container] = None):
+        self.containers = containers if containers is not None else {}
+
+    @classmethod
+    def from_sorted(cls, values: Iterable[int]) -> "Bitmap":
+        """昇順の整数列から作る（重複なし）"""
+        chunks: Dict[int, array] = {}
+        for v in values:
+            key = v >> 16
+            chunk = chunks.get(key)
+            if chunk is None:
+                chunk = chunks[key] = array("H")
+            chunk.append(v & 0xFFFF)
+        return cls({k: _normalize(c) for k, c in chunks.items()})
+
+    @classmethod
+    def from_values(cls, values: Iterable[int]) -> "Bitmap":
+        return cls.from_sorted(sorted(set(values)))
+
+    @classmethod
+    def union_all(cls, bitmaps: Iterable["Bitmap"]) -> "Bitmap":
+        """和をまとめて取る（コンテナのキーごとに1回で合わせるので、小さい Bitmap が多くても2乗にならない）"""
+        parts: Dict[int, List[Container]] = {}
+        for bm in bitmaps:
+            for key, c in bm.containers.items():
+                parts.setdefault(key, []).append(c)
+        containers = {}
+        for key, cs in parts.items():
+            if len(cs) == 1:
+                containers[key] = cs[0]
+                continue
+            arrays = [c for c in cs if not isinstance(c, int)]
+            if len(arrays) == len(cs) and sum(len(c) for c in arrays) <= ARRAY_MAX:
+                containers[key] = array("H", sorted(set().union(*arrays)))
+                continue
+            bits = _to_bits(v for c in arrays for v in c)
+            for c in cs:
+                if isinstance(c, int):
+                    bits |= c
+            containers[key] = _normalize(bits)
+        return cls(containers)
+
+    def _combine(self, other: "Bitmap", op, keys) -> "Bitmap":
+        """keys の各コンテナに op を適用。片方にしか無いキーはもう片方を空として扱う"""
+        containers = {}
+        for key in keys:
+            a, b = self.containers.get(key), other.containers.get(key)
+            if b is None:
+                c = a              # a | 空 = a, a - 空 = a
+            elif a is None:
+                c = b              # 空 | b = b
+            else:
+                c = op(a, b)
+            if c is not None:
+                containers[key] = c
+        return Bitmap(containers)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        return self._combine(other, _and, self.containers.keys() & other.containers.keys())
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        return self._combine(other, _or, self.containers.keys() | other.containers.keys())
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        return self._combine(other, _sub, self.containers.keys())
+
+    def __len__(self) -> int:
+        return sum(_card(c) for c in self.containers.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.containers)
+
+    def __contains__(self, v: int) -> bool:
+        c = self.containers.get(v >> 16)
+        if c is None:
+            return False
+        low = v & 0xFFFF
+        if isinstance(c, int):
+            return bool(c >> low & 1)
+        i = bisect_left(c, low)
+        return i < len(c) and c[i] == low
+
+    def __iter__(self) -> Iterator[int]:
+        for key in sorted(self.containers):
+            base = key << 16
+            for v in _values(self.containers[key]):
+                yield base + v
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Bitmap) and list(self) == list(other)
+
+    def slice(self, offset: int, limit: int) -> List[int]:
+        """昇順で offset 番目から limit 個（前のコンテナは件数だけ見て読み飛ばす）"""
+        out: List[int] = []
+        for key in sorted(self.containers):
+            c = self.containers[key]
+            n = _card(c)
+            if offset >= n:
+                offset -= n
+                continue
+            base = key << 16
+            values = _values(c)
+            out.extend(base + v for v in values[offset:offset + limit - len(out)])
+            offset = 0
+            if len(out) >= limit:
+                break
+        return out
+
+    def to_bytes(self) -> bytes:
+        """コンテナ数(uint32) + (上位16ビット, 要素数 or BITSET)(uint32×2)の表 + 各コンテナの中身"""
+        keys = sorted(self.containers)
+        table, body = array("I", [len(keys)]), []
+        for key in keys:
+            c = self.containers[key]
+            if isinstance(c, int):
+                table.extend((key, BITSET))
+                body.append(c.to_bytes(CONTAINER_BITS // 8, "little"))
+            else:
+                table.extend((key, len(c)))
+                body.append(array("H", c).tobytes())
+        return table.tobytes() + b"".join(body)
+
+    @classmethod
+    def from_buffer(cls, buf: memoryview) -> "Bitmap":
+        """to_bytes の結果（bytes / mmap の memoryview）から作る。array コンテナは buf を指したまま"""
+        buf = memoryview(buf).cast("B")
+        n = buf[:4].cast("I")[0]
+        table = buf[4:4 + 8 * n].cast("I")
+        pos = 4 + 8 * n
+        containers: Dict[int, Container] = {}
+        for j in range(n):
+            key, size = table[2 * j], table[2 * j + 1]
+            if size == BITSET:
+                end = pos + CONTAINER_BITS // 8
+                containers[key] = int.from_bytes(buf[pos:end], "little")
+            else:
+                end = pos + 2 * size
+                containers[key] = buf[pos:end].cast("H")
+            pos = end
+        return cls(containers)
+
+    def __repr__(self) -> str:
+        return f"<Bitmap {len(self)} values in {len(self.containers)} containers>"
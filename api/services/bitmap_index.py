@@ -0,0 +1,313 @@
+"""絞り込み条件のビットマップインデックス（メモリ上）
+
+施設を ID順の通し番号で表し、属性値ごとに該当する通し番号の Bitmap を持つ。
+種別 × 都道府県 × 診療科 × 診療時間帯 のような組み合わせは Bitmap の AND だけで
+候補と正確な件数が出るので、SQLite にはそのページの行を取りに行くだけになる。
+
+医療施設: type / prefecture / city / specialty（診療科コード）と、診療時間・休診日のカレンダー（calendar.py）
+介護事業所: 事業所番号×サービスコード単位で service / prefecture / city / day（利用可能曜日）
+どちらも緯度経度の格子（points.py）を同じ通し番号で持つ。
+
+データバージョン（api/cache.py）が変わるまで使い回す。
+インポート時に INDEX_DIR へ書き出したファイル（index_files.py）が同じ元データのものなら、
+SQLite を読まずにそれを mmap して使う（ワーカー間でメモリを共有する）。
+"""
+import logging
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Mapping, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from ..cache import engine_version, source_version
+from ..config import INDEX_DIR
+from ..database import checkpoint
+from ..models import Facility, Specialty
+from ..kaigo_models import KaigoFacility
+from .bitmap import Bitmap
+from .calendar import FacilityCalendar, build_calendar
+from .index_files import IndexFile, IndexWriter, KeyTable, decode_value, encode_value
+from .points import PointGrid
+
+logger = logging.getLogger(__name__)
+
+
+class _Postings:
+    """値 → 通し番号のリスト（昇順に追加）を集めて Bitmap にする"""
+
+    def __init__(self):
+        self.lists: Dict[Hashable, List[int]] = {}
+
+    def add(self, value, ordinal: int):
+        if value is None:
+            return
+        lst = self.lists.get(value)
+        if lst is None:
+            self.lists[value] = [ordinal]
+        elif lst[-1] != ordinal:
+            lst.append(ordinal)
+
+    def build(self) -> Dict[Hashable, Bitmap]:
+        return {value: Bitmap.from_sorted(lst) for value, lst in self.lists.items()}
+
+
+class BitmapIndex:
+    """keys[i] の通し番号 i についての属性値別 Bitmap"""
+
+    def __init__(
+        self, keys: Sequence, fields: Dict[str, Mapping[Hashable, Bitmap]], labels: dict = None,
+        points: PointGrid = None,
+    ):
+        self.keys = keys
+        # ファイルから読んだキー（昇順）は dict を作らず二分探索で引く
+        self.ordinals = keys if isinstance(keys, KeyTable) else {key: i for i, key in enumerate(keys)}
+        self.fields = fields
+        self.labels = labels or {}   # field → {値: 名称}（行に名称を持つ介護データのみ）
+        self.points = points         # 緯度経度（位置での絞り込み・距離順）
+        self.all = Bitmap.from_sorted(range(len(keys)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def any_of(self, field: str, values: Iterable) -> Bitmap:
+        """field がいずれかの値に一致する集合"""
+        postings = self.fields[field]
+        return Bitmap.union_all(postings[v] for v in values if v in postings)
+
+    def city(self, city: str, prefecture: str = None) -> Bitmap:
+        """市区町村コード（city の値は (都道府県コード, 市区町村コード)）"""
+        return self.any_of("city", (
+            key for key in self.fields["city"]
+            if key[1] == city and (prefecture is None or key[0] == prefecture)
+        ))
+
+    def counts(self, field: str, candidates: Bitmap) -> Dict[Hashable, int]:
+        """candidates 中の field の値ごとの件数（0件の値は含めない）"""
+        counts = {}
+        for value, bm in self.fields[field].items():
+            n = len(candidates & bm)
+            if n:
+                counts[value] = n
+        return counts
+
+    def of_keys(self, keys: Iterable) -> Bitmap:
+        ordinals = (self.ordinals.get(k) for k in keys)
+        return Bitmap.from_values(i for i in ordinals if i is not None)
+
+    def keys_at(self, ordinals: Iterable[int]) -> list:
+        return [self.keys[i] for i in ordinals]
+
+    def intersect(self, bitmaps: Sequence[Bitmap]) -> Bitmap:
+        """件数の少ない順に AND（条件なしなら全件）"""
+        if not bitmaps:
+            return self.all
+        ordered = sorted(bitmaps, key=len)
+        result = ordered[0]
+        for bm in ordered[1:]:
+            if not result:
+                break
+            result = result & bm
+        return result
+
+
+class FacilityBitmapIndex(BitmapIndex):
+    def __init__(self, keys: Sequence, fields, calendar: FacilityCalendar, points: PointGrid):
+        super().__init__(keys, fields, points=points)
+        self.calendar = calendar   # 診療時間・休診日（同じ通し番号）
+
+
+def build_facility_index(db: Session) -> FacilityBitmapIndex:
+    keys, coords, types, prefs, cities = [], [], _Postings(), _Postings(), _Postings()
+    for i, (fid, facility_type, pref, city, lat, lng) in enumerate(
+        db.query(
+            Facility.id, Facility.facility_type, Facility.prefecture_code, Facility.city_code,
+            Facility.latitude, Facility.longitude,
+        )
+        .order_by(Facility.id)
+    ):
+        keys.append(fid)
+        coords.append((lat, lng))
+        types.add(facility_type, i)
+        prefs.add(pref, i)
+        cities.add((pref, city), i)
+    ordinals = {fid: i for i, fid in enumerate(keys)}
+
+    specialities = _Postings()
+    for fid, code in db.query(Specialty.facility_id, Specialty.specialty_code).order_by(Specialty.facility_id):
+        i = ordinals.get(fid)
+        if i is not None:
+            specialities.add(code, i)
+
+    return FacilityBitmapIndex(
+        keys,
+        {
+            "type": types.build(),
+            "prefecture": prefs.build(),
+            "city": cities.build(),
+            "specialty": specialities.build(),
+        },
+        build_calendar(db, ordinals),
+        PointGrid(coords),
+    )
+
+
+def build_kaigo_index(db: Session) -> BitmapIndex:
+    from .kaigo_search import DAY_BITS  # kaigo_search がこのモジュールを使うため遅延import
+
+    keys, coords, services, prefs, cities, days = [], [], _Postings(), _Postings(), _Postings(), _Postings()
+    labels = {"service": {}, "prefecture": {}, "city": {}}
+    rows = (
+        db.query(
+            KaigoFacility.id, KaigoFacility.service_code, KaigoFacility.service_type,
+            KaigoFacility.prefecture_code, KaigoFacility.prefecture_name,
+            KaigoFacility.city_code, KaigoFacility.city_name, KaigoFacility.available_days_mask,
+            KaigoFacility.latitude, KaigoFacility.longitude,
+        )
+        .order_by(KaigoFacility.id, KaigoFacility.service_code)
+    )
+    for i, (kid, code, service_type, pref, pref_name, city, city_name, mask, lat, lng) in enumerate(rows):
+        keys.append((kid, code))
+        coords.append((lat, lng))
+        services.add(code, i)
+        prefs.add(pref, i)
+        cities.add((pref, city), i)
+        labels["service"].setdefault(code, service_type)
+        labels["prefecture"].setdefault(pref, pref_name)
+        labels["city"].setdefault((pref, city), city_name)
+        for day, bit in DAY_BITS.items():
+            if mask and mask & bit:
+                days.add(day, i)
+    return BitmapIndex(keys, {
+        "service": services.build(),
+        "prefecture": prefs.build(),
+        "city": cities.build(),
+        "day": days.build(),
+    }, labels, PointGrid(coords))
+
+
+# --- ファイルへの書き出し・読み込み ---
+
+def _write_points(writer: IndexWriter, points: PointGrid) -> dict:
+    writer.array("lats", "d", points.lats)
+    writer.array("lngs", "d", points.lngs)
+    return {
+        "cells": [[y, x, writer.bitmap(bm)] for (y, x), bm in points.cells.items()],
+        "located": writer.bitmap(points.located),
+    }
+
+
+def _read_points(f: IndexFile, meta: dict) -> PointGrid:
+    cells = f.bitmap_map([[[y, x], i] for y, x, i in meta["cells"]])
+    return PointGrid.from_parts(f.array("lats"), f.array("lngs"), cells, f.bitmaps[meta["located"]])
+
+
+def _write_calendar(writer: IndexWriter, calendar: FacilityCalendar) -> dict:
+    for kind, (offsets, flat) in enumerate(zip(calendar.offsets, calendar.flat)):
+        writer.array(f"calendar.offsets.{kind}", "I", offsets)
+        writer.array(f"calendar.flat.{kind}", "H", flat)
+    return {
+        "n": calendar.n,
+        "kinds": len(calendar.offsets),
+        "full": writer.bitmap_list(calendar.full),
+        "partial": writer.bitmap_list(calendar.partial),
+        "boundaries": calendar.boundaries,
+        "closed_holiday": writer.bitmap(calendar.closed_holiday),
+        "closed_weekly": writer.bitmap_list(calendar.closed_weekly),
+        "closed_weeks": writer.bitmap_map(calendar.closed_weeks),
+    }
+
+
+def _read_calendar(f: IndexFile, meta: dict) -> FacilityCalendar:
+    calendar = FacilityCalendar(meta["n"])
+    calendar.offsets = [f.array(f"calendar.offsets.{kind}") for kind in range(meta["kinds"])]
+    calendar.flat = [f.array(f"calendar.flat.{kind}") for kind in range(meta["kinds"])]
+    calendar.full = f.bitmap_list(meta["full"])
+    calendar.partial = f.bitmap_list(meta["partial"])
+    calendar.boundaries = meta["boundaries"]
+    calendar.closed_holiday = f.bitmaps[meta["closed_holiday"]]
+    calendar.closed_weekly = f.bitmap_list(meta["closed_weekly"])
+    calendar.closed_weeks = f.bitmap_map(meta["closed_weeks"])
+    return calendar
+
+
+def save_index(index: BitmapIndex, path: Path, version: str):
+    """インデックスを version（source_version）のファイルとして書き出す"""
+    writer = IndexWriter()
+    writer.keys("keys", index.keys)
+    meta = {
+        "tuple_keys": bool(len(index.keys)) and isinstance(index.keys[0], tuple),
+        "fields": {name: writer.bitmap_map(postings) for name, postings in index.fields.items()},
+        "labels": {
+            name: [[encode_value(value), label] for value, label in labels.items()]
+            for name, labels in index.labels.items()
+        },
+        "points": _write_points(writer, index.points),
+    }
+    if isinstance(index, FacilityBitmapIndex):
+        meta["calendar"] = _write_calendar(writer, index.calendar)
+    writer.write(path, version, meta)
+
+
+def load_index(path: Path, version: str) -> Optional[BitmapIndex]:
+    """version のファイルがあれば mmap して読む（Bitmap は使うときに読む）。無い・古ければ None"""
+    f = IndexFile.open(path, version)
+    if f is None:
+        return None
+    meta = f.meta
+    keys = f.keys("keys", split=meta["tuple_keys"])
+    fields = {name: f.bitmap_map(pairs) for name, pairs in meta["fields"].items()}
+    points = _read_points(f, meta["points"])
+    if "calendar" in meta:
+        return FacilityBitmapIndex(keys, fields, _read_calendar(f, meta["calendar"]), points)
+    labels = {
+        name: {decode_value(value): label for value, label in pairs} for name, pairs in meta["labels"].items()
+    }
+    return BitmapIndex(keys, fields, labels, points)
+
+
+BUILDERS = {"facilities": build_facility_index, "kaigo": build_kaigo_index}
+
+
+def index_path(kind: str) -> Path:
+    return INDEX_DIR / f"{kind}.idx"
+
+
+def write_index_file(kind: str, db: Session) -> BitmapIndex:
+    """SQLite から作って INDEX_DIR に書き出す（scripts/build_indexes.py）"""
+    engine = db.get_bind()
+    # WAL を本体に書き戻しておく（後で書き戻されると本体の stat が変わり、ファイルが古い扱いになる）
+    db.close()
+    if not checkpoint(engine):
+        logger.warning(f"WAL checkpoint busy; {index_path(kind)} will be stale once the WAL is checkpointed")
+    version = source_version(engine)
+    index = BUILDERS[kind](db)
+    save_index(index, index_path(kind), version)
+    return index
+
+
+# (engine, 種類) → (データバージョン, インデックス)
+_indexes = {}
+
+
+def _cached(kind: str, db: Session, build):
+    engine = db.get_bind()
+    version = engine_version(engine)
+    cached = _indexes.get((engine, kind))
+    if cached is None or cached[0] != version:
+        source = source_version(engine)
+        index = load_index(index_path(kind), source) if source else None
+        if index is not None:
+            logger.info(f"Bitmap index: {kind} {len(index):,} rows (mapped {index_path(kind)})")
+        else:
+            index = build(db)
+            logger.info(f"Bitmap index: {kind} {len(index):,} rows")
+        # 初回接続で -wal が作られ stat が変わるので、構築後のバージョンで覚える
+        cached = _indexes[(engine, kind)] = (engine_version(engine), index)
+    return cached[1]
+
+
+def get_facility_bitmap_index(db: Session) -> FacilityBitmapIndex:
+    return _cached("facilities", db, build_facility_index)
+
+
+def get_kaigo_bitmap_index(db: Session) -> BitmapIndex:
+    return _cached("kaigo", db, build_kaigo_index)
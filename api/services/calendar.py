@@ -0,0 +1,288 @@
+"""診療カレンダー — 任意の日時に診療・営業中の施設を求める
+
+施設ごとの診療時間（診療科の schedule と business_hours の business）を、日の種類（mon〜sun, hol）別に
+重なりをまとめた区間 [start, end]（0時からの分、両端を含む）にして持つ。日付ごとの扱い:
+
+    祝日（holidays.py）      closed_holiday の施設は休み、それ以外は hol の区間
+    平日・土日               closed_weekly（毎週休み）と closed_weeks（第n週の休み）を除き、その曜日の区間
+
+区間そのものは配列で、SLOT_MINUTES 刻みの枠ごとに「枠の全時間で診療中（full）」「一部だけ（partial）」の
+Bitmap（通し番号はビットマップインデックスと共通）を持つので、full はそのまま、partial の施設だけ区間を見て判定する。
+
+    calendar.open_at(datetime(2026, 11, 3, 10, 0, tzinfo=JST))       # 祝日の10時に診療中
+    calendar.open_within(now, 30)                                      # 30分以内に診療している
+"""
+import json
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, text, union_all
+from sqlalchemy.orm import Session
+
+from ..models import Facility, Specialty, BusinessHour
+from .bitmap import Bitmap
+from .holidays import MAX_YEAR, MIN_YEAR, is_holiday
+from .open_now import JST
+from .schedule import DAYS, NO_TIME, PACKED, load_schedule, pack_schedule
+
+DAY_MINUTES = 24 * 60
+HOLIDAY = DAYS.index("hol")
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = DAY_MINUTES // SLOT_MINUTES
+
+WEEKDAYS = DAYS[:7]
+
+
+def schedule_rows(db: Session):
+    """(施設ID, パック表現) — 診療科の診療時間と営業時間をまとめて施設ID順に"""
+    specialities = select(Specialty.facility_id.label("facility_id"), Specialty.schedule_packed.label("packed")).where(
+        Specialty.schedule_packed.isnot(None)
+    )
+    hours = select(BusinessHour.facility_id, BusinessHour.schedule_packed).where(
+        BusinessHour.schedule_packed.isnot(None), BusinessHour.hour_type == "business",
+    )
+    rows = union_all(specialities, hours).subquery()
+    return db.execute(select(rows.c.facility_id, rows.c.packed).order_by(rows.c.facility_id))
+
+
+# テーブル → (パック表現の列, 元のJSON列)
+PACKED_COLUMNS = {
+    Specialty: (("schedule_packed", "schedule"), ("reception_packed", "reception")),
+    BusinessHour: (("schedule_packed", "schedule"),),
+}
+
+
+def ensure_packed_schedules(db: Session, batch_size: int = 5000) -> int:
+    """旧スキーマのmedical.dbにパック表現の列を追加し、NULLの行をJSONから埋める。埋めた行数を返す
+
+    カレンダー・open_now はパック表現しか読まないので、再インポートせずに起動時に補う。
+    """
+    filled = 0
+    for model, pairs in PACKED_COLUMNS.items():
+        table = model.__tablename__
+        columns = {r[1] for r in db.execute(text(f"PRAGMA table_info({table})"))}
+        if not columns:
+            continue
+        for packed, source in pairs:
+            if packed not in columns:
+                db.execute(text(f"ALTER TABLE {table} ADD COLUMN {packed} BLOB"))
+            # JSON列は ORM の JSON 型で読む（文字列で入っている行もあるので load_schedule で dict にする）
+            rows = db.execute(select(model.id, getattr(model, source)).where(
+                getattr(model, packed).is_(None), getattr(model, source).isnot(None),
+            )).all()
+            update = text(f"UPDATE {table} SET {packed} = :packed WHERE id = :id")
+            for i in range(0, len(rows), batch_size):
+                db.execute(update, [
+                    {"id": rid, "packed": pack_schedule(load_schedule(value))} for rid, value in rows[i:i + batch_size]
+                ])
+            filled += len(rows)
+    db.commit()
+    return filled
+
+
+def day_kind(day: date) -> int:
+    """日付 → 区間の種類（0=mon〜6=sun, 7=hol）"""
+    return HOLIDAY if is_holiday(day) else day.weekday()
+
+
+def week_of_month(day: date) -> int:
+    """その月の第何週の曜日か（1〜5）"""
+    return (day.day - 1) // 7 + 1
+
+
+def check_open_at(value: datetime) -> datetime:
+    """open_at の日時の範囲（祝日を計算できる年）。範囲外は ValueError"""
+    if not MIN_YEAR <= value.year <= MAX_YEAR:
+        raise ValueError(f"open_at は {MIN_YEAR}〜{MAX_YEAR}年の日時で指定してください")
+    return value
+
+
+def to_jst(value: datetime) -> datetime:
+    """タイムゾーンなしはJSTとみなす"""
+    return value.replace(tzinfo=JST) if value.tzinfo is None else value.astimezone(JST)
+
+
+def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _load_json(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+class FacilityCalendar:
+    """通し番号 0〜n-1 の施設の、日の種類別の区間と休診日"""
+
+    def __init__(self, n: int):
+        self.n = n
+        # 種類ごとに offsets[i]〜offsets[i+1] が施設 i の区間（flat に start, end の順）
+        self.offsets = [array("I", [0]) for _ in DAYS]
+        self.flat = [array("H") for _ in DAYS]
+        self.full: List[Bitmap] = []
+        self.partial: List[Bitmap] = []
+        self.boundaries: List[List[int]] = []          # 種類ごとの、結果が変わりうる分
+        self.closed_holiday = Bitmap()
+        self.closed_weekly: List[Bitmap] = [Bitmap() for _ in WEEKDAYS]
+        self.closed_weeks: Dict[Tuple[int, int], Bitmap] = {}   # (第n週, 曜日) → 休みの施設
+
+    # --- 日付ごとの判定 ---
+
+    def closed_on(self, day: date) -> Bitmap:
+        if is_holiday(day):
+            return self.closed_holiday
+        weekday = day.weekday()
+        closed = self.closed_weekly[weekday]
+        nth = self.closed_weeks.get((week_of_month(day), weekday))
+        return closed | nth if nth is not None else closed
+
+    def _overlapping(self, ordinals: Iterable[int], kind: int, first: int, last: int) -> Bitmap:
+        """区間が [first, last] と重なる施設"""
+        offsets, flat = self.offsets[kind], self.flat[kind]
+        found = []
+        for i in ordinals:
+            for j in range(offsets[i], offsets[i + 1], 2):
+                if flat[j] <= last and flat[j + 1] >= first:
+                    found.append(i)
+                    break
+        return Bitmap.from_sorted(found)
+
+    def _open_during(self, day: date, first: int, last: int) -> Bitmap:
+        """day の first〜last 分（同じ日の中）のどこかで診療中の施設"""
+        kind = day_kind(day)
+        base = kind * SLOTS_PER_DAY
+        first_slot, last_slot = first // SLOT_MINUTES, last // SLOT_MINUTES
+        # 範囲と重なる枠の full は、重なった分で必ず診療中。partial の施設だけ区間を見る
+        sure = Bitmap.union_all(self.full[base + s] for s in range(first_slot, last_slot + 1))
+        maybe = Bitmap.union_all(self.partial[base + s] for s in range(first_slot, last_slot + 1)) - sure
+        result = sure | self._overlapping(maybe, kind, first, last)
+        return result - self.closed_on(day)
+
+    def open_at(self, when: datetime) -> Bitmap:
+        """when（分単位）に診療中の施設"""
+        when = to_jst(when)
+        minute = when.hour * 60 + when.minute
+        return self._open_during(when.date(), minute, minute)
+
+    def open_within(self, when: datetime, minutes: int) -> Bitmap:
+        """when から minutes 分後までのどこかで診療中の施設（日付をまたぐ場合は日ごとに判定）"""
+        start = to_jst(when).replace(second=0, microsecond=0)
+        end = start + timedelta(minutes=minutes)
+        result = Bitmap()
+        day = start.date()
+        while day <= end.date():
+            first = start.hour * 60 + start.minute if day == start.date() else 0
+            last = end.hour * 60 + end.minute if day == end.date() else DAY_MINUTES - 1
+            result = result | self._open_during(day, first, last)
+            day += timedelta(days=1)
+        return result
+
+    def next_change(self, when: datetime) -> datetime:
+        """when の後で open_at の結果が変わりうる最初の時刻（その日の区間の端か翌0時）"""
+        when = to_jst(when)
+        minute = when.hour * 60 + when.minute
+        boundaries = self.boundaries[day_kind(when.date())]
+        i = bisect_right(boundaries, minute)
+        if i < len(boundaries):
+            return when.replace(second=0, microsecond=0) + timedelta(minutes=boundaries[i] - minute)
+        return datetime.combine(when.date() + timedelta(days=1), time(0), tzinfo=JST)
+
+
+def _intervals(blobs: List[bytes]) -> List[List[Tuple[int, int]]]:
+    """1施設のパック表現 → 種類ごとのまとめた区間（24時以降の終了は23:59まで）"""
+    by_kind: List[List[Tuple[int, int]]] = [[] for _ in DAYS]
+    for blob in blobs:
+        values = PACKED.unpack(blob)
+        for kind in range(len(DAYS)):
+            start, end = values[kind * 2], values[kind * 2 + 1]
+            if start == NO_TIME or end < start or start >= DAY_MINUTES:
+                continue
+            by_kind[kind].append((start, min(end, DAY_MINUTES - 1)))
+    return [_merge(intervals) for intervals in by_kind]
+
+
+def build_calendar(db: Session, ordinals: Dict[str, int]) -> FacilityCalendar:
+    """施設ID → 通し番号（ID順）の対応で FacilityCalendar を作る"""
+    calendar = FacilityCalendar(len(ordinals))
+    slots_full: Dict[int, List[int]] = {}
+    slots_partial: Dict[int, List[int]] = {}
+    boundaries = [set() for _ in DAYS]
+
+    def add(i: int, blobs: List[bytes]):
+        full, touched = set(), set()
+        for kind, intervals in enumerate(_intervals(blobs)):
+            base = kind * SLOTS_PER_DAY
+            for start, end in intervals:
+                calendar.flat[kind].extend((start, end))
+                boundaries[kind].add(start)
+                if end + 1 < DAY_MINUTES:
+                    boundaries[kind].add(end + 1)
+                touched.update(range(base + start // SLOT_MINUTES, base + end // SLOT_MINUTES + 1))
+                full.update(range(base - (-start // SLOT_MINUTES), base + (end + 1) // SLOT_MINUTES))
+        for slot in full:
+            slots_full.setdefault(slot, []).append(i)
+        for slot in touched - full:
+            slots_partial.setdefault(slot, []).append(i)
+
+    # 通し番号順に区間を並べる（区間の無い施設も offsets を進める）
+    current, blobs = None, []
+    for fid, blob in schedule_rows(db):
+        i = ordinals.get(fid)
+        if i is None:
+            continue
+        if i != current:
+            if current is not None:
+                add(current, blobs)
+            _fill_offsets(calendar, current, i)
+            current, blobs = i, []
+        blobs.append(blob)
+    if current is not None:
+        add(current, blobs)
+    _fill_offsets(calendar, current, calendar.n)
+
+    n_slots = len(DAYS) * SLOTS_PER_DAY
+    calendar.full = [Bitmap.from_sorted(sorted(slots_full.get(s, ()))) for s in range(n_slots)]
+    calendar.partial = [Bitmap.from_sorted(sorted(slots_partial.get(s, ()))) for s in range(n_slots)]
+    calendar.boundaries = [sorted(b) for b in boundaries]
+
+    closed_holiday, closed_weekly, closed_weeks = [], [[] for _ in WEEKDAYS], {}
+    for fid, holiday, weekly, weeks in db.query(
+        Facility.id, Facility.closed_holiday, Facility.closed_weekly, Facility.closed_weeks,
+    ).order_by(Facility.id):
+        i = ordinals.get(fid)
+        if i is None:
+            continue
+        if holiday:
+            closed_holiday.append(i)
+        weekly = _load_json(weekly) or {}
+        for weekday, day in enumerate(WEEKDAYS):
+            if weekly.get(day):
+                closed_weekly[weekday].append(i)
+        for week, days in (_load_json(weeks) or {}).items():
+            for weekday, day in enumerate(WEEKDAYS):
+                if days.get(day):
+                    closed_weeks.setdefault((int(week.removeprefix("week")), weekday), []).append(i)
+    calendar.closed_holiday = Bitmap.from_sorted(closed_holiday)
+    calendar.closed_weekly = [Bitmap.from_sorted(v) for v in closed_weekly]
+    calendar.closed_weeks = {key: Bitmap.from_sorted(v) for key, v in closed_weeks.items()}
+    return calendar
+
+
+def _fill_offsets(calendar: FacilityCalendar, done: Optional[int], upto: int):
+    """施設 done までの区間を書き終えたところで、upto の手前までの offsets を埋める"""
+    start = 0 if done is None else done + 1
+    if done is not None:
+        for kind in range(len(DAYS)):
+            calendar.offsets[kind].append(len(calendar.flat[kind]))
+    for _ in range(start, upto):
+        for kind in range(len(DAYS)):
+            calendar.offsets[kind].append(len(calendar.flat[kind]))
@@ -0,0 +1,135 @@
+"""地図表示用の階層クラスタ（supercluster風のズーム別グリッド）
+
+Webメルカトルのタイル1枚を CELLS_PER_TILE × CELLS_PER_TILE のセルに分け、
+最大ズームのセルに点を集計してから、親セル（座標を1ビット右シフト）へ順に畳み上げる。
+各セルは (件数, 緯度合計, 経度合計, id) を持ち、1件だけのセルは id を残す。
+
+パーティション（医療は施設種別、介護はサービスコード）ごとに持つので、
+種別で絞った表示は該当パーティションのセルを足し合わせるだけで済む。
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..cache import engine_version
+from ..kaigo_models import KaigoFacility
+from .spatial import get_spatial_index
+from .mvt import project as _project
+
+logger = logging.getLogger(__name__)
+
+MAX_ZOOM = 15          # これより拡大した表示は MAX_ZOOM のセル（約1件ずつ）を返す
+CELLS_PER_TILE = 4     # 256pxタイルで64px四方
+
+Cell = Tuple[int, int]
+
+
+def _scale(zoom: int) -> int:
+    return (1 << zoom) * CELLS_PER_TILE
+
+
+class ClusterPyramid:
+    """パーティション別・ズーム別のセル集計"""
+
+    def __init__(self, rows: Iterable[Tuple[object, str, float, float]]):
+        # partition → [zoom0, ..., MAX_ZOOM] の {cell: (count, sum_lat, sum_lng, id)}
+        self.levels: Dict[object, List[Dict[Cell, tuple]]] = {}
+        scale = _scale(MAX_ZOOM)
+
+        base: Dict[object, Dict[Cell, list]] = {}
+        for partition, item_id, lat, lng in rows:
+            x, y = _project(lat, lng)
+            cell = (min(int(x * scale), scale - 1), min(int(y * scale), scale - 1))
+            cells = base.setdefault(partition, {})
+            c = cells.get(cell)
+            if c is None:
+                cells[cell] = [1, lat, lng, item_id]
+            else:
+                c[0] += 1
+                c[1] += lat
+                c[2] += lng
+                c[3] = None
+
+        for partition, cells in base.items():
+            levels = [None] * (MAX_ZOOM + 1)
+            levels[MAX_ZOOM] = {k: tuple(v) for k, v in cells.items()}
+            for zoom in range(MAX_ZOOM - 1, -1, -1):
+                levels[zoom] = _merge(((cx >> 1, cy >> 1), v) for (cx, cy), v in levels[zoom + 1].items())
+            self.levels[partition] = levels
+
+    def __len__(self):
+        return sum(v[0] for levels in self.levels.values() for v in levels[0].values())
+
+    def query(
+        self, bbox: Tuple[float, float, float, float], zoom: int,
+        partitions: Optional[Sequence] = None,
+    ) -> List[tuple]:
+        """bbox (西, 南, 東, 北) 内のクラスタ [(count, lat, lng, id), ...]"""
+        zoom = min(max(zoom, 0), MAX_ZOOM)
+        scale = _scale(zoom)
+        min_lng, min_lat, max_lng, max_lat = bbox
+        x0, y0 = _project(max_lat, min_lng)
+        x1, y1 = _project(min_lat, max_lng)
+        cx0, cy0 = int(x0 * scale), int(y0 * scale)
+        cx1, cy1 = min(int(x1 * scale), scale - 1), min(int(y1 * scale), scale - 1)
+        area = (cx1 - cx0 + 1) * (cy1 - cy0 + 1)
+
+        selected = self.levels if partitions is None else [p for p in partitions if p in self.levels]
+        found = []
+        for partition in selected:
+            cells = self.levels[partition][zoom]
+            if area < len(cells):
+                found.extend(
+                    ((cx, cy), cells[(cx, cy)])
+                    for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1) if (cx, cy) in cells
+                )
+            else:
+                found.extend(
+                    (k, v) for k, v in cells.items() if cx0 <= k[0] <= cx1 and cy0 <= k[1] <= cy1
+                )
+        merged = _merge(found) if len(selected) > 1 else dict(found)
+        return [
+            (count, round(slat / count, 6), round(slng / count, 6), item_id)
+            for count, slat, slng, item_id in merged.values()
+        ]
+
+
+def _merge(items: Iterable[Tuple[Cell, tuple]]) -> Dict[Cell, tuple]:
+    merged = {}
+    for cell, v in items:
+        c = merged.get(cell)
+        merged[cell] = v if c is None else (c[0] + v[0], c[1] + v[1], c[2] + v[2], None)
+    return merged
+
+
+# 名前 → (データバージョン, ClusterPyramid)
+_pyramids = {}
+
+
+def _cached(name: str, db: Session, rows) -> ClusterPyramid:
+    version = engine_version(db.get_bind())
+    cached = _pyramids.get(name)
+    if cached is None or cached[0] != version:
+        pyramid = ClusterPyramid(rows())
+        logger.info(f"Clusters: {name} {len(pyramid):,} points")
+        cached = _pyramids[name] = (version, pyramid)
+    return cached[1]
+
+
+def get_facility_clusters(db: Session) -> ClusterPyramid:
+    """医療施設（施設種別ごと）。空間インデックスの座標をそのまま使う"""
+    def rows():
+        for facility_type, grid in get_spatial_index(db).partitions.items():
+            yield from zip([facility_type] * len(grid), grid.ids, grid.lats, grid.lngs)
+    return _cached("facilities", db, rows)
+
+
+def get_kaigo_clusters(db: Session) -> ClusterPyramid:
+    """介護事業所（サービスコードごと）"""
+    def rows():
+        return (
+            db.query(KaigoFacility.service_code, KaigoFacility.id, KaigoFacility.latitude, KaigoFacility.longitude)
+            .filter(KaigoFacility.latitude.isnot(None), KaigoFacility.longitude.isnot(None))
+        )
+    return _cached("kaigo", db, rows)
@@ -0,0 +1,293 @@
+"""医療アクセスのカバレッジ分析（「医療砂漠」マップ）
+
+都道府県内の1kmメッシュ（JIS X 0410 の3次メッシュ、緯度30秒×経度45秒）ごとに
+
+    nearest_hospital_km     最寄りの病院（specialty 指定時はその診療科のある病院）までの距離
+    pharmacies_2km          半径2km以内の薬局の数
+
+を求める。行政界のデータは持たないので、都道府県の範囲は「最寄りの施設（種別問わず）が
+その都道府県にあり、TERRITORY_KM 以内にあるメッシュ」で近似する（海上・山間の無人域はおおむね除かれる）。
+
+メッシュの計算は spatial.GridIndex で行い、メッシュを分けてプロセスプールで並列に処理する
+（リクエスト処理中のスレッドからも呼ばれるので、ワーカーは fork ではなく spawn で起動する）。
+診療科はマスタのコードに解決してから使い（resolve_specialty）、結果はデータ公開日（DATA_DATE）ごとに
+COVERAGE_DIR へ「都道府県_コード.json」で保存し、メモリにも DB のデータバージョンごとに持つ。
+一括生成は scripts/build_coverage.py。
+
+    code = resolve_specialty(db, "小児科")        # → "03001"（マスタに無い・1つに決まらなければ ValueError）
+    result = get_coverage(db, "13", specialty=code)
+    result["summary"], result["cells"][0]
+    # → {"mesh": "53394611", "lat": ..., "lng": ..., "nearest_hospital_km": 0.84, "pharmacies_2km": 31}
+"""
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..cache import engine_version
+from ..config import COVERAGE_DIR, COVERAGE_WORKERS, DATA_DATE
+from ..models import Facility
+from .geo import bounding_box
+from .search import facility_ids_with_specialty, get_specialty_names
+from .spatial import GridIndex
+
+logger = logging.getLogger(__name__)
+
+HOSPITAL = 1
+PHARMACY = 5
+
+PHARMACY_KM = 2.0          # 薬局を数える半径
+HOSPITAL_MAX_KM = 100.0    # これより遠い病院は「なし」（null）
+TERRITORY_KM = 5.0         # 都道府県の範囲とみなす、最寄り施設からの距離
+REMOTE_KM = 10.0           # summary で「病院まで遠い」とする距離
+
+MESH_ROWS_PER_DEG = 120    # 3次メッシュ: 緯度30秒
+MESH_COLS_PER_DEG = 80     # 3次メッシュ: 経度45秒
+CHUNK_CELLS = 5000         # プロセスに渡す1タスクのメッシュ数
+
+Mesh = Tuple[int, int]     # (緯度方向の番号, 経度100度からの番号)
+
+
+# --- 3次メッシュ ---
+
+def mesh_of(lat: float, lng: float) -> Mesh:
+    return int(lat * MESH_ROWS_PER_DEG), int((lng - 100) * MESH_COLS_PER_DEG)
+
+
+def mesh_center(mesh: Mesh) -> Tuple[float, float]:
+    row, col = mesh
+    return (row + 0.5) / MESH_ROWS_PER_DEG, 100 + (col + 0.5) / MESH_COLS_PER_DEG
+
+
+def mesh_code(mesh: Mesh) -> str:
+    """(row, col) → 8桁の3次メッシュコード"""
+    row, col = mesh
+    return f"{row // 80:02d}{col // 80:02d}{row % 80 // 10}{col % 80 // 10}{row % 10}{col % 10}"
+
+
+# --- プロセスプールの作業 ---
+
+# ワーカープロセス内の状態（_init_worker で受け取る）
+_state: dict = {}
+
+
+def _init_worker(state: dict):
+    _state.clear()
+    _state.update(state)
+
+
+def _measure(meshes: List[Mesh]) -> List[tuple]:
+    """メッシュごとに (row, col, 最寄り病院km, 2km以内の薬局数)。範囲外のメッシュは含めない"""
+    territory, local_ids = _state["territory"], _state["local_ids"]
+    hospitals, pharmacies = _state["hospitals"], _state["pharmacies"]
+    out = []
+    for mesh in meshes:
+        lat, lng = mesh_center(mesh)
+        owner = territory.nearest(lat, lng, 1, TERRITORY_KM)
+        if not owner or owner[0][1] not in local_ids:
+            continue
+        hospital = hospitals.nearest(lat, lng, 1, HOSPITAL_MAX_KM)
+        out.append((
+            mesh[0], mesh[1],
+            round(hospital[0][0], 2) if hospital else None,
+            pharmacies.count_within(lat, lng, PHARMACY_KM),
+        ))
+    return out
+
+
+# --- 診療科 ---
+
+def resolve_specialty(db: Session, specialty: str) -> str:
+    """診療科（マスタのコード・名称、または名称の部分一致で1つに決まるもの）→ コード
+
+    マスタに無い・部分一致が複数ある場合は ValueError（任意の文字列ごとに計算・保存しないため）。
+    """
+    names = get_specialty_names(db)
+    if specialty in names:
+        return specialty
+    exact = sorted(code for code, name in names.items() if name == specialty)
+    if exact:
+        return exact[0]
+    partial = sorted(code for code, name in names.items() if specialty in name)
+    if not partial:
+        raise ValueError(f"診療科が見つかりません: {specialty}")
+    if len(partial) > 1:
+        candidates = "、".join(names[code] for code in partial[:10])
+        raise ValueError(f"診療科が1つに決まりません（{candidates}{' など' if len(partial) > 10 else ''}）")
+    return partial[0]
+
+
+# --- 計算 ---
+
+def _grid(rows, box: Tuple[float, float, float, float], cell_deg: float) -> GridIndex:
+    min_lat, max_lat, min_lng, max_lng = box
+    grid = GridIndex(cell_deg)
+    for fid, lat, lng in rows:
+        if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+            grid.add(fid, lat, lng)
+    return grid
+
+
+def _expand(box: Tuple[float, float, float, float], km: float) -> Tuple[float, float, float, float]:
+    min_lat, max_lat, min_lng, max_lng = box
+    lo = bounding_box(min_lat, min_lng, km)
+    hi = bounding_box(max_lat, max_lng, km)
+    return lo["min_lat"], hi["max_lat"], min(lo["min_lng"], hi["min_lng"]), max(lo["max_lng"], hi["max_lng"])
+
+
+def _candidate_meshes(local: GridIndex) -> List[Mesh]:
+    """都道府県の施設から TERRITORY_KM 以内にかかるメッシュ（施設のある格子セル単位で広げる）"""
+    meshes: Set[Mesh] = set()
+    step = local.cell_deg
+    for cy, cx in local.cells:
+        box = _expand((cy * step, (cy + 1) * step, cx * step, (cx + 1) * step), TERRITORY_KM)
+        (r0, c0), (r1, c1) = mesh_of(box[0], box[2]), mesh_of(box[1], box[3])
+        meshes.update((r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1))
+    return sorted(meshes)
+
+
+def compute_coverage(db: Session, prefecture: str, specialty: Optional[str] = None, workers: int = 0) -> dict:
+    """都道府県のカバレッジを計算する（workers=1 なら同じプロセスで、0 なら COVERAGE_WORKERS / CPU数）
+
+    specialty は診療科マスタのコード（resolve_specialty）。
+    """
+    rows = (
+        db.query(Facility.id, Facility.facility_type, Facility.prefecture_code, Facility.latitude, Facility.longitude)
+        .filter(Facility.latitude.isnot(None), Facility.longitude.isnot(None))
+        .all()
+    )
+    local_rows = [(fid, lat, lng) for fid, _, pref, lat, lng in rows if pref == prefecture]
+    if not local_rows:
+        return _result(db, prefecture, specialty, [])
+    lats, lngs = [r[1] for r in local_rows], [r[2] for r in local_rows]
+    box = (min(lats), max(lats), min(lngs), max(lngs))
+
+    allowed = facility_ids_with_specialty(db, specialty) if specialty else None
+    every = [(fid, lat, lng) for fid, _, _, lat, lng in rows]
+    hospitals = [
+        (fid, lat, lng) for fid, facility_type, _, lat, lng in rows
+        if facility_type == HOSPITAL and (allowed is None or fid in allowed)
+    ]
+    pharmacies = [(fid, lat, lng) for fid, facility_type, _, lat, lng in rows if facility_type == PHARMACY]
+    local = _grid(local_rows, box, 0.02)
+    state = {
+        # 境界付近は隣県の施設が最寄りになるので、範囲を広げて持つ
+        "territory": _grid(every, _expand(box, 2 * TERRITORY_KM), 0.02),
+        "local_ids": frozenset(fid for fid, _, _ in local_rows),
+        "hospitals": _grid(hospitals, _expand(box, HOSPITAL_MAX_KM + TERRITORY_KM), 0.1),
+        "pharmacies": _grid(pharmacies, _expand(box, PHARMACY_KM + TERRITORY_KM), 0.02),
+    }
+    meshes = _candidate_meshes(local)
+    chunks = [meshes[i:i + CHUNK_CELLS] for i in range(0, len(meshes), CHUNK_CELLS)]
+    workers = workers or COVERAGE_WORKERS or os.cpu_count() or 1
+    workers = min(workers, len(chunks))
+
+    if workers <= 1:
+        _init_worker(state)
+        try:
+            measured = [cell for chunk in chunks for cell in _measure(chunk)]
+        finally:
+            _state.clear()
+    else:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, context, initializer=_init_worker, initargs=(state,)) as pool:
+            measured = [cell for part in pool.map(_measure, chunks) for cell in part]
+    logger.info(
+        f"Coverage: {prefecture} {specialty or '-'} {len(measured):,}/{len(meshes):,} meshes ({workers} workers)"
+    )
+    return _result(db, prefecture, specialty, measured)
+
+
+def _result(db: Session, prefecture: str, specialty: Optional[str], measured: List[tuple]) -> dict:
+    cells = []
+    for row, col, hospital_km, pharmacies in measured:
+        lat, lng = mesh_center((row, col))
+        cells.append({
+            "mesh": mesh_code((row, col)), "lat": round(lat, 6), "lng": round(lng, 6),
+            "nearest_hospital_km": hospital_km, "pharmacies_2km": pharmacies,
+        })
+    distances = [c["nearest_hospital_km"] for c in cells if c["nearest_hospital_km"] is not None]
+    return {
+        "prefecture": prefecture,
+        "specialty": specialty,
+        "specialty_name": get_specialty_names(db).get(specialty) if specialty else None,
+        "data_date": DATA_DATE,
+        "mesh": "JIS X 0410 3次メッシュ",
+        "summary": {
+            "cells": len(cells),
+            "median_hospital_km": round(statistics.median(distances), 2) if distances else None,
+            "max_hospital_km": max(distances) if distances else None,
+            "cells_hospital_over_10km": sum(
+                1 for c in cells if c["nearest_hospital_km"] is None or c["nearest_hospital_km"] > REMOTE_KM
+            ),
+            "cells_without_pharmacy": sum(1 for c in cells if c["pharmacies_2km"] == 0),
+        },
+        "cells": cells,
+    }
+
+
+# --- キャッシュ（保存はデータ公開日ごと、メモリは DB のデータバージョンごと） ---
+
+# (データバージョン, 都道府県, 診療科コード) → 結果
+_cache: Dict[Tuple[str, str, str], dict] = {}
+# (都道府県, 診療科コード) → 計算中のロック（同じものを同時に計算しない。別の都道府県は並行してよい）
+_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def coverage_path(prefecture: str, specialty: Optional[str] = None) -> Path:
+    """COVERAGE_DIR/<DATA_DATE>/<都道府県>[_<診療科コード>].json"""
+    name = prefecture if not specialty else f"{prefecture}_{specialty}"
+    return COVERAGE_DIR / DATA_DATE / f"{name}.json"
+
+
+def get_coverage(db: Session, prefecture: str, specialty: Optional[str] = None) -> dict:
+    """メモリ → COVERAGE_DIR のファイル → 計算 の順に探し、計算したらファイルにも保存する
+
+    specialty は診療科マスタのコード（resolve_specialty で解決したもの）。
+    """
+    version = engine_version(db.get_bind())
+    key = (version, prefecture, specialty or "")
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    with _locks_guard:
+        lock = _locks.setdefault(key[1:], threading.Lock())
+    with lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached
+        path = coverage_path(prefecture, specialty)
+        if path.exists():
+            result = json.loads(path.read_text(encoding="utf-8"))
+        else:
+            result = compute_coverage(db, prefecture, specialty)
+            save_coverage(result, path)
+        # 古いデータバージョンの結果は捨てる
+        for stale in [k for k in _cache if k[0] != version]:
+            _cache.pop(stale, None)
+        _cache[key] = result
+    return result
+
+
+def save_coverage(result: dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(result, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+def clear_coverage():
+    """再インポート時: このデータ公開日の保存済み結果とメモリ上の結果を消す"""
+    _cache.clear()
+    directory = COVERAGE_DIR / DATA_DATE
+    if directory.exists():
+        for path in directory.glob("*.json"):
+            path.unlink()
@@ -0,0 +1,272 @@
+"""詳細ドキュメント — 施設・事業所詳細レスポンスの事前レンダリング
+
+データ更新は年2回なので、/facilities/{id} と /kaigo/{id} のレスポンスJSONを
+インポート時に1件ずつ生成して facility_documents / kaigo_documents に保存しておく。
+リクエスト時は主キー1回の検索でバイト列をそのまま返す（ORM・Pydantic検証なし）。
+
+--compact のインポートでは body を zlib で圧縮して保存する（返すときに展開する）。
+document_versions にレンダリングの版と元テーブルの中身のハッシュを記録し、
+起動時はこれが今のものと違えば作り直す（件数が同じでも、法人番号の付与などで中身が変われば古いとみなす）。
+DBファイルの stat は使えない（ドキュメント自体を同じファイルに書き込むので、書けば変わる）。
+"""
+import hashlib
+import json
+import logging
+import zlib
+from typing import Optional
+
+from sqlalchemy import func, inspect, insert, select, delete
+from sqlalchemy.orm import Session, selectinload, joinedload
+
+from ..models import Facility, FacilityDocument, DocumentVersion
+from ..kaigo_models import KaigoFacility, KaigoDocument, KaigoDocumentVersion
+from ..schemas import FacilityDetailOut, SpecialtyOut, BedOut
+from ..kaigo_schemas import KaigoFacilityDetailOut
+from .schedule import load_schedule
+from .search import get_specialty_names, FACILITY_TYPE_NAMES
+from .kaigo_search import parse_available_days
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+RENDER_VERSION = 2   # レンダリング結果の形を変えたら上げる（起動時に作り直される）
+
+# レンダリングが読むテーブル（この中身が変われば作り直す）
+FACILITY_SOURCES = (
+    "prefectures", "specialty_master", "facilities", "specialities", "business_hours", "hospital_beds",
+)
+KAIGO_SOURCES = ("kaigo_facilities",)
+
+# 存在確認済みのテーブル（確認できたものだけ覚える）
+_known_tables = set()
+
+
+def dumps(content) -> bytes:
+    """FastAPIのJSONResponseと同じ書式でシリアライズ"""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def render_facility_detail(fac: Facility, specialty_names: dict) -> FacilityDetailOut:
+    pref_name = fac.prefecture.name if fac.prefecture else None
+
+    return FacilityDetailOut(
+        id=fac.id,
+        facility_type=fac.facility_type,
+        facility_type_name=FACILITY_TYPE_NAMES.get(fac.facility_type),
+        name=fac.name,
+        name_kana=fac.name_kana,
+        name_short=fac.name_short,
+        name_en=fac.name_en,
+        prefecture_code=fac.prefecture_code,
+        prefecture_name=pref_name,
+        city_code=fac.city_code,
+        address=fac.address,
+        latitude=fac.latitude,
+        longitude=fac.longitude,
+        website_url=fac.website_url,
+        closed_holiday=fac.closed_holiday,
+        closed_other=fac.closed_other,
+        closed_weekly=fac.closed_weekly,
+        corporate_number=fac.corporate_number,
+        closed_weeks=json.loads(fac.closed_weeks) if isinstance(fac.closed_weeks, str) else fac.closed_weeks,
+        data_date=str(fac.data_date) if fac.data_date else None,
+        business_hours=[{
+            "slot": bh.slot_number,
+            "type": bh.hour_type,
+            "schedule": load_schedule(bh.schedule, bh.schedule_packed),
+        } for bh in fac.business_hours] if fac.business_hours else None,
+        specialities=[SpecialtyOut(
+            specialty_code=s.specialty_code,
+            specialty_name=s.specialty_name or specialty_names.get(s.specialty_code, ""),
+            time_slot=s.time_slot,
+            # JSONが残っていればそのまま（パック表現は時刻を正規化する）。--compact ではパック表現から
+            schedule=load_schedule(s.schedule, s.schedule_packed),
+            reception=load_schedule(s.reception, s.reception_packed),
+        ) for s in fac.specialities],
+        beds=BedOut.model_validate(fac.beds) if fac.beds else None,
+    )
+
+
+def render_kaigo_detail(fac: KaigoFacility) -> KaigoFacilityDetailOut:
+    return KaigoFacilityDetailOut(
+        id=fac.id,
+        service_code=fac.service_code,
+        service_type=fac.service_type,
+        name=fac.name,
+        name_kana=fac.name_kana,
+        prefecture_code=fac.prefecture_code,
+        prefecture_name=fac.prefecture_name,
+        city_code=fac.city_code,
+        city_name=fac.city_name,
+        address=fac.address,
+        address_detail=fac.address_detail,
+        latitude=fac.latitude,
+        longitude=fac.longitude,
+        phone=fac.phone,
+        fax=fac.fax,
+        corporate_number=fac.corporate_number,
+        corporate_name=fac.corporate_name,
+        available_days=parse_available_days(fac),
+        available_days_note=fac.available_days_note,
+        capacity=fac.capacity,
+        website_url=fac.website_url,
+        shared_service=fac.shared_service,
+        nursing_care_standard=fac.nursing_care_standard,
+        welfare_standard=fac.welfare_standard,
+        note=fac.note,
+        data_date=fac.data_date,
+    )
+
+
+def _table_exists(db: Session, name: str) -> bool:
+    if name in _known_tables:
+        return True
+    if inspect(db.get_bind()).has_table(name):
+        _known_tables.add(name)
+        return True
+    return False
+
+
+def _encode(body: bytes, compress: bool) -> bytes:
+    return zlib.compress(body, 9) if compress else body
+
+
+def _decode(body: Optional[bytes]) -> Optional[bytes]:
+    # zlib のストリームは 0x78 ("x") で始まるので JSON（"{" か "["）と区別できる
+    if body is not None and body[:1] == b"x":
+        return zlib.decompress(body)
+    return body
+
+
+def _get_document(db: Session, model, key: str) -> Optional[bytes]:
+    if not _table_exists(db, model.__tablename__):
+        return None
+    return _decode(db.execute(select(model.body).where(model.id == key)).scalar())
+
+
+def get_facility_document(db: Session, facility_id: str) -> Optional[bytes]:
+    """事前レンダリング済みの施設詳細JSON。未生成ならNone"""
+    return _get_document(db, FacilityDocument, facility_id)
+
+
+def get_kaigo_document(db: Session, facility_id: str) -> Optional[bytes]:
+    """事前レンダリング済みの事業所詳細JSON（サービス種別ごとの配列）。未生成ならNone"""
+    return _get_document(db, KaigoDocument, facility_id)
+
+
+def _content_hash(db: Session, tables) -> str:
+    """テーブルの全行のハッシュ（rowid 順）"""
+    digest = hashlib.sha1()
+    for table in tables:
+        digest.update(table.encode())
+        if not _table_exists(db, table):
+            continue
+        result = db.connection().exec_driver_sql(f"SELECT * FROM {table} ORDER BY rowid")
+        while True:
+            rows = result.fetchmany(BATCH_SIZE * 5)
+            if not rows:
+                break
+            digest.update(repr([tuple(r) for r in rows]).encode())
+    return digest.hexdigest()
+
+
+def _version(db: Session, sources) -> str:
+    return f"{RENDER_VERSION}|{_content_hash(db, sources)}"
+
+
+def _reset_table(db: Session, model, version_model, compress: Optional[bool]) -> bool:
+    """テーブルを空にして版の記録を消す。圧縮するかを返す（None なら前回の作り方に合わせる）"""
+    version_model.__table__.create(db.get_bind(), checkfirst=True)
+    model.__table__.create(db.get_bind(), checkfirst=True)
+    previous = db.get(version_model, model.__tablename__)
+    if compress is None:
+        compress = bool(previous and previous.compressed)
+    db.execute(delete(version_model).where(version_model.name == model.__tablename__))
+    db.execute(delete(model))
+    db.commit()
+    _known_tables.add(model.__tablename__)
+    return compress
+
+
+def _record_version(db: Session, model, version_model, version: str, compress: bool):
+    db.add(version_model(name=model.__tablename__, version=version, compressed=compress))
+    db.commit()
+
+
+def _is_stale(db: Session, model, version_model, sources) -> bool:
+    if not _table_exists(db, model.__tablename__) or not _table_exists(db, version_model.__tablename__):
+        return True
+    recorded = db.get(version_model, model.__tablename__)
+    return recorded is None or recorded.version != _version(db, sources)
+
+
+def build_facility_documents(db: Session, compress: Optional[bool] = None) -> int:
+    """facility_documents を全件再構築。生成件数を返す
+
+    compress=True なら body を zlib で圧縮する（--compact）。None なら前回の作り方に合わせる。
+    """
+    compress = _reset_table(db, FacilityDocument, DocumentVersion, compress)
+    version = _version(db, FACILITY_SOURCES)
+    specialty_names = get_specialty_names(db)
+    ids = [r[0] for r in db.query(Facility.id).order_by(Facility.id)]
+
+    for i in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[i:i + BATCH_SIZE]
+        facilities = (
+            db.query(Facility)
+            .options(
+                selectinload(Facility.specialities),
+                selectinload(Facility.business_hours),
+                selectinload(Facility.beds),
+                joinedload(Facility.prefecture),
+            )
+            .filter(Facility.id.in_(chunk))
+            .all()
+        )
+        db.execute(insert(FacilityDocument), [
+            {"id": fac.id, "body": _encode(
+                dumps(render_facility_detail(fac, specialty_names).model_dump(mode="json")), compress,
+            )}
+            for fac in facilities
+        ])
+        db.commit()
+        db.expunge_all()
+
+    _record_version(db, FacilityDocument, DocumentVersion, version, compress)
+    return db.query(func.count(FacilityDocument.id)).scalar()
+
+
+def build_kaigo_documents(db: Session, compress: Optional[bool] = None) -> int:
+    """kaigo_documents を全件再構築。生成件数（事業所番号の数）を返す"""
+    compress = _reset_table(db, KaigoDocument, KaigoDocumentVersion, compress)
+    version = _version(db, KAIGO_SOURCES)
+    ids = [r[0] for r in db.query(KaigoFacility.id).distinct().order_by(KaigoFacility.id)]
+
+    for i in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[i:i + BATCH_SIZE]
+        grouped = {}
+        for fac in (
+            db.query(KaigoFacility)
+            .filter(KaigoFacility.id.in_(chunk))
+            .order_by(KaigoFacility.id, KaigoFacility.service_code)
+        ):
+            grouped.setdefault(fac.id, []).append(render_kaigo_detail(fac).model_dump(mode="json"))
+        db.execute(insert(KaigoDocument), [
+            {"id": fid, "body": _encode(dumps(docs), compress)} for fid, docs in grouped.items()
+        ])
+        db.commit()
+        db.expunge_all()
+
+    _record_version(db, KaigoDocument, KaigoDocumentVersion, version, compress)
+    return db.query(func.count(KaigoDocument.id)).scalar()
+
+
+def facility_documents_stale(db: Session) -> bool:
+    """未生成、または記録した版（レンダリングの版・元テーブルの中身）が今と違えばTrue"""
+    return _is_stale(db, FacilityDocument, DocumentVersion, FACILITY_SOURCES)
+
+
+def kaigo_documents_stale(db: Session) -> bool:
+    return _is_stale(db, KaigoDocument, KaigoDocumentVersion, KAIGO_SOURCES)
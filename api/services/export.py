@@ -0,0 +1,134 @@
+"""一括エクスポート（NDJSON / CSV / GeoJSON のストリーミング）
+
+ページングAPIを何千回も叩く代わりに、検索と同じ絞り込みの結果を1本のレスポンスで返す。
+行は yield_per でサーバー側カーソルから少しずつ取り出し、一定量ずつ書き出すので
+件数に関わらずメモリ使用量は一定。gzip=true のときは zlib のストリーム圧縮を通す。
+"""
+import csv
+import io
+import zlib
+from typing import Iterator, Sequence
+
+from sqlalchemy.orm import Query, Session
+
+from ..fastjson import dumps
+from ..models import Facility, Prefecture
+from ..kaigo_models import KaigoFacility
+from .search import filter_facilities
+from .kaigo_search import filter_kaigo
+
+FORMATS = ("ndjson", "csv", "geojson")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "geojson": "application/geo+json",
+}
+
+FETCH_SIZE = 1000      # サーバー側カーソルから一度に取り出す行数
+CHUNK_BYTES = 64 * 1024
+
+
+def iter_rows(query: Query, columns: Sequence[str]) -> Iterator[dict]:
+    """query（with_entities 済み）の各行を columns をキーとするdictで返す"""
+    for row in query.execution_options(yield_per=FETCH_SIZE):
+        yield dict(zip(columns, row))
+
+
+def _ndjson(rows: Iterator[dict], columns: Sequence[str]) -> Iterator[bytes]:
+    for row in rows:
+        yield dumps(row) + b"\n"
+
+
+def _csv(rows: Iterator[dict], columns: Sequence[str]) -> Iterator[bytes]:
+    # Excelで文字化けしないようBOM付きUTF-8
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\r\n")
+    writer.writerow(columns)
+    yield b"\xef\xbb\xbf" + buf.getvalue().encode("utf-8")
+    for row in rows:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(["" if v is None else v for v in row.values()])
+        yield buf.getvalue().encode("utf-8")
+
+
+def _geojson(rows: Iterator[dict], columns: Sequence[str]) -> Iterator[bytes]:
+    """FeatureCollection を1件ずつ書き出す。座標の無い行は geometry: null"""
+    yield b'{"type":"FeatureCollection","features":['
+    sep = b""
+    for row in rows:
+        lat, lng = row.pop("latitude", None), row.pop("longitude", None)
+        geometry = None if lat is None or lng is None else {"type": "Point", "coordinates": [lng, lat]}
+        yield sep + dumps({"type": "Feature", "geometry": geometry, "properties": row})
+        sep = b","
+    yield b"]}"
+
+
+_WRITERS = {"ndjson": _ndjson, "csv": _csv, "geojson": _geojson}
+
+
+def _chunked(parts: Iterator[bytes]) -> Iterator[bytes]:
+    buf, size = [], 0
+    for part in parts:
+        buf.append(part)
+        size += len(part)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield b"".join(buf)
+
+
+def _gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzipヘッダ付き
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encode_rows(rows: Iterator[dict], columns: Sequence[str], fmt: str, gzip: bool = False) -> Iterator[bytes]:
+    """行を fmt 形式のバイト列（CHUNK_BYTES 程度ずつ）に変換"""
+    chunks = _chunked(_WRITERS[fmt](rows, columns))
+    return _gzipped(chunks) if gzip else chunks
+
+
+# --- データセット ---
+
+FACILITY_COLUMNS = (
+    "id", "facility_type", "name", "prefecture_code", "prefecture_name", "city_code",
+    "address", "latitude", "longitude", "website_url", "corporate_number",
+)
+
+KAIGO_COLUMNS = (
+    "id", "service_code", "service_type", "name", "prefecture_code", "prefecture_name",
+    "city_code", "city_name", "address", "latitude", "longitude", "phone",
+    "corporate_number", "corporate_name", "capacity", "website_url",
+)
+
+
+def export_facilities(db: Session, fmt: str, gzip: bool = False, **filters) -> Iterator[bytes]:
+    """医療施設（search_facilities と同じ絞り込み、ID順。フリーワードのヒットは打ち切らない）"""
+    query = (
+        filter_facilities(db, db.query(Facility), fts_limit=None, **filters)
+        .outerjoin(Prefecture, Prefecture.code == Facility.prefecture_code)
+        .with_entities(
+            Facility.id, Facility.facility_type, Facility.name, Facility.prefecture_code, Prefecture.name,
+            Facility.city_code, Facility.address, Facility.latitude, Facility.longitude,
+            Facility.website_url, Facility.corporate_number,
+        )
+        .order_by(Facility.id)
+    )
+    return encode_rows(iter_rows(query, FACILITY_COLUMNS), FACILITY_COLUMNS, fmt, gzip)
+
+
+def export_kaigo(db: Session, fmt: str, gzip: bool = False, **filters) -> Iterator[bytes]:
+    """介護事業所（search_kaigo と同じ絞り込み、事業所番号・サービスコード順）"""
+    query = (
+        filter_kaigo(db, db.query(KaigoFacility), **filters)
+        .with_entities(*(getattr(KaigoFacility, c) for c in KAIGO_COLUMNS))
+        .order_by(KaigoFacility.id, KaigoFacility.service_code)
+    )
+    return encode_rows(iter_rows(query, KAIGO_COLUMNS), KAIGO_COLUMNS, fmt, gzip)
@@ -0,0 +1,261 @@
+"""検索結果のファセット集計（種別・都道府県・市区町村・診療科ごとの件数）
+
+絞り込み済みの行を MATERIALIZED な CTE に1回だけ評価し、ファセットごとの GROUP BY を
+UNION ALL でまとめた1文で全ファセットの件数を取る（値ごとに count() を発行しない）。
+診療時間の条件（open_now / open_at / open_within）は施設IDの集合で判定するため、SQLの場合は施設リストを Counter で数える。
+ビットマップインデックス（bitmap_index.py）で表せる条件なら、候補集合と値ごとの Bitmap の
+AND の件数で済ませ、SQLには触れない。
+
+戻り値: {"type": [{"value": "2", "label": "診療所", "count": 1203}, ...], ...}
+  件数の多い順に limit 件まで。prefecture_code は city のみ値が入る。
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, cast, func, literal, null, select, union_all
+from sqlalchemy.orm import Session, selectinload
+
+from ..models import Facility, Specialty
+from ..kaigo_models import KaigoFacility
+from .search import (
+    filter_facilities, filter_open, get_prefecture_names, get_city_names, get_specialty_names,
+    bitmap_candidates, candidate_bitmap, hours_bitmap, hours_ids, FACILITY_TYPE_NAMES,
+)
+from .bitmap_index import get_facility_bitmap_index, get_kaigo_bitmap_index
+from .kaigo_search import filter_kaigo, kaigo_bitmap_candidates, kaigo_candidate_bitmap, DAY_BITS
+
+FACILITY_FACETS = ("type", "prefecture", "city", "specialty")
+KAIGO_FACETS = ("service", "prefecture", "city", "available_day")
+
+DAY_LABELS = {
+    "mon": "月", "tue": "火", "wed": "水", "thu": "木", "fri": "金", "sat": "土", "sun": "日", "holiday": "祝日",
+}
+
+
+def parse_facets(value: Optional[str]) -> List[str]:
+    """"type,city" → ["type", "city"]（重複は除く）"""
+    if not value:
+        return []
+    return list(dict.fromkeys(v.strip() for v in value.split(",") if v.strip()))
+
+
+def _facet_row(facet: str, value, parent, label, count):
+    """UNION ALL の各SELECTを (facet, value, parent, label, count) の列にそろえる"""
+    return select(
+        literal(facet).label("facet"), cast(value, String).label("value"),
+        parent.label("parent"), label.label("label"), count.label("count"),
+    )
+
+
+def _collect(db: Session, selects) -> Dict[str, Dict[tuple, tuple]]:
+    """facet → {(value, parent): (label, count)}"""
+    found: Dict[str, Dict[tuple, tuple]] = {}
+    if not selects:
+        return found
+    for facet, value, parent, label, count in db.execute(union_all(*selects)):
+        found.setdefault(facet, {})[(value, parent)] = (label, count)
+    return found
+
+
+def _top(counts: Dict[tuple, tuple], limit: int) -> List[dict]:
+    items = sorted(counts.items(), key=lambda kv: (-kv[1][1], kv[0][1] or "", kv[0][0] or ""))
+    return [
+        {"value": value, "label": label, "count": count, "prefecture_code": parent}
+        for (value, parent), (label, count) in items[:limit]
+    ]
+
+
+# --- 医療施設 ---
+
+# 診療時間で絞った後のリストから診療科ごとに数えるため、診療科コードだけ読む
+_specialty_codes = selectinload(Facility.specialities).load_only(Specialty.specialty_code)
+
+
+def _facility_counts_sql(db: Session, query, names: Sequence[str]) -> Dict[str, Dict[tuple, tuple]]:
+    base = (
+        query.with_entities(
+            Facility.id.label("id"), Facility.facility_type.label("facility_type"),
+            Facility.prefecture_code.label("prefecture_code"), Facility.city_code.label("city_code"),
+        )
+        .cte("base")
+        .prefix_with("MATERIALIZED")
+    )
+    n = func.count()
+    selects = []
+    if "type" in names:
+        selects.append(_facet_row("type", base.c.facility_type, null(), null(), n)
+                       .group_by(base.c.facility_type))
+    if "prefecture" in names:
+        selects.append(_facet_row("prefecture", base.c.prefecture_code, null(), null(), n)
+                       .group_by(base.c.prefecture_code))
+    if "city" in names:
+        selects.append(_facet_row("city", base.c.city_code, base.c.prefecture_code, null(), n)
+                       .group_by(base.c.prefecture_code, base.c.city_code))
+    if "specialty" in names:
+        # 1施設が同じ診療科を時間帯ごとに複数行持つので施設数で数える
+        selects.append(
+            _facet_row("specialty", Specialty.specialty_code, null(), null(),
+                       func.count(func.distinct(Specialty.facility_id)))
+            .join(base, base.c.id == Specialty.facility_id)
+            .where(Specialty.specialty_code.isnot(None))
+            .group_by(Specialty.specialty_code)
+        )
+    return _collect(db, selects)
+
+
+def _facility_counts_list(facilities, names: Sequence[str]) -> Dict[str, Dict[tuple, tuple]]:
+    """open_now 判定後の施設リストから同じ形の集計を作る"""
+    counters = {name: Counter() for name in names}
+    for fac in facilities:
+        if "type" in counters:
+            counters["type"][(str(fac.facility_type), None)] += 1
+        if "prefecture" in counters:
+            counters["prefecture"][(fac.prefecture_code, None)] += 1
+        if "city" in counters:
+            counters["city"][(fac.city_code, fac.prefecture_code)] += 1
+        if "specialty" in counters:
+            for code in {sp.specialty_code for sp in fac.specialities if sp.specialty_code}:
+                counters["specialty"][(code, None)] += 1
+    return {name: {k: (None, v) for k, v in c.items()} for name, c in counters.items()}
+
+
+def _facility_label(db: Session, name: str, value: str, parent: Optional[str]) -> Optional[str]:
+    if name == "type":
+        return FACILITY_TYPE_NAMES.get(int(value))
+    if name == "prefecture":
+        return get_prefecture_names(db).get(value)
+    if name == "city":
+        return get_city_names(db).get((parent, value))
+    return get_specialty_names(db).get(value)
+
+
+def _facility_counts_bitmap(index, candidates, names: Sequence[str]) -> Dict[str, Dict[tuple, tuple]]:
+    """ビットマップインデックスの値ごとの Bitmap と候補集合の AND の件数"""
+    found = {}
+    for name in names:
+        counts = index.counts(name, candidates)
+        if name == "city":
+            found[name] = {(city, pref): (None, n) for (pref, city), n in counts.items()}
+        else:
+            found[name] = {(str(value), None): (None, n) for value, n in counts.items()}
+    return found
+
+
+def facility_facets(
+    db: Session,
+    names: Sequence[str],
+    limit: int = 50,
+    open_now: bool = False,
+    open_at: Optional[datetime] = None,
+    open_within: Optional[int] = None,
+    near: Optional[Tuple[float, float, float]] = None,
+    **filters,
+) -> Dict[str, List[dict]]:
+    """search_facilities と同じ絞り込み（filters と診療時間の条件）の結果に対するファセット件数
+
+    near=(緯度, 経度, 半径km) を渡すとその範囲内の施設だけ数える
+    """
+    hours = {"open_now": open_now, "open_at": open_at, "open_within": open_within}
+    index = get_facility_bitmap_index(db)
+    if near is not None:
+        lat, lng, radius_km = near
+        candidates = index.points.within(lat, lng, radius_km, candidate_bitmap(db, index, **hours, **filters))
+    else:
+        candidates = bitmap_candidates(db, index, **filters)
+        open_bitmap = hours_bitmap(db, index, **hours) if candidates is not None else None
+        if open_bitmap is not None:
+            candidates = candidates & open_bitmap
+    if candidates is not None:
+        found = _facility_counts_bitmap(index, candidates, names)
+    else:
+        query = filter_facilities(db, db.query(Facility), **filters)
+        open_ids = hours_ids(db, **hours)
+        if open_ids is not None:
+            found = _facility_counts_list(filter_open(query.options(_specialty_codes), open_ids), names)
+        else:
+            found = _facility_counts_sql(db, query, names)
+
+    facets = {}
+    for name in names:
+        counts = {
+            (value, parent): (_facility_label(db, name, value, parent), count)
+            for (value, parent), (_, count) in found.get(name, {}).items()
+        }
+        facets[name] = _top(counts, limit)
+    return facets
+
+
+# --- 介護事業所 ---
+
+def kaigo_facets(
+    db: Session,
+    names: Sequence[str],
+    limit: int = 50,
+    near: Optional[Tuple[float, float, float]] = None,
+    **filters,
+) -> Dict[str, List[dict]]:
+    """search_kaigo と同じ絞り込み（filters）の結果に対するファセット件数（事業所×サービスの行数）
+
+    near=(緯度, 経度, 半径km) を渡すとその範囲内だけ数える
+    """
+    index = get_kaigo_bitmap_index(db)
+    if near is not None:
+        lat, lng, radius_km = near
+        candidates = index.points.within(lat, lng, radius_km, kaigo_candidate_bitmap(db, index, **filters))
+    else:
+        candidates = kaigo_bitmap_candidates(db, index, **filters)
+    if candidates is not None:
+        facets = {}
+        for name in names:
+            field = "day" if name == "available_day" else name
+            labels = DAY_LABELS if name == "available_day" else index.labels[name]
+            counts = {}
+            for value, n in index.counts(field, candidates).items():
+                key = (value[1], value[0]) if name == "city" else (value, None)
+                counts[key] = (labels.get(value), n)
+            facets[name] = _top(counts, limit)
+        return facets
+
+    base = (
+        filter_kaigo(db, db.query(KaigoFacility), **filters)
+        .with_entities(
+            KaigoFacility.service_code.label("service_code"), KaigoFacility.service_type.label("service_type"),
+            KaigoFacility.prefecture_code.label("prefecture_code"),
+            KaigoFacility.prefecture_name.label("prefecture_name"),
+            KaigoFacility.city_code.label("city_code"), KaigoFacility.city_name.label("city_name"),
+            KaigoFacility.available_days_mask.label("available_days_mask"),
+        )
+        .cte("base")
+        .prefix_with("MATERIALIZED")
+    )
+    n = func.count()
+    selects = []
+    if "service" in names:
+        selects.append(_facet_row("service", base.c.service_code, null(), func.max(base.c.service_type), n)
+                       .group_by(base.c.service_code))
+    if "prefecture" in names:
+        selects.append(_facet_row("prefecture", base.c.prefecture_code, null(), func.max(base.c.prefecture_name), n)
+                       .group_by(base.c.prefecture_code))
+    if "city" in names:
+        selects.append(_facet_row("city", base.c.city_code, base.c.prefecture_code, func.max(base.c.city_name), n)
+                       .group_by(base.c.prefecture_code, base.c.city_code))
+    if "available_day" in names:
+        # マスクは高々256通りなのでマスク単位で数えてから曜日ビットに振り分ける
+        selects.append(_facet_row("available_day", base.c.available_days_mask, null(), null(), n)
+                       .where(base.c.available_days_mask.isnot(None))
+                       .group_by(base.c.available_days_mask))
+    found = _collect(db, selects)
+
+    facets = {}
+    for name in names:
+        counts = found.get(name, {})
+        if name == "available_day":
+            by_day = Counter()
+            for (mask, _), (_, count) in counts.items():
+                for day, bit in DAY_BITS.items():
+                    if int(mask) & bit:
+                        by_day[day] += count
+            counts = {(day, None): (DAY_LABELS[day], c) for day, c in by_day.items()}
+        facets[name] = _top(counts, limit)
+    return facets
@@ -4,7 +4,9 @@ SQLiteのFTS5仮想テーブルを使い、施設名・住所の高速全文検
 PostgreSQL等に移行する場合はこのモジュールを差し替えるだけでよい。
 """
 import logging
-from sqlalchemy import text
+from typing import Optional
+
+from sqlalchemy import literal_column, select, text
 from sqlalchemy.orm import Session
 
 from ..config import DATABASE_URL
@@ -67,8 +69,18 @@ def rebuild_fts_index(db: Session) -> int:
     return count
 
 
-def fts_search(db: Session, query: str, limit: int = 1000) -> list:
-    """FTS5で施設IDを検索。facility_idのリストを返す。
+def fts_match(query: str) -> str:
+    """フリーワード → FTS5 の MATCH 式（語の AND）。trigram で引けない（3文字未満の語がある・空）なら空文字"""
+    # 全角英数→半角に正規化してからFTS検索
+    terms = _normalize(query).strip().split()
+    # trigramトークナイザ: 3文字未満のtermがあればFTS不可
+    if not terms or any(len(t) < 3 for t in terms):
+        return ""
+    return " AND ".join(f'"{t}"' for t in terms)
+
+
+def fts_search(db: Session, query: str, limit: Optional[int] = 1000) -> list:
+    """FTS5で施設IDを検索。facility_idのリストを返す（limit=None なら全件）。
     
     FTS5が利用不可の場合は空リストを返す（呼び出し元がLIKEにフォールバック）。
     """
@@ -83,23 +95,29 @@ def fts_search(db: Session, query: str, limit: int = 1000) -> list:
         if not exists:
             return []
 
-        # 全角英数→半角に正規化してからFTS検索
-        normalized = _normalize(query)
-        terms = normalized.strip().split()
-
-        # trigramトークナイザ: 3文字未満のtermがあればFTS不可→空リスト返してLIKEフォールバック
-        if any(len(t) < 3 for t in terms):
-            return []
-
-        fts_query = " AND ".join(f'"{t}"' for t in terms if t)
+        fts_query = fts_match(query)
         if not fts_query:
             return []
 
-        rows = db.execute(
-            text("SELECT facility_id FROM facilities_fts WHERE facilities_fts MATCH :q LIMIT :lim"),
-            {"q": fts_query, "lim": limit}
-        ).fetchall()
+        sql = "SELECT facility_id FROM facilities_fts WHERE facilities_fts MATCH :q"
+        params = {"q": fts_query}
+        if limit is not None:
+            sql += " LIMIT :lim"
+            params["lim"] = limit
+        rows = db.execute(text(sql), params).fetchall()
         return [r[0] for r in rows]
     except Exception as e:
         logger.warning(f"FTS5 search failed, falling back to LIKE: {e}")
         return []
+
+
+def fts_subquery(query: str):
+    """MATCH する facility_id の副問い合わせ（件数で打ち切らず、IDを Python に取り出さない）
+
+    fts_search でヒットがあることを確かめてから使う（FTS5 が無い・引けない語では使えない）。
+    """
+    return (
+        select(literal_column("facility_id"))
+        .select_from(text("facilities_fts"))
+        .where(text("facilities_fts MATCH :fts_q").bindparams(fts_q=fts_match(query)))
+    )
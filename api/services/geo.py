@@ -3,6 +3,10 @@ import math
 
 EARTH_RADIUS_KM = 6371.0
 
+# 施設データのある範囲（与那国島〜南鳥島、沖ノ鳥島〜宗谷岬）。格子を使う検索の地点はこの範囲に限る
+MIN_LAT, MAX_LAT = 20.0, 46.0
+MIN_LNG, MAX_LNG = 122.0, 154.0
+
 
 def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """2点間の距離をkmで返す（haversine公式）"""
@@ -0,0 +1,107 @@
+"""緯度経度の格子セルのリング探索（spatial.GridIndex・points.PointGrid 共通）
+
+中心セルからチェビシェフ距離 r のセル（リング）を内側から順に返す。
+
+- リングはデータのあるセルの範囲（extent）に切り詰め、範囲にかからないリングは飛ばす
+- 地点が範囲の外なら、リングの外側までの距離の下限が役に立たない（極付近では経度差が距離にならない）ので
+  max_km 以内にかかり得るセルを1回でまとめて返す
+- 見たセル数がデータのあるセル数を超えたら、残りのセルは1回でまとめて返す
+  （高緯度で半径が大きい場合でも、手間はデータのあるセル数の2倍まで）
+
+    for bound, cells in rings(grid.cells, grid.extent, 0.02, lat, lng, max_km=5.0):
+        ...                         # cells: このリングのデータのあるセル
+        if bound > max_km:          # bound: まだ返していないセルの点までの最短距離km
+            break
+"""
+import math
+from typing import Collection, Iterator, List, Tuple
+
+KM_PER_DEG = 111.0
+MAX_LAT = 89.0
+
+Cell = Tuple[int, int]
+Extent = Tuple[int, int, int, int]   # (最小y, 最大y, 最小x, 最大x)。空なら (0, -1, 0, -1)
+
+EMPTY: Extent = (0, -1, 0, -1)
+
+
+def cell_of(lat: float, lng: float, cell_deg: float) -> Cell:
+    return int(math.floor(lat / cell_deg)), int(math.floor(lng / cell_deg))
+
+
+def extent_of(cells: Collection[Cell]) -> Extent:
+    if not cells:
+        return EMPTY
+    ys, xs = [c[0] for c in cells], [c[1] for c in cells]
+    return min(ys), max(ys), min(xs), max(xs)
+
+
+def grow(extent: Extent, cell: Cell) -> Extent:
+    """cell を含むように広げた範囲"""
+    y0, y1, x0, x1 = extent
+    if y0 > y1:
+        return cell[0], cell[0], cell[1], cell[1]
+    return min(y0, cell[0]), max(y1, cell[0]), min(x0, cell[1]), max(x1, cell[1])
+
+
+def ring_km(lat: float, reach_km: float, extent: Extent, cell_deg: float) -> float:
+    """リング1つ分の距離の下限km
+
+    経度方向のセル幅が最も狭くなる緯度（探索範囲とデータの範囲の高緯度側）の cos で保守的に見積もる。
+    """
+    far_lat = abs(lat) + reach_km / KM_PER_DEG + cell_deg
+    y0, y1, _, _ = extent
+    if y0 <= y1:
+        far_lat = min(far_lat, max(abs(y0), abs(y1 + 1)) * cell_deg)
+    far_lat = min(max(far_lat, abs(lat)), MAX_LAT)
+    return cell_deg * KM_PER_DEG * math.cos(math.radians(far_lat))
+
+
+def _clipped_ring(cy: int, cx: int, r: int, extent: Extent) -> Iterator[Cell]:
+    """中心セルからチェビシェフ距離 r のセルのうち範囲内のもの"""
+    y0, y1, x0, x1 = extent
+    if r == 0:
+        yield cy, cx
+        return
+    xs = range(max(cx - r, x0), min(cx + r, x1) + 1)
+    for y in (cy - r, cy + r):
+        if y0 <= y <= y1:
+            for x in xs:
+                yield y, x
+    ys = range(max(cy - r + 1, y0), min(cy + r - 1, y1) + 1)
+    for x in (cx - r, cx + r):
+        if x0 <= x <= x1:
+            for y in ys:
+                yield y, x
+
+
+def rings(
+    cells: Collection[Cell], extent: Extent, cell_deg: float, lat: float, lng: float, max_km: float = math.inf,
+) -> Iterator[Tuple[float, List[Cell]]]:
+    """(まだ返していないセルの点までの最短距離km, データのあるセル) を内側のリングから順に
+
+    max_km より外のリングは返さない。残りをまとめて返したときの距離は inf。
+    """
+    y0, y1, x0, x1 = extent
+    if y0 > y1:
+        return
+    cy, cx = cell_of(lat, lng, cell_deg)
+    step = ring_km(lat, max_km, extent, cell_deg)
+    first = max(0, y0 - cy, cy - y1, x0 - cx, cx - x1)
+    last = max(cy - y0, y1 - cy, cx - x0, x1 - cx)
+    if max_km < math.inf:
+        last = min(last, int(max_km / step) + 1)
+    if first > last:
+        return
+    if first > 0:
+        yield math.inf, [c for c in cells if max(abs(c[0] - cy), abs(c[1] - cx)) <= last]
+        return
+
+    budget = len(cells)
+    for r in range(first, last + 1):
+        ring = list(_clipped_ring(cy, cx, r, extent))
+        budget -= len(ring)
+        if budget < 0:
+            yield math.inf, [c for c in cells if r <= max(abs(c[0] - cy), abs(c[1] - cx)) <= last]
+            return
+        yield r * step, [c for c in ring if c in cells]
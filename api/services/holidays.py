@@ -0,0 +1,91 @@
+"""日本の祝日（国民の祝日に関する法律）
+
+年ごとに計算してキャッシュする。DB非依存の純粋関数のみ。
+ハッピーマンデー・春分/秋分（1980〜2099年の近似式）・振替休日・国民の休日（前後が祝日の平日）と、
+2019〜2021年の特例（即位関連・東京五輪による移動）に対応する。
+
+    is_holiday(date(2026, 5, 6))   # → True（振替休日）
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict
+
+# 春分/秋分の近似式が使える年（これ以外の年の日時は受け付けない）
+MIN_YEAR, MAX_YEAR = 1980, 2099
+
+# 東京五輪の特例で移動した祝日
+_MOVED = {
+    2020: {"海の日": (7, 23), "スポーツの日": (7, 24), "山の日": (8, 10)},
+    2021: {"海の日": (7, 22), "スポーツの日": (7, 23), "山の日": (8, 8)},
+}
+
+
+def _nth_monday(year: int, month: int, n: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(7 - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _equinox(year: int, base: float) -> int:
+    return int(base + 0.242194 * (year - 1980) - (year - 1980) // 4)
+
+
+def _base_holidays(year: int) -> Dict[date, str]:
+    moved = _MOVED.get(year)
+    days = [
+        (date(year, 1, 1), "元日"),
+        (_nth_monday(year, 1, 2), "成人の日"),
+        (date(year, 2, 11), "建国記念の日"),
+        (date(year, 3, _equinox(year, 20.8431)), "春分の日"),
+        (date(year, 4, 29), "昭和の日"),
+        (date(year, 5, 3), "憲法記念日"),
+        (date(year, 5, 4), "みどりの日"),
+        (date(year, 5, 5), "こどもの日"),
+        (_nth_monday(year, 9, 3), "敬老の日"),
+        (date(year, 9, _equinox(year, 23.2488)), "秋分の日"),
+        (date(year, 11, 3), "文化の日"),
+        (date(year, 11, 23), "勤労感謝の日"),
+    ]
+    if moved:
+        days += [(date(year, month, day), name) for name, (month, day) in moved.items()]
+    else:
+        days.append((_nth_monday(year, 7, 3), "海の日"))
+        days.append((_nth_monday(year, 10, 2), "スポーツの日" if year >= 2020 else "体育の日"))
+        if year >= 2016:
+            days.append((date(year, 8, 11), "山の日"))
+    if year >= 2020:
+        days.append((date(year, 2, 23), "天皇誕生日"))
+    elif year <= 2018:
+        days.append((date(year, 12, 23), "天皇誕生日"))
+    if year == 2019:
+        days += [(date(2019, 5, 1), "即位の日"), (date(2019, 10, 22), "即位礼正殿の儀")]
+    return dict(days)
+
+
+@lru_cache(maxsize=None)
+def jp_holidays(year: int) -> Dict[date, str]:
+    """year 年の祝日 {日付: 名称}（振替休日・国民の休日を含む）"""
+    holidays = _base_holidays(year)
+
+    # 国民の休日: 前日と翌日が祝日の平日
+    for day in sorted(holidays):
+        between = day + timedelta(days=2)
+        gap = day + timedelta(days=1)
+        if between in holidays and gap not in holidays and gap.weekday() != 6:
+            holidays[gap] = "国民の休日"
+
+    # 振替休日: 日曜の祝日の後の最初の祝日でない日
+    for day in sorted(holidays):
+        if day.weekday() == 6:
+            substitute = day + timedelta(days=1)
+            while substitute in holidays:
+                substitute += timedelta(days=1)
+            holidays[substitute] = "振替休日"
+    return dict(sorted(holidays.items()))
+
+
+def is_holiday(day: date) -> bool:
+    return day in jp_holidays(day.year)
+
+
+def holiday_name(day: date):
+    return jp_holidays(day.year).get(day)
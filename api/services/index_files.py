@@ -0,0 +1,235 @@
+"""インデックスのフラットファイル（インポート時に書き出し、各ワーカーが mmap で読む）
+
+uvicorn のワーカーごとに SQLite から同じインデックスを作るとメモリも起動時間もワーカー数倍になる。
+座標・ID・ビットマップを固定レイアウトのファイルに書いておき、読み込みは mmap して
+memoryview を配列として使うだけにする（ページは OS のページキャッシュを全ワーカーで共有する）。
+
+    MAGIC(8) + ヘッダ長(uint64) + ヘッダJSON（空白で8バイト境界に揃える） + 区画（8バイト境界）...
+
+ヘッダ: {"version": 元DBのバージョン, "byteorder": ..., "meta": {...},
+         "sections": {名前: [ヘッダの後ろからの offset, バイト数, 型コード]}}
+
+    writer = IndexWriter()
+    writer.array("lats", "d", lats)
+    writer.keys("keys", ids)
+    meta = {"type": writer.bitmap_map(fields["type"])}
+    writer.write(path, version, meta)
+
+    f = IndexFile.open(path, version)      # 無い・版が違う・壊れている → None
+    f.array("lats")[i], f.keys("keys").get(fid), f.bitmap_map(f.meta["type"])[1]
+"""
+import json
+import logging
+import mmap
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Optional
+
+from .bitmap import Bitmap
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MEDIDX01"
+ALIGN = 8
+KEY_SEP = "\t"     # タプルのキー（介護の (事業所番号, サービスコード)）の区切り
+
+
+def _pad(n: int) -> int:
+    return -n % ALIGN
+
+
+def encode_value(value):
+    """属性値を JSON に（タプルはリストになる）"""
+    return list(value) if isinstance(value, tuple) else value
+
+
+def decode_value(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+class KeyTable(Sequence):
+    """昇順の文字列キー（offsets + UTF-8 の連結）。keys[i] と、二分探索で通し番号を引く get"""
+
+    def __init__(self, offsets: memoryview, blob: memoryview, split: bool = False):
+        self.offsets = offsets
+        self.blob = blob
+        self.split = split
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int):
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        i %= len(self)
+        key = str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+        return tuple(key.split(KEY_SEP)) if self.split else key
+
+    def get(self, key) -> Optional[int]:
+        i = bisect_left(self, key)
+        return i if i < len(self) and self[i] == key else None
+
+
+class BitmapTable:
+    """i 番目の Bitmap（初回アクセスで読み、覚えておく）"""
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+        self._loaded: Dict[int, Bitmap] = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> Bitmap:
+        bm = self._loaded.get(i)
+        if bm is None:
+            bm = self._loaded[i] = Bitmap.from_buffer(self.data[self.offsets[i]:self.offsets[i + 1]])
+        return bm
+
+
+class BitmapMap(Mapping):
+    """値 → Bitmap（dict の代わり。値の順はファイルに書いた順）"""
+
+    def __init__(self, table: BitmapTable, ids: Dict[Hashable, int]):
+        self.table = table
+        self.ids = ids
+
+    def __getitem__(self, value) -> Bitmap:
+        return self.table[self.ids[value]]
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class BitmapList(Sequence):
+    """通し番号 → Bitmap（list の代わり）"""
+
+    def __init__(self, table: BitmapTable, ids: List[int]):
+        self.table = table
+        self.ids = ids
+
+    def __getitem__(self, i: int) -> Bitmap:
+        return self.table[self.ids[i]]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class IndexWriter:
+    def __init__(self):
+        self.sections: Dict[str, tuple] = {}   # 名前 → (型コード, bytes)
+        self.bitmaps: List[bytes] = []
+
+    def array(self, name: str, typecode: str, values: Iterable):
+        self.sections[name] = (typecode, array(typecode, values).tobytes())
+
+    def keys(self, name: str, keys: Iterable):
+        """昇順のキー（タプルは KEY_SEP で連結）"""
+        offsets, blobs, pos = array("Q", [0]), [], 0
+        for key in keys:
+            blob = (KEY_SEP.join(key) if isinstance(key, tuple) else key).encode()
+            blobs.append(blob)
+            pos += len(blob)
+            offsets.append(pos)
+        self.sections[f"{name}.offsets"] = ("Q", offsets.tobytes())
+        self.sections[f"{name}.blob"] = ("B", b"".join(blobs))
+
+    def bitmap(self, bm: Bitmap) -> int:
+        """Bitmap を表に加えて番号を返す"""
+        self.bitmaps.append(bm.to_bytes())
+        return len(self.bitmaps) - 1
+
+    def bitmap_map(self, postings: Dict[Hashable, Bitmap]) -> list:
+        """値 → Bitmap を [[値, 番号], ...]（meta に入れる）"""
+        return [[encode_value(value), self.bitmap(bm)] for value, bm in postings.items()]
+
+    def bitmap_list(self, bitmaps: Iterable[Bitmap]) -> List[int]:
+        return [self.bitmap(bm) for bm in bitmaps]
+
+    def write(self, path: Path, version: str, meta: dict):
+        """一時ファイルに書いてから置き換える（読み込み中のワーカーは古いファイルを mmap したまま）"""
+        offsets, pos = array("Q", [0]), 0
+        for blob in self.bitmaps:
+            pos += len(blob) + _pad(len(blob))
+            offsets.append(pos)
+        sections = dict(self.sections)
+        sections["bitmaps.offsets"] = ("Q", offsets.tobytes())
+        sections["bitmaps.data"] = ("B", b"".join(blob + bytes(_pad(len(blob))) for blob in self.bitmaps))
+
+        layout, pos = {}, 0
+        for name, (typecode, data) in sections.items():
+            layout[name] = [pos, len(data), typecode]
+            pos += len(data) + _pad(len(data))
+        header = json.dumps(
+            {"version": version, "byteorder": sys.byteorder, "meta": meta, "sections": layout}, ensure_ascii=False,
+        ).encode()
+        header += b" " * _pad(len(header))
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for name, (_, data) in sections.items():
+                f.write(data)
+                f.write(bytes(_pad(len(data))))
+        tmp.replace(path)
+
+
+class IndexFile:
+    """mmap したインデックスファイル（区画は memoryview で返し、コピーしない）"""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path}: インデックスファイルではありません")
+        size = int.from_bytes(view[len(MAGIC):len(MAGIC) + 8], "little")
+        self.base = len(MAGIC) + 8 + size
+        header = json.loads(bytes(view[len(MAGIC) + 8:self.base]))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path}: バイト順が違います")
+        self.version: str = header["version"]
+        self.meta: dict = header["meta"]
+        self.sections: Dict[str, list] = header["sections"]
+        self._view = view
+        self.bitmaps = BitmapTable(self.array("bitmaps.offsets"), self.array("bitmaps.data"))
+
+    @classmethod
+    def open(cls, path: Path, version: str) -> Optional["IndexFile"]:
+        """path のファイルが version のものなら開く。無い・古い・読めない場合は None"""
+        if not path.exists():
+            return None
+        try:
+            index_file = cls(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Index file {path} unreadable: {e}")
+            return None
+        if index_file.version != version:
+            logger.info(f"Index file {path} is stale ({index_file.version} != {version})")
+            return None
+        return index_file
+
+    def array(self, name: str) -> memoryview:
+        offset, size, typecode = self.sections[name]
+        view = self._view[self.base + offset:self.base + offset + size]
+        return view if typecode == "B" else view.cast(typecode)
+
+    def keys(self, name: str, split: bool = False) -> KeyTable:
+        return KeyTable(self.array(f"{name}.offsets"), self.array(f"{name}.blob"), split)
+
+    def bitmap_map(self, pairs: list) -> BitmapMap:
+        return BitmapMap(self.bitmaps, {decode_value(value): i for value, i in pairs})
+
+    def bitmap_list(self, ids: List[int]) -> BitmapList:
+        return BitmapList(self.bitmaps, ids)
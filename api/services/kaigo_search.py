@@ -3,13 +3,108 @@ import json
 import logging
 from typing import Optional, List, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, text
+from sqlalchemy import func, or_, text, tuple_
 
+from ..cache import engine_version
 from ..kaigo_models import KaigoFacility, KaigoServiceMaster
 from .geo import haversine, bounding_box
+from .bitmap import Bitmap
+from .bitmap_index import BitmapIndex, get_kaigo_bitmap_index
+from .shapes import Polygon
 
 logger = logging.getLogger(__name__)
 
+# available_days_mask のビット割り当て（JSONのキー順と同じ）
+DAY_BITS = {"mon": 1, "tue": 2, "wed": 4, "thu": 8, "fri": 16, "sat": 32, "sun": 64, "holiday": 128}
+
+
+def available_days_mask(days: Optional[dict]) -> int:
+    """{"mon": true, ...} → ビットマスク"""
+    if not days:
+        return 0
+    return sum(bit for day, bit in DAY_BITS.items() if days.get(day))
+
+
+def masks_containing(required: int) -> List[int]:
+    """required のビットを全て含むマスク値の一覧（0〜255）
+
+    ビット演算の条件はインデックスを使えないので、
+    該当するマスク値を列挙して `available_days_mask IN (...)` で引く。
+    """
+    return [m for m in range(256) if m & required == required]
+
+
+# engine → (データバージョン, サービスコード→検索対象の名称（マスタ名・カテゴリ・CSV上のサービス種別名）)
+_service_terms = {}
+
+
+def get_service_terms(db: Session) -> dict:
+    """再インポートでデータバージョンが変われば作り直す"""
+    engine = db.get_bind()
+    version = engine_version(engine)
+    cached = _service_terms.get(engine)
+    if cached is None or cached[0] != version:
+        terms = {}
+        for code, name, category in db.query(
+            KaigoServiceMaster.code, KaigoServiceMaster.name, KaigoServiceMaster.category,
+        ):
+            terms.setdefault(code, set()).update(t for t in (name, category) if t)
+        for code, service_type in db.query(KaigoFacility.service_code, KaigoFacility.service_type).distinct():
+            terms.setdefault(code, set()).add(service_type)
+        cached = _service_terms[engine] = (version, terms)
+    return cached[1]
+
+
+def _resolve_service_codes(db: Session, keyword: str) -> list:
+    """サービス名・カテゴリ（訪問系、通所系…）→コード一覧を解決（コードでインデックス活用）"""
+    return sorted(
+        code for code, terms in get_service_terms(db).items()
+        if any(keyword in t for t in terms)
+    )
+
+
+def service_codes(db: Session, service: str) -> list:
+    """サービスコードまたはサービス名・カテゴリ→コード一覧。空ならサービス種別名の部分一致で絞る"""
+    if service.isdigit():
+        return [service]
+    return _resolve_service_codes(db, service)
+
+
+def _filter_service(db: Session, query, service: str):
+    """サービスコードまたはサービス名・カテゴリで絞り込み"""
+    codes = service_codes(db, service)
+    if codes:
+        return query.filter(KaigoFacility.service_code.in_(codes))
+    return query.filter(KaigoFacility.service_type.contains(service))
+
+
+def ensure_available_days_mask(db: Session) -> bool:
+    """旧スキーマのkaigo.dbに available_days_mask 列を追加してJSONから埋める。追加したらTrue"""
+    columns = {r[1] for r in db.execute(text("PRAGMA table_info(kaigo_facilities)"))}
+    if not columns or "available_days_mask" in columns:
+        return False
+    expr = " | ".join(
+        f"(CASE WHEN json_extract(available_days, '$.{day}') THEN {bit} ELSE 0 END)"
+        for day, bit in DAY_BITS.items()
+    )
+    db.execute(text("ALTER TABLE kaigo_facilities ADD COLUMN available_days_mask INTEGER"))
+    db.execute(text(f"UPDATE kaigo_facilities SET available_days_mask = {expr}"))
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_kaigo_available_days ON kaigo_facilities(available_days_mask)"
+    ))
+    db.commit()
+    return True
+
+
+def parse_available_days(fac) -> Optional[dict]:
+    """available_days(JSON文字列)をdictに"""
+    if fac.available_days:
+        try:
+            return json.loads(fac.available_days) if isinstance(fac.available_days, str) else fac.available_days
+        except (json.JSONDecodeError, TypeError):
+            return None
+    return None
+
 
 def _kaigo_fts_search(db: Session, query: str, limit: int = 1000) -> list:
     """介護FTS5検索。(id, service_code)タプルのリストを返す"""
@@ -47,7 +142,7 @@ def _kaigo_fts_search(db: Session, query: str, limit: int = 1000) -> list:
         return []
 
 
-def search_kaigo(
+def kaigo_conditions(
     db: Session,
     q: Optional[str] = None,
     service: Optional[str] = None,
@@ -55,57 +150,201 @@ def search_kaigo(
     city: Optional[str] = None,
     corporate_number: Optional[str] = None,
     available_day: Optional[str] = None,
-    page: int = 1,
-    per_page: int = 20,
-) -> Tuple[List[KaigoFacility], int]:
-    """介護事業所検索"""
-    query = db.query(KaigoFacility)
-
+) -> List[tuple]:
+    """介護事業所検索の絞り込み条件を (種類, 値) の並びに解決する
+
+    filter_kaigo（SQL）と kaigo_bitmap_candidates（ビットマップ）はこれを訳すだけにして、
+    キーワードの解決やフォールバックの判断が2か所でずれないようにする。
+      keys         FTSでヒットした (事業所番号, サービスコード) の一覧
+      text         名称・カナ・住所の部分一致（FTSで引けないとき）
+      service      サービスコードの一覧
+      service_type サービス種別名の部分一致（コードに解決できないとき）
+      prefecture / city（(市区町村コード, 都道府県コード)）/ corporate_number
+      days         全て満たす曜日の一覧（カンマ区切りはAND、不明な曜日は無視）
+    """
+    conditions = []
     if q:
         fts_results = _kaigo_fts_search(db, q)
-        if fts_results:
-            # Build OR conditions for composite keys
-            from sqlalchemy import tuple_
-            query = query.filter(
-                tuple_(KaigoFacility.id, KaigoFacility.service_code).in_(fts_results)
-            )
-        else:
+        conditions.append(("keys", fts_results) if fts_results else ("text", q))
+    if service:
+        codes = service_codes(db, service)
+        conditions.append(("service", codes) if codes else ("service_type", service))
+    if prefecture:
+        conditions.append(("prefecture", prefecture))
+    if city:
+        conditions.append(("city", (city, prefecture)))
+    if corporate_number:
+        conditions.append(("corporate_number", corporate_number))
+    if available_day:
+        requested = {d.strip() for d in available_day.split(",")}
+        days = [d for d in DAY_BITS if d in requested]
+        if days:
+            conditions.append(("days", days))
+    return conditions
+
+
+def filter_kaigo(db: Session, query, **filters):
+    """介護事業所検索の絞り込み条件（kaigo_conditions の引数）を query に適用"""
+    for kind, value in kaigo_conditions(db, **filters):
+        if kind == "keys":
+            query = query.filter(tuple_(KaigoFacility.id, KaigoFacility.service_code).in_(value))
+        elif kind == "text":
             query = query.filter(
                 or_(
-                    KaigoFacility.name.contains(q),
-                    KaigoFacility.name_kana.contains(q),
-                    KaigoFacility.address.contains(q),
+                    KaigoFacility.name.contains(value),
+                    KaigoFacility.name_kana.contains(value),
+                    KaigoFacility.address.contains(value),
                 )
             )
-
-    if service:
-        # サービスコードまたはサービス名で検索
-        if service.isdigit():
-            query = query.filter(KaigoFacility.service_code == service)
+        elif kind == "service":
+            query = query.filter(KaigoFacility.service_code.in_(value))
+        elif kind == "service_type":
+            query = query.filter(KaigoFacility.service_type.contains(value))
+        elif kind == "prefecture":
+            query = query.filter(KaigoFacility.prefecture_code == value)
+        elif kind == "city":
+            query = query.filter(KaigoFacility.city_code == value[0])
+        elif kind == "corporate_number":
+            query = query.filter(KaigoFacility.corporate_number == value)
+        elif kind == "days":
+            required = available_days_mask(dict.fromkeys(value, True))
+            query = query.filter(KaigoFacility.available_days_mask.in_(masks_containing(required)))
+    return query
+
+
+def kaigo_bitmap_candidates(db: Session, index: BitmapIndex, **filters) -> Optional[Bitmap]:
+    """filter_kaigo と同じ条件をビットマップの AND で評価。表せない条件（部分一致・法人番号）があればNone"""
+    bitmaps = []
+    for kind, value in kaigo_conditions(db, **filters):
+        if kind == "keys":
+            bitmaps.append(index.of_keys(value))
+        elif kind == "service":
+            bitmaps.append(index.any_of("service", value))
+        elif kind == "prefecture":
+            bitmaps.append(index.any_of("prefecture", [value]))
+        elif kind == "city":
+            bitmaps.append(index.city(*value))
+        elif kind == "days":
+            bitmaps.extend(index.any_of("day", [d]) for d in value)
         else:
-            query = query.filter(KaigoFacility.service_type.contains(service))
-
-    if prefecture:
-        query = query.filter(KaigoFacility.prefecture_code == prefecture)
+            return None
+    return index.intersect(bitmaps)
 
-    if city:
-        query = query.filter(KaigoFacility.city_code == city)
 
-    if corporate_number:
-        query = query.filter(KaigoFacility.corporate_number == corporate_number)
+def search_kaigo(
+    db: Session,
+    q: Optional[str] = None,
+    service: Optional[str] = None,
+    prefecture: Optional[str] = None,
+    city: Optional[str] = None,
+    corporate_number: Optional[str] = None,
+    available_day: Optional[str] = None,
+    page: int = 1,
+    per_page: int = 20,
+) -> Tuple[List[KaigoFacility], int]:
+    """介護事業所検索（事業所番号・サービスコード順）"""
+    index = get_kaigo_bitmap_index(db)
+    candidates = kaigo_bitmap_candidates(
+        db, index, q=q, service=service, prefecture=prefecture, city=city,
+        corporate_number=corporate_number, available_day=available_day,
+    )
+    if candidates is not None:
+        page_keys = index.keys_at(candidates.slice((page - 1) * per_page, per_page))
+        rows = {
+            (f.id, f.service_code): f for f in db.query(KaigoFacility).filter(
+                tuple_(KaigoFacility.id, KaigoFacility.service_code).in_(page_keys)
+            )
+        } if page_keys else {}
+        return [rows[k] for k in page_keys if k in rows], len(candidates)
 
-    if available_day:
-        # JSON内の曜日キーで検索
-        day_key = f'"{available_day}":true' if available_day != "true" else available_day
-        # SQLite JSON検索
-        query = query.filter(KaigoFacility.available_days.contains(f'"{available_day}": true').self_group() |
-                             KaigoFacility.available_days.contains(f'"{available_day}":true'))
+    query = filter_kaigo(
+        db, db.query(KaigoFacility), q=q, service=service, prefecture=prefecture, city=city,
+        corporate_number=corporate_number, available_day=available_day,
+    ).order_by(KaigoFacility.id, KaigoFacility.service_code)
 
     total = query.count()
     facilities = query.offset((page - 1) * per_page).limit(per_page).all()
     return facilities, total
 
 
+def _kaigo_rows(db: Session, keys: list) -> dict:
+    """(事業所番号, サービスコード) → 行（そのページの分だけ取る）"""
+    if not keys:
+        return {}
+    return {
+        (f.id, f.service_code): f
+        for f in db.query(KaigoFacility).filter(tuple_(KaigoFacility.id, KaigoFacility.service_code).in_(keys))
+    }
+
+
+def kaigo_candidate_bitmap(db: Session, index: BitmapIndex, **filters) -> Bitmap:
+    """filters に合う事業所×サービス。ビットマップで表せない条件はSQLでキーを引いて通し番号にする"""
+    candidates = kaigo_bitmap_candidates(db, index, **filters)
+    if candidates is None:
+        query = filter_kaigo(db, db.query(KaigoFacility.id, KaigoFacility.service_code), **filters)
+        candidates = index.of_keys((kid, code) for kid, code in query)
+    return candidates
+
+
+def search_kaigo_near(
+    db: Session,
+    lat: float,
+    lng: float,
+    radius_km: Optional[float] = None,
+    page: int = 1,
+    per_page: int = 20,
+    **filters,
+) -> Tuple[List[Tuple[KaigoFacility, float]], int]:
+    """search_kaigo と同じ条件（filters）の事業所を (lat, lng) から近い順に（search_facilities_near と同じ方式）"""
+    index = get_kaigo_bitmap_index(db)
+    candidates = kaigo_candidate_bitmap(db, index, **filters) & index.points.located
+    if radius_km is not None:
+        candidates = index.points.within(lat, lng, radius_km, candidates)
+    offset = (page - 1) * per_page
+    hits = index.points.nearest(lat, lng, candidates, offset + per_page)[offset:]
+    page_keys = index.keys_at(i for _, i in hits)
+    rows = _kaigo_rows(db, page_keys)
+    return [
+        (rows[key], round(dist, 2)) for (dist, _), key in zip(hits, page_keys) if key in rows
+    ], len(candidates)
+
+
+def search_kaigo_within(
+    db: Session,
+    polygons: List[Polygon],
+    page: int = 1,
+    per_page: int = 100,
+    **filters,
+) -> Tuple[List[KaigoFacility], int]:
+    """search_kaigo と同じ条件（filters）の事業所×サービスのうち、いずれかの多角形の内側"""
+    index = get_kaigo_bitmap_index(db)
+    candidates = kaigo_candidate_bitmap(db, index, **filters) & index.points.located
+    inside = Bitmap.union_all(index.points.in_polygon(polygon, candidates) for polygon in polygons)
+    page_keys = index.keys_at(inside.slice((page - 1) * per_page, per_page))
+    rows = _kaigo_rows(db, page_keys)
+    return [rows[key] for key in page_keys if key in rows], len(inside)
+
+
+def search_kaigo_along(
+    db: Session,
+    lines: List[List[Tuple[float, float]]],
+    buffer_km: float,
+    page: int = 1,
+    per_page: int = 100,
+    **filters,
+) -> Tuple[List[Tuple[KaigoFacility, float]], int]:
+    """search_kaigo と同じ条件（filters）の事業所×サービスのうち、折れ線から buffer_km 以内（経路までの距離付き）"""
+    index = get_kaigo_bitmap_index(db)
+    candidates = kaigo_candidate_bitmap(db, index, **filters) & index.points.located
+    found = index.points.near_lines(lines, buffer_km, candidates)
+    offset = (page - 1) * per_page
+    ordinals = sorted(found)[offset:offset + per_page]
+    rows = _kaigo_rows(db, index.keys_at(ordinals))
+    return [
+        (rows[index.keys[i]], round(found[i], 2)) for i in ordinals if index.keys[i] in rows
+    ], len(found)
+
+
 def search_kaigo_nearby(
     db: Session,
     lat: float,
@@ -127,10 +366,7 @@ def search_kaigo_nearby(
     )
 
     if service:
-        if service.isdigit():
-            query = query.filter(KaigoFacility.service_code == service)
-        else:
-            query = query.filter(KaigoFacility.service_type.contains(service))
+        query = _filter_service(db, query, service)
 
     candidates = query.all()
 
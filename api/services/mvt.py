@@ -0,0 +1,117 @@
+"""Mapbox Vector Tile (v2.1) エンコーダ — ポイントレイヤー専用の最小実装
+
+vector_tile.proto のうち使う部分:
+
+    Tile    { repeated Layer layers = 3; }
+    Layer   { name = 1; repeated Feature features = 2; repeated string keys = 3;
+              repeated Value values = 4; extent = 5; version = 15; }
+    Feature { id = 1; packed uint32 tags = 2; GeomType type = 3; packed uint32 geometry = 4; }
+    Value   { string_value = 1; sint_value = 6; bool_value = 7; ... }
+
+protobufライブラリに依存せず、varint と length-delimited だけで組み立てる。
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+EXTENT = 4096
+POINT = 1
+MAX_LAT = 85.05112878
+
+# (wire type 0: varint, 2: length-delimited)
+_VARINT = 0
+_BYTES = 2
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _field_bytes(field: int, payload: bytes) -> bytes:
+    return _key(field, _BYTES) + _varint(len(payload)) + payload
+
+
+def _field_varint(field: int, value: int) -> bytes:
+    return _key(field, _VARINT) + _varint(value)
+
+
+def _packed(field: int, values: Iterable[int]) -> bytes:
+    return _field_bytes(field, b"".join(_varint(v) for v in values))
+
+
+def _value(v) -> bytes:
+    if isinstance(v, bool):
+        return _field_varint(7, int(v))
+    if isinstance(v, int):
+        return _field_varint(6, _zigzag(v))
+    return _field_bytes(1, str(v).encode("utf-8"))
+
+
+def project(lat: float, lng: float) -> Tuple[float, float]:
+    """緯度経度 → メルカトル座標 (0〜1, 0〜1)"""
+    lat = max(min(lat, MAX_LAT), -MAX_LAT)
+    s = math.sin(math.radians(lat))
+    x = (lng + 180.0) / 360.0
+    y = 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+
+class LayerBuilder:
+    """1レイヤー分のポイント地物を貯めてエンコードする"""
+
+    def __init__(self, name: str, extent: int = EXTENT):
+        self.name = name
+        self.extent = extent
+        self.keys: Dict[str, int] = {}
+        self.values: Dict[tuple, int] = {}
+        self.features: List[bytes] = []
+
+    def _tag(self, key: str, value) -> Tuple[int, int]:
+        k = self.keys.setdefault(key, len(self.keys))
+        vkey = (type(value).__name__, value)
+        v = self.values.setdefault(vkey, len(self.values))
+        return k, v
+
+    def add_point(self, px: int, py: int, properties: dict, feature_id: Optional[int] = None):
+        """タイル内座標 (0〜extent) の点を追加。None の属性は書かない"""
+        tags = []
+        for key, value in properties.items():
+            if value is not None:
+                tags.extend(self._tag(key, value))
+        body = b""
+        if feature_id is not None:
+            body += _field_varint(1, feature_id)
+        if tags:
+            body += _packed(2, tags)
+        body += _field_varint(3, POINT)
+        # MoveTo(1) × 1点: command = (1 & 0x7) | (1 << 3)
+        body += _packed(4, (9, _zigzag(px), _zigzag(py)))
+        self.features.append(body)
+
+    def __len__(self):
+        return len(self.features)
+
+    def encode(self) -> bytes:
+        body = _field_varint(15, 2) + _field_bytes(1, self.name.encode("utf-8"))
+        body += b"".join(_field_bytes(2, f) for f in self.features)
+        body += b"".join(_field_bytes(3, k.encode("utf-8")) for k in self.keys)
+        body += b"".join(_field_bytes(4, _value(v)) for _, v in self.values)
+        body += _field_varint(5, self.extent)
+        return body
+
+
+def encode_tile(layers: Iterable[LayerBuilder]) -> bytes:
+    """空でないレイヤーだけを1タイルに"""
+    return b"".join(_field_bytes(3, layer.encode()) for layer in layers if len(layer))
@@ -0,0 +1,71 @@
+"""医療・介護の横断近隣検索
+
+2つのDBを別スレッド・別セッションで同時に検索し、
+それぞれ距離順の結果を heapq.merge で1本にして上位 limit 件だけ取り出す。
+"""
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Optional, List, Tuple
+
+from ..database import SessionLocal, KaigoSessionLocal
+from .search import search_nearby
+from .kaigo_search import search_kaigo_nearby
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("medical", "kaigo")
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="nearby")
+
+
+def _medical(lat, lng, radius_km, facility_types, specialty, open_now, limit):
+    db = SessionLocal()
+    try:
+        return [("medical", fac, dist) for fac, dist in search_nearby(
+            db, lat=lat, lng=lng, radius_km=radius_km, facility_types=facility_types,
+            specialty=specialty, open_now=open_now, limit=limit,
+        )]
+    finally:
+        db.close()
+
+
+def _kaigo(lat, lng, radius_km, service, limit):
+    db = KaigoSessionLocal()
+    try:
+        return [("kaigo", fac, dist) for fac, dist in search_kaigo_nearby(
+            db, lat=lat, lng=lng, radius_km=radius_km, service=service, limit=limit,
+        )]
+    except Exception as e:
+        # 介護DBが無い環境では医療側だけ返す
+        logger.warning(f"Kaigo nearby search failed: {e}")
+        return []
+    finally:
+        db.close()
+
+
+def search_all_nearby(
+    lat: float,
+    lng: float,
+    radius_km: float = 5.0,
+    kinds: Optional[List[str]] = None,
+    facility_types: Optional[List[int]] = None,
+    specialty: Optional[str] = None,
+    open_now: bool = False,
+    service: Optional[str] = None,
+    limit: int = 20,
+) -> List[Tuple[str, object, float]]:
+    """(kind, 施設/事業所, 距離km) を距離順に最大 limit 件"""
+    kinds = kinds or KINDS
+    futures = []
+    if "medical" in kinds:
+        futures.append(_executor.submit(
+            _medical, lat, lng, radius_km, facility_types, specialty, open_now, limit,
+        ))
+    if "kaigo" in kinds:
+        futures.append(_executor.submit(_kaigo, lat, lng, radius_km, service, limit))
+
+    # 各結果は距離順ソート済み
+    merged = heapq.merge(*(f.result() for f in futures), key=lambda r: r[2])
+    return list(islice(merged, limit))
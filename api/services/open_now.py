@@ -1,9 +1,13 @@
 """open_now フィルタ — 現在診療中の施設を判定
 
-DB非依存のロジック。Specialty.scheduleのJSON構造を解析する。
+DB非依存のロジック。Specialty.schedule_packed（パック表現）を直接見る。
+JSON形式の schedule を渡す is_open_now() も互換のため残している。
+曜日の時間帯だけを見る単純な判定で、APIの絞り込みは祝日・休診日を考慮する calendar.py を使う。
 """
 from datetime import datetime, timezone, timedelta
 
+from .schedule import day_slots
+
 JST = timezone(timedelta(hours=9))
 
 # Python weekday() → schedule key
@@ -33,3 +37,18 @@ def is_open_now(schedules: list, now: datetime = None) -> bool:
             return True
 
     return False
+
+
+def is_open_now_packed(blobs: list, now: datetime = None) -> bool:
+    """パック表現(32バイト)のリスト版 is_open_now。JSONを一切デコードしない"""
+    if not blobs:
+        return False
+    if now is None:
+        now = datetime.now(JST)
+
+    minutes = now.hour * 60 + now.minute
+    starts, ends = day_slots(blobs, now.weekday())
+    for start, end in zip(starts, ends):
+        if start <= minutes <= end:
+            return True
+    return False
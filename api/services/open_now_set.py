@@ -0,0 +1,138 @@
+"""現在診療・営業中の施設IDの集合（バックグラウンドで維持）
+
+open_now の答えは診療時間の境界（どれかの施設の開始時刻・終了時刻の翌分）か日付の変わり目にしか変わらない。
+診療カレンダー（calendar.py — 祝日・第n週の休診を含む）で「いまの集合」を求め、
+「次に変わる時刻（valid_until）」と一緒に持つ。
+
+    ids = get_open_now_ids(db)     # frozenset — 候補ごとの判定は `fid in ids` だけ
+
+valid_until を過ぎていればリクエスト側でも計算し直すので、結果が古くなることはない。
+通常は start_refresher() のスレッドが境界の時刻に先回りして作り直す。
+どれだけ遅れているかは open_now_status()（/health）で確認できる。
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from .bitmap import Bitmap
+from .bitmap_index import FacilityBitmapIndex, get_facility_bitmap_index
+from .open_now import JST
+
+logger = logging.getLogger(__name__)
+
+# バックグラウンド更新の最長の待ち時間（秒）。再インポートの検知もこの間隔
+REFRESH_MAX_WAIT = 60
+
+
+class OpenNowSet:
+    """computed_at 〜 valid_until の間に診療・営業中の施設（ビットマップインデックスの通し番号と施設ID）"""
+
+    def __init__(self, index: FacilityBitmapIndex, bitmap: Bitmap, computed_at: datetime, valid_until: datetime):
+        self.index = index
+        self.bitmap = bitmap
+        self.ids = frozenset(index.keys_at(bitmap))
+        self.computed_at = computed_at
+        self.valid_until = valid_until
+
+    def covers(self, index: FacilityBitmapIndex, now: datetime) -> bool:
+        return self.index is index and self.computed_at <= now < self.valid_until
+
+
+# engine → OpenNowSet
+_current: Dict[object, OpenNowSet] = {}
+# engine → 再計算の回数・境界をまたいでから作り直すまでの遅れ
+_stats: Dict[object, dict] = {}
+_lock = threading.Lock()
+
+
+def get_open_now_set(db: Session, now: datetime = None) -> OpenNowSet:
+    """now（省略時は現在時刻）を含む OpenNowSet。境界をまたいでいれば作り直す
+
+    共有するのは現在時刻の集合だけ。now を指定した場合は計算結果を返すだけにする
+    """
+    shared = now is None
+    now = now or datetime.now(JST)
+    engine = db.get_bind()
+    index = get_facility_bitmap_index(db)
+    current = _current.get(engine)
+    if current is not None and current.covers(index, now):
+        return current
+    with _lock:
+        current = _current.get(engine)
+        if current is not None and current.covers(index, now):
+            return current
+        calendar = index.calendar
+        current = OpenNowSet(
+            index, calendar.open_at(now), now.replace(second=0, microsecond=0), calendar.next_change(now),
+        )
+        if not shared:
+            return current
+        previous = _current.get(engine)
+        stats = _stats.setdefault(engine, {"recomputes": 0, "last_lag_seconds": 0.0})
+        stats["recomputes"] += 1
+        if previous is not None and previous.valid_until <= now:
+            stats["last_lag_seconds"] = round((now - previous.valid_until).total_seconds(), 3)
+        _current[engine] = current
+        return current
+
+
+def get_open_now_ids(db: Session, now: datetime = None) -> frozenset:
+    return get_open_now_set(db, now).ids
+
+
+def open_now_status(engine, now: datetime = None) -> dict:
+    """/health 用: いまの集合がいつ作られ、いつまで有効で、何秒古くなっているか"""
+    now = now or datetime.now(JST)
+    current = _current.get(engine)
+    if current is None:
+        return {"computed_at": None, "valid_until": None, "stale_seconds": None, "open_facilities": None}
+    stats = _stats.get(engine, {})
+    return {
+        "computed_at": current.computed_at.isoformat(),
+        "valid_until": current.valid_until.isoformat(),
+        "stale_seconds": round(max(0.0, (now - current.valid_until).total_seconds()), 3),
+        "open_facilities": len(current.ids),
+        "recomputes": stats.get("recomputes", 0),
+        "last_lag_seconds": stats.get("last_lag_seconds", 0.0),
+    }
+
+
+# --- バックグラウンド更新 ---
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _refresh_loop(session_factory):
+    while not _stop.is_set():
+        wait = REFRESH_MAX_WAIT
+        db = session_factory()
+        try:
+            current = get_open_now_set(db)
+            wait = min(wait, max(0.0, (current.valid_until - datetime.now(JST)).total_seconds()) + 0.01)
+        except Exception as e:
+            logger.warning(f"Open-now refresh failed: {e}")
+        finally:
+            db.close()
+        _stop.wait(wait)
+
+
+def start_refresher(session_factory) -> None:
+    """境界の時刻ごとに集合を作り直すスレッドを起動（起動済みなら何もしない）"""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_refresh_loop, args=(session_factory,), name="open-now", daemon=True)
+    _thread.start()
+
+
+def stop_refresher() -> None:
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=5)
+        _thread = None
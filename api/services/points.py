@@ -0,0 +1,195 @@
+"""位置での絞り込みと距離順の上位k件（ビットマップインデックスの通し番号で扱う）
+
+ビットマップインデックスと同じ通し番号で緯度経度の配列と、CELL_DEG 度の格子セルごとの Bitmap を持つ。
+絞り込み条件の候補集合（Bitmap）と範囲内のセルの Bitmap の AND を取ってから距離を計算するので、
+フリーワード＋現在地のような検索でも候補全件の距離は計算しない。
+
+    points.within(lat, lng, 3.0, candidates)        # 半径3km以内の候補（Bitmap）
+    points.nearest(lat, lng, candidates, k=20)      # 近い順に [(距離km, 通し番号), ...]
+    points.in_polygon(polygon, candidates)          # 多角形内（shapes.Polygon）
+    points.near_lines(lines, 2.0, candidates)       # 折れ線から2km以内 {通し番号: 距離km}
+"""
+import heapq
+import math
+from array import array
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from . import grid
+from .bitmap import Bitmap
+from .geo import haversine, bounding_box
+from .grid import Cell
+from .shapes import KM_PER_DEG as SEGMENT_KM_PER_DEG, LatLng, Polygon, segment_distance, split_segment
+
+CELL_DEG = 0.05          # 緯度方向 約5.5km
+DIRECT_MAX = 5000        # 候補がこれ以下なら格子を使わず全件の距離を計算する
+
+
+def _cell(lat: float, lng: float) -> Cell:
+    return grid.cell_of(lat, lng, CELL_DEG)
+
+
+class PointGrid:
+    """通し番号 i の座標 (lats[i], lngs[i])（座標の無い行は located に含まれない）"""
+
+    def __init__(self, coords: Iterable[Tuple[Optional[float], Optional[float]]]):
+        self.lats, self.lngs = array("d"), array("d")
+        cells: Dict[Cell, List[int]] = {}
+        located = []
+        for i, (lat, lng) in enumerate(coords):
+            if lat is None or lng is None:
+                self.lats.append(math.nan)
+                self.lngs.append(math.nan)
+                continue
+            self.lats.append(lat)
+            self.lngs.append(lng)
+            cells.setdefault(_cell(lat, lng), []).append(i)
+            located.append(i)
+        self.cells: Mapping[Cell, Bitmap] = {c: Bitmap.from_sorted(v) for c, v in cells.items()}
+        self.located = Bitmap.from_sorted(located)
+        self.extent = grid.extent_of(self.cells)
+
+    @classmethod
+    def from_parts(cls, lats: Sequence[float], lngs: Sequence[float], cells: Mapping[Cell, Bitmap], located: Bitmap):
+        """配列・セルの Bitmap から作る（インデックスファイルの memoryview をそのまま使う）"""
+        points = cls.__new__(cls)
+        points.lats, points.lngs, points.cells, points.located = lats, lngs, cells, located
+        points.extent = grid.extent_of(cells)
+        return points
+
+    def distance(self, lat: float, lng: float, i: int) -> float:
+        return haversine(lat, lng, self.lats[i], self.lngs[i])
+
+    def _cells_in(self, min_lat: float, max_lat: float, min_lng: float, max_lng: float):
+        """範囲にかかるセル [((y, x), Bitmap), ...]"""
+        (y0, x0), (y1, x1) = _cell(min_lat, min_lng), _cell(max_lat, max_lng)
+        if (y1 - y0 + 1) * (x1 - x0 + 1) > len(self.cells):
+            return [(c, bm) for c, bm in self.cells.items() if y0 <= c[0] <= y1 and x0 <= c[1] <= x1]
+        return [
+            ((y, x), self.cells[(y, x)]) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1) if (y, x) in self.cells
+        ]
+
+    def _box(self, min_lat: float, max_lat: float, min_lng: float, max_lng: float) -> Bitmap:
+        return Bitmap.union_all(bm for _, bm in self._cells_in(min_lat, max_lat, min_lng, max_lng))
+
+    def within(self, lat: float, lng: float, radius_km: float, candidates: Bitmap) -> Bitmap:
+        """candidates のうち (lat, lng) から radius_km 以内"""
+        box = bounding_box(lat, lng, radius_km)
+        near = candidates & self._box(box["min_lat"], box["max_lat"], box["min_lng"], box["max_lng"])
+        return Bitmap.from_sorted(i for i in near if self.distance(lat, lng, i) <= radius_km)
+
+    def nearest(self, lat: float, lng: float, candidates: Bitmap, k: int) -> List[Tuple[float, int]]:
+        """candidates のうち座標のあるものを近い順に最大 k 件 [(距離km, 通し番号), ...]
+
+        候補が少なければ全件の距離を計算し、多ければ中心セルから1リングずつ広げて（grid.rings）
+        k件目の距離が「まだ見ていないセルまでの最短距離」以下になった時点で打ち切る。
+        地点がデータの範囲外などでリングが役に立たないときも全件の距離を計算する。
+        """
+        candidates = candidates & self.located
+        if k <= 0 or not candidates:
+            return []
+        if len(candidates) <= DIRECT_MAX:
+            return heapq.nsmallest(k, ((self.distance(lat, lng, i), i) for i in candidates))
+
+        found: List[Tuple[float, int]] = []   # 距離の大きい順のヒープ（符号反転）
+        for bound, cells in grid.rings(self.cells, self.extent, CELL_DEG, lat, lng):
+            if bound == math.inf:
+                # 範囲外の地点・リングを広げすぎた場合は、セルの和を取らずに全件の距離を計算する
+                return heapq.nsmallest(k, ((self.distance(lat, lng, i), i) for i in candidates))
+            for i in Bitmap.union_all(self.cells[c] for c in cells) & candidates:
+                dist = self.distance(lat, lng, i)
+                if len(found) < k:
+                    heapq.heappush(found, (-dist, -i))
+                elif (dist, i) < (-found[0][0], -found[0][1]):
+                    heapq.heapreplace(found, (-dist, -i))
+            if len(found) == k and -found[0][0] <= bound:
+                break
+        return sorted((-d, -i) for d, i in found)
+
+    def in_polygon(self, polygon: Polygon, candidates: Bitmap) -> Bitmap:
+        """candidates のうち多角形内
+
+        辺の通らないセルは丸ごと内側か外側なので中心の1点で決め、辺の通るセルの点だけ1件ずつ判定する。
+        """
+        boundary = _edge_cells(polygon)
+        inside, maybe = [], []
+        for (y, x), bm in self._cells_in(*polygon.bbox):
+            if (y, x) in boundary:
+                maybe.append(bm)
+            elif polygon.contains((y + 0.5) * CELL_DEG, (x + 0.5) * CELL_DEG):
+                inside.append(bm)
+        sure = candidates & Bitmap.union_all(inside)
+        maybe = candidates & Bitmap.union_all(maybe)
+        return sure | Bitmap.from_sorted(i for i in maybe if polygon.contains(self.lats[i], self.lngs[i]))
+
+    def near_lines(self, lines: List[List[LatLng]], buffer_km: float, candidates: Bitmap) -> Dict[int, float]:
+        """candidates のうち折れ線から buffer_km 以内 {通し番号: 最も近い線分までの距離km}
+
+        線分の通るセルを buffer_km + half に当たるセル数だけ縦横に広げ（経度方向はその線分の緯度の cos で）、
+        点のあるセルごとに届く線分を集める。セル内の点と中心の距離は half 以下なので、
+        点から線分までの距離は「中心からの距離 ± half」に収まり、
+        中心からの距離が min(最短 + 2*half, buffer_km + half) を超える線分はどの点でも最も近くならない。
+        """
+        segments = [(a, b) for line in lines for a, b in zip(line, line[1:])]
+        half = math.hypot(CELL_DEG, CELL_DEG) / 2 * SEGMENT_KM_PER_DEG
+        reach = buffer_km + half
+        ry = int(reach / (CELL_DEG * SEGMENT_KM_PER_DEG)) + 1
+
+        reached: Dict[Cell, List[int]] = {}
+        for k, (a, b) in enumerate(segments):
+            # segment_distance は線分の中央の緯度の cos で経度を縮めるので、同じ cos で届くセル数を決める
+            cos_mid = math.cos(math.radians((a[0] + b[0]) / 2))
+            rx = int(reach / (CELL_DEG * SEGMENT_KM_PER_DEG * cos_mid)) + 1
+            rows: Dict[int, Tuple[int, int]] = {}   # 線分の通る行 → (最小x, 最大x)
+            for y, x in _segment_cells(a, b):
+                lo, hi = rows.get(y, (x, x))
+                rows[y] = (min(lo, x), max(hi, x))
+            spans: Dict[int, Tuple[int, int]] = {}
+            for y, (lo, hi) in rows.items():
+                for row in range(y - ry, y + ry + 1):
+                    old = spans.get(row)
+                    spans[row] = (lo, hi) if old is None else (min(old[0], lo), max(old[1], hi))
+            for row, (lo, hi) in spans.items():
+                for x in range(lo - rx, hi + rx + 1):
+                    if (row, x) in self.cells:
+                        reached.setdefault((row, x), []).append(k)
+
+        found: Dict[int, float] = {}
+        for (y, x), ks in reached.items():
+            points = candidates & self.cells[(y, x)]
+            if not points:
+                continue
+            clat, clng = (y + 0.5) * CELL_DEG, (x + 0.5) * CELL_DEG
+            centre = sorted((segment_distance(clat, clng, *segments[k]), k) for k in ks)
+            limit = min(buffer_km + half, centre[0][0] + 2 * half)
+            near = [(d,) + segments[k] for d, k in centre if d <= limit]
+            if not near:
+                continue
+            for i in points:
+                lat, lng = self.lats[i], self.lngs[i]
+                # 中心からの距離の近い線分から順に、下限（中心からの距離 - 点と中心の距離）が最短を超えたら打ち切る
+                offset = math.hypot(lat - clat, lng - clng) * SEGMENT_KM_PER_DEG
+                best = math.inf
+                for d, a, b in near:
+                    if d - offset > min(best, buffer_km):
+                        break
+                    best = min(best, segment_distance(lat, lng, a, b))
+                if best <= buffer_km:
+                    found[i] = best
+        return found
+
+
+def _segment_cells(a: LatLng, b: LatLng) -> set:
+    """線分が通る（可能性のある）セル。線分をセル幅以下に分け、各区間の外接矩形のセルを集める"""
+    cells = set()
+    for p, q in split_segment(a, b, CELL_DEG):
+        (y0, x0), (y1, x1) = _cell(min(p[0], q[0]), min(p[1], q[1])), _cell(max(p[0], q[0]), max(p[1], q[1]))
+        cells.update((y, x) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1))
+    return cells
+
+
+def _edge_cells(polygon: Polygon) -> set:
+    """多角形の辺が通る（可能性のある）セル"""
+    cells = set()
+    for lat1, lng1, lat2, lng2 in polygon.edges:
+        cells.update(_segment_cells((lat1, lng1), (lat2, lng2)))
+    return cells
@@ -0,0 +1,96 @@
+"""診療時間スケジュールのパック表現
+
+8曜日(mon〜sun, hol) × 開始/終了 を「0時からの分」の uint16 16個（32バイト）に詰める。
+時間帯が無い曜日は 0xFFFF。DB非依存の純粋関数のみ。
+
+JSON表現: {"mon": {"start": "09:00", "end": "17:30"}, "tue": None, ...}
+
+パック表現は CSV の文字列をそのまま持たない:
+- "9:00" は "09:00" になる（時・分とも2桁）
+- "H:MM" と読めない時刻（"24時間"、"午前" など）や、開始・終了の片方しか無い曜日は None
+詳細レスポンスは JSON 列があればそちらを返し（load_schedule）、JSON を持たない --compact のDBだけ
+パック表現から返す。
+"""
+import json
+import struct
+import sys
+from array import array
+from typing import Optional, Tuple
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun", "hol")
+NO_TIME = 0xFFFF
+PACKED = struct.Struct("<16H")
+
+
+def to_minutes(value: Optional[str]) -> Optional[int]:
+    """"HH:MM" → 0時からの分。解釈できなければNone"""
+    if not value:
+        return None
+    hh, sep, mm = value.strip().partition(":")
+    if not sep or not hh.isdigit() or not mm.isdigit():
+        return None
+    minutes = int(hh) * 60 + int(mm)
+    return minutes if minutes < NO_TIME else None
+
+
+def to_hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def pack_schedule(schedule: Optional[dict]) -> Optional[bytes]:
+    """JSON形式のscheduleを32バイトに変換（時刻の正規化はモジュールの説明のとおり）"""
+    if schedule is None:
+        return None
+    values = []
+    for day in DAYS:
+        slot = schedule.get(day)
+        start = end = None
+        if isinstance(slot, dict):
+            start = to_minutes(slot.get("start"))
+            end = to_minutes(slot.get("end"))
+        if start is None or end is None:
+            values += (NO_TIME, NO_TIME)
+        else:
+            values += (start, end)
+    return PACKED.pack(*values)
+
+
+def unpack_schedule(blob: Optional[bytes]) -> Optional[dict]:
+    """32バイト → JSON形式のschedule"""
+    if blob is None:
+        return None
+    values = PACKED.unpack(blob)
+    schedule = {}
+    for i, day in enumerate(DAYS):
+        start, end = values[i * 2], values[i * 2 + 1]
+        if start == NO_TIME:
+            schedule[day] = None
+        else:
+            schedule[day] = {"start": to_hhmm(start), "end": to_hhmm(end)}
+    return schedule
+
+
+def load_schedule(value, packed: Optional[bytes] = None) -> Optional[dict]:
+    """JSONカラム（文字列/dict）を優先し、無ければ（--compact のDB）パック表現からscheduleを返す
+
+    パック表現は時刻を正規化する（"9:00" → "09:00"、読めない時刻は None）ので、
+    JSONが残っているDBでは元の値をそのまま返す。
+    """
+    if value is not None:
+        return json.loads(value) if isinstance(value, str) else value
+    if packed is not None:
+        return unpack_schedule(packed)
+    return None
+
+
+def day_slots(blobs, day: int) -> Tuple[array, array]:
+    """複数のパック表現から指定曜日(0=mon〜7=hol)の開始・終了の配列を取り出す
+
+    連結した uint16 配列を stride 16 でスライスするだけなので、
+    NumPy の np.frombuffer(..., dtype="<u2").reshape(-1, 16) と同じ並びになる。
+    """
+    flat = array("H")
+    flat.frombytes(b"".join(blobs))
+    if sys.byteorder == "big":
+        flat.byteswap()
+    return flat[day * 2::16], flat[day * 2 + 1::16]
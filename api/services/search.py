@@ -1,20 +1,55 @@
 """検索サービス"""
-import json
 import logging
-from typing import Optional, List, Tuple
+from datetime import datetime
+from typing import Optional, List, Set, Tuple
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, or_
 
-from ..models import Facility, Specialty, Prefecture, SpecialtyMaster, BusinessHour
+from ..models import Facility, Specialty, Prefecture, City, SpecialtyMaster
 from .geo import haversine, bounding_box
-from .fts import fts_search
-from .open_now import is_open_now
+from .fts import fts_search, fts_subquery
+from .open_now import JST
+from .bitmap import Bitmap
+from .bitmap_index import FacilityBitmapIndex, get_facility_bitmap_index
+from .open_now_set import get_open_now_ids, get_open_now_set
+from .shapes import Polygon
 
 logger = logging.getLogger(__name__)
 
+# 診療科コード→名称（コンパクト版DBで specialty_name がNULLの行を補完する）
+_specialty_names = {}
+
+
+def get_specialty_names(db: Session) -> dict:
+    if not _specialty_names:
+        _specialty_names.update(db.query(SpecialtyMaster.code, SpecialtyMaster.name).all())
+    return _specialty_names
+
+
+# 都道府県コード→名称（一覧の高速経路で fac.prefecture の遅延ロードを避ける）
+_prefecture_names = {}
+
+
+def get_prefecture_names(db: Session) -> dict:
+    if not _prefecture_names:
+        _prefecture_names.update(db.query(Prefecture.code, Prefecture.name).all())
+    return _prefecture_names
+
+
+# (都道府県コード, 市区町村コード)→名称
+_city_names = {}
+
+
+def get_city_names(db: Session) -> dict:
+    if not _city_names:
+        _city_names.update(((p, c), name) for p, c, name in db.query(City.prefecture_code, City.code, City.name))
+    return _city_names
+
 
 def _resolve_specialty_codes(db: Session, keyword: str) -> list:
     """診療科キーワード→コード一覧を解決（マスタ検索→コードでインデックス活用）"""
+    if keyword in get_specialty_names(db):
+        return [keyword]
     codes = [
         row[0] for row in
         db.query(SpecialtyMaster.code)
@@ -23,27 +58,54 @@ def _resolve_specialty_codes(db: Session, keyword: str) -> list:
     ]
     return codes
 
+
+def _specialty_condition(db: Session, specialty: str):
+    """診療科キーワードに該当する specialities 行の条件（マスタでコードに解決できなければ名称の部分一致）"""
+    codes = _resolve_specialty_codes(db, specialty)
+    if codes:
+        return Specialty.specialty_code.in_(codes)
+    return Specialty.specialty_name.contains(specialty)
+
+
+def _specialty_exists(db: Session, specialty: str):
+    """診療科の絞り込み — EXISTSサブクエリ（JOINよりSQLite最適化しやすい）"""
+    return (
+        db.query(Specialty.id)
+        .filter(Specialty.facility_id == Facility.id, _specialty_condition(db, specialty))
+        .exists()
+    )
+
+
+def facility_ids_with_specialty(db: Session, specialty: str) -> Set[str]:
+    """診療科キーワードに該当する施設IDの集合（メモリ上の空間インデックスの絞り込み用）"""
+    query = db.query(Specialty.facility_id).distinct().filter(_specialty_condition(db, specialty))
+    return {r[0] for r in query}
+
+
 FACILITY_TYPE_NAMES = {1: "病院", 2: "診療所", 3: "歯科", 4: "助産所", 5: "薬局"}
 
 
-def search_facilities(
+def filter_facilities(
     db: Session,
+    query,
     q: Optional[str] = None,
     facility_types: Optional[List[int]] = None,
     prefecture: Optional[str] = None,
     city: Optional[str] = None,
     specialty: Optional[str] = None,
-    open_now: bool = False,
-    page: int = 1,
-    per_page: int = 20,
-) -> Tuple[List[Facility], int]:
-    """施設検索"""
-    query = db.query(Facility)
+    fts_limit: Optional[int] = 1000,
+):
+    """施設検索の絞り込み条件（open_now以外）を query に適用
 
+    フリーワードのFTSヒットは fts_limit 件で打ち切る。None なら打ち切らない（エクスポート用。
+    IDのリストではなく facilities_fts の副問い合わせで絞る）。
+    """
     # フリーワード — FTS5(trigram)優先、非対応時はLIKEフォールバック
     if q:
-        fts_ids = fts_search(db, q)
-        if fts_ids:
+        fts_ids = fts_search(db, q, limit=1 if fts_limit is None else fts_limit)
+        if fts_ids and fts_limit is None:
+            query = query.filter(Facility.id.in_(fts_subquery(q)))
+        elif fts_ids:
             query = query.filter(Facility.id.in_(fts_ids))
         else:
             # 3文字未満のクエリやFTS5未構築時はLIKEで部分一致
@@ -67,45 +129,118 @@ def search_facilities(
     if city:
         query = query.filter(Facility.city_code == city)
 
-    # 診療科 — EXISTSサブクエリ（JOINよりSQLite最適化しやすい）
+    # 診療科
+    if specialty:
+        query = query.filter(_specialty_exists(db, specialty))
+
+    return query
+
+
+def filter_open(query, open_ids: frozenset) -> List[Facility]:
+    """query の結果のうち open_ids（hours_ids）に含まれる施設"""
+    return [fac for fac in query.all() if fac.id in open_ids]
+
+
+def bitmap_candidates(
+    db: Session,
+    index: FacilityBitmapIndex,
+    q: Optional[str] = None,
+    facility_types: Optional[List[int]] = None,
+    prefecture: Optional[str] = None,
+    city: Optional[str] = None,
+    specialty: Optional[str] = None,
+) -> Optional[Bitmap]:
+    """filter_facilities と同じ条件をビットマップの AND で評価
+
+    LIKEにフォールバックする条件（FTSで引けないフリーワード、コードに解決できない診療科）はNone
+    """
+    bitmaps = []
+    if q:
+        fts_ids = fts_search(db, q)
+        if not fts_ids:
+            return None
+        bitmaps.append(index.of_keys(fts_ids))
+    if facility_types:
+        bitmaps.append(index.any_of("type", facility_types))
+    if prefecture:
+        bitmaps.append(index.any_of("prefecture", [prefecture]))
+    if city:
+        bitmaps.append(index.city(city, prefecture))
     if specialty:
         codes = _resolve_specialty_codes(db, specialty)
-        if codes:
-            exists_q = (
-                db.query(Specialty.id)
-                .filter(
-                    Specialty.facility_id == Facility.id,
-                    Specialty.specialty_code.in_(codes),
-                )
-                .exists()
-            )
-        else:
-            exists_q = (
-                db.query(Specialty.id)
-                .filter(
-                    Specialty.facility_id == Facility.id,
-                    Specialty.specialty_name.contains(specialty),
-                )
-                .exists()
-            )
-        query = query.filter(exists_q)
+        if not codes:
+            return None
+        bitmaps.append(index.any_of("specialty", codes))
+    return index.intersect(bitmaps)
 
-    # open_now — 診療中フィルタ（アプリ層でフィルタ）
+
+def hours_bitmap(
+    db: Session,
+    index: FacilityBitmapIndex,
+    open_now: bool = False,
+    open_at: Optional[datetime] = None,
+    open_within: Optional[int] = None,
+) -> Optional[Bitmap]:
+    """診療時間の条件に合う施設（条件なしならNone）
+
+    open_within（分）は open_at（省略時は現在）からその分数後までのどこかで診療していること。
+    現在時刻だけなら、バックグラウンドで維持している集合（open_now_set.py）をそのまま使う
+    """
+    if open_within is not None:
+        return index.calendar.open_within(open_at or datetime.now(JST), open_within)
+    if open_at is not None:
+        return index.calendar.open_at(open_at)
     if open_now:
-        # open_nowはschedule JSONを解析する必要があるため、
-        # DB側で絞り込んだ後にアプリ層でフィルタ
-        # まず十分な件数を取得してからフィルタ
-        all_candidates = query.options(joinedload(Facility.specialities)).all()
-        open_facilities = []
-        for fac in all_candidates:
-            schedules = []
-            for s in fac.specialities:
-                sched = json.loads(s.schedule) if isinstance(s.schedule, str) else s.schedule
-                if sched:
-                    schedules.append(sched)
-            if is_open_now(schedules):
-                open_facilities.append(fac)
+        return get_open_now_set(db).bitmap
+    return None
 
+
+def hours_ids(db: Session, **hours) -> Optional[frozenset]:
+    """hours_bitmap の施設IDの集合（open_now だけなら維持している集合そのもの）"""
+    if hours.get("open_at") is None and hours.get("open_within") is None:
+        return get_open_now_ids(db) if hours.get("open_now") else None
+    index = get_facility_bitmap_index(db)
+    return frozenset(index.keys_at(hours_bitmap(db, index, **hours)))
+
+
+def search_facilities(
+    db: Session,
+    q: Optional[str] = None,
+    facility_types: Optional[List[int]] = None,
+    prefecture: Optional[str] = None,
+    city: Optional[str] = None,
+    specialty: Optional[str] = None,
+    open_now: bool = False,
+    open_at: Optional[datetime] = None,
+    open_within: Optional[int] = None,
+    page: int = 1,
+    per_page: int = 20,
+) -> Tuple[List[Facility], int]:
+    """施設検索（ID順）。open_now / open_at / open_within は hours_bitmap を参照"""
+    hours = {"open_now": open_now, "open_at": open_at, "open_within": open_within}
+    # ビットマップで候補と件数を出し、SQLiteからはそのページの行だけ取る
+    index = get_facility_bitmap_index(db)
+    candidates = bitmap_candidates(
+        db, index, q=q, facility_types=facility_types,
+        prefecture=prefecture, city=city, specialty=specialty,
+    )
+    if candidates is not None:
+        open_bitmap = hours_bitmap(db, index, **hours)
+        if open_bitmap is not None:
+            candidates = candidates & open_bitmap
+        page_ids = index.keys_at(candidates.slice((page - 1) * per_page, per_page))
+        rows = {f.id: f for f in db.query(Facility).filter(Facility.id.in_(page_ids))}
+        return [rows[fid] for fid in page_ids if fid in rows], len(candidates)
+
+    query = filter_facilities(
+        db, db.query(Facility), q=q, facility_types=facility_types,
+        prefecture=prefecture, city=city, specialty=specialty,
+    ).order_by(Facility.id)
+
+    # 診療時間の条件 — 施設IDの集合でアプリ層でフィルタ
+    open_ids = hours_ids(db, **hours)
+    if open_ids is not None:
+        open_facilities = filter_open(query, open_ids)
         total = len(open_facilities)
         start = (page - 1) * per_page
         facilities = open_facilities[start:start + per_page]
@@ -117,6 +252,90 @@ def search_facilities(
     return facilities, total
 
 
+def _facility_rows(db: Session, ids: List[str]) -> dict:
+    """施設ID → 行（そのページの分だけ取る）"""
+    return {f.id: f for f in db.query(Facility).filter(Facility.id.in_(ids))} if ids else {}
+
+
+def candidate_bitmap(
+    db: Session,
+    index: FacilityBitmapIndex,
+    open_now: bool = False,
+    open_at: Optional[datetime] = None,
+    open_within: Optional[int] = None,
+    **filters,
+) -> Bitmap:
+    """filters と診療時間の条件に合う施設。LIKEにフォールバックする条件はSQLで施設IDを引いて通し番号にする"""
+    candidates = bitmap_candidates(db, index, **filters)
+    if candidates is None:
+        candidates = index.of_keys(fid for (fid,) in filter_facilities(db, db.query(Facility.id), **filters))
+    open_bitmap = hours_bitmap(db, index, open_now=open_now, open_at=open_at, open_within=open_within)
+    return candidates if open_bitmap is None else candidates & open_bitmap
+
+
+def search_facilities_near(
+    db: Session,
+    lat: float,
+    lng: float,
+    radius_km: Optional[float] = None,
+    page: int = 1,
+    per_page: int = 20,
+    **conditions,
+) -> Tuple[List[Tuple[Facility, float]], int]:
+    """search_facilities と同じ条件（conditions）の施設を (lat, lng) から近い順に
+
+    候補の Bitmap と空間格子を AND してから距離を計算し、上位 page * per_page 件だけ選ぶ。
+    radius_km を指定すればその範囲内のみ。件数は座標のある施設のみ数える
+    """
+    index = get_facility_bitmap_index(db)
+    candidates = candidate_bitmap(db, index, **conditions) & index.points.located
+    if radius_km is not None:
+        candidates = index.points.within(lat, lng, radius_km, candidates)
+    offset = (page - 1) * per_page
+    hits = index.points.nearest(lat, lng, candidates, offset + per_page)[offset:]
+    page_ids = index.keys_at(i for _, i in hits)
+    rows = _facility_rows(db, page_ids)
+    return [
+        (rows[fid], round(dist, 2)) for (dist, _), fid in zip(hits, page_ids) if fid in rows
+    ], len(candidates)
+
+
+def search_facilities_within(
+    db: Session,
+    polygons: List[Polygon],
+    page: int = 1,
+    per_page: int = 100,
+    **conditions,
+) -> Tuple[List[Facility], int]:
+    """search_facilities と同じ条件（conditions）の施設のうち、いずれかの多角形の内側（ID順）"""
+    index = get_facility_bitmap_index(db)
+    candidates = candidate_bitmap(db, index, **conditions) & index.points.located
+    inside = Bitmap.union_all(index.points.in_polygon(polygon, candidates) for polygon in polygons)
+    page_ids = index.keys_at(inside.slice((page - 1) * per_page, per_page))
+    rows = _facility_rows(db, page_ids)
+    return [rows[fid] for fid in page_ids if fid in rows], len(inside)
+
+
+def search_facilities_along(
+    db: Session,
+    lines: List[List[Tuple[float, float]]],
+    buffer_km: float,
+    page: int = 1,
+    per_page: int = 100,
+    **conditions,
+) -> Tuple[List[Tuple[Facility, float]], int]:
+    """search_facilities と同じ条件（conditions）の施設のうち、折れ線から buffer_km 以内（ID順、経路までの距離付き）"""
+    index = get_facility_bitmap_index(db)
+    candidates = candidate_bitmap(db, index, **conditions) & index.points.located
+    found = index.points.near_lines(lines, buffer_km, candidates)
+    offset = (page - 1) * per_page
+    ordinals = sorted(found)[offset:offset + per_page]
+    rows = _facility_rows(db, index.keys_at(ordinals))
+    return [
+        (rows[index.keys[i]], round(found[i], 2)) for i in ordinals if index.keys[i] in rows
+    ], len(found)
+
+
 def search_nearby(
     db: Session,
     lat: float,
@@ -125,6 +344,8 @@ def search_nearby(
     facility_types: Optional[List[int]] = None,
     specialty: Optional[str] = None,
     open_now: bool = False,
+    open_at: Optional[datetime] = None,
+    open_within: Optional[int] = None,
     limit: int = 20,
 ) -> List[Tuple[Facility, float]]:
     """近隣検索 — バウンディングボックス→haversine精密計算"""
@@ -144,45 +365,17 @@ def search_nearby(
         query = query.filter(Facility.facility_type.in_(facility_types))
 
     if specialty:
-        codes = _resolve_specialty_codes(db, specialty)
-        if codes:
-            exists_q = (
-                db.query(Specialty.id)
-                .filter(
-                    Specialty.facility_id == Facility.id,
-                    Specialty.specialty_code.in_(codes),
-                )
-                .exists()
-            )
-        else:
-            exists_q = (
-                db.query(Specialty.id)
-                .filter(
-                    Specialty.facility_id == Facility.id,
-                    Specialty.specialty_name.contains(specialty),
-                )
-                .exists()
-            )
-        query = query.filter(exists_q)
+        query = query.filter(_specialty_exists(db, specialty))
 
-    if open_now:
-        candidates = query.options(joinedload(Facility.specialities)).all()
-    else:
-        candidates = query.all()
+    open_ids = hours_ids(db, open_now=open_now, open_at=open_at, open_within=open_within)
 
     # haversineで精密距離計算
     results = []
-    for fac in candidates:
+    for fac in query.all():
+        if open_ids is not None and fac.id not in open_ids:
+            continue
         dist = haversine(lat, lng, fac.latitude, fac.longitude)
         if dist <= radius_km:
-            if open_now:
-                schedules = []
-                for s in fac.specialities:
-                    sched = json.loads(s.schedule) if isinstance(s.schedule, str) else s.schedule
-                    if sched:
-                        schedules.append(sched)
-                if not is_open_now(schedules):
-                    continue
             results.append((fac, round(dist, 2)))
 
     # 距離順ソート
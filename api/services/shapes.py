@@ -0,0 +1,157 @@
+"""多角形・折れ線の幾何（GeoJSON の読み込み、内外判定、線分までの距離）— DB非依存
+
+座標は内部では (緯度, 経度)。GeoJSON の position は [経度, 緯度(, 高さ)] なので読み込み時に入れ替える。
+
+    polygons = parse_polygons({"type": "Polygon", "coordinates": [[[139.6, 35.6], [139.8, 35.6], [139.7, 35.8], [139.6, 35.6]]]})
+    polygons[0].contains(35.65, 139.7)          # → True
+    lines = parse_lines({"type": "LineString", "coordinates": [[139.70, 35.66], [139.77, 35.68]]})
+    segment_distance(35.67, 139.73, *lines[0][:2])   # 線分までの距離km
+"""
+import math
+from typing import Dict, List, Tuple
+
+from .geo import EARTH_RADIUS_KM, MAX_LAT, MAX_LNG, MIN_LAT, MIN_LNG, haversine
+
+LatLng = Tuple[float, float]
+Edge = Tuple[float, float, float, float]   # (緯度1, 経度1, 緯度2, 経度2)
+
+KM_PER_DEG = math.radians(1) * EARTH_RADIUS_KM
+MAX_VERTICES = 100000
+MAX_LENGTH_KM = 20000      # 辺・線分の長さの合計（格子セルへの振り分けの手間が長さに比例する）
+MAX_BANDS = 1000
+MAX_BAND_EDGES = 32        # 帯1つあたりの辺の数の平均（1点の判定で見る辺の数）
+
+
+def _position(value) -> LatLng:
+    if not isinstance(value, (list, tuple)) or len(value) < 2:
+        raise ValueError("座標は [経度, 緯度] の配列で指定してください")
+    lng, lat = float(value[0]), float(value[1])
+    if not (MIN_LAT <= lat <= MAX_LAT and MIN_LNG <= lng <= MAX_LNG):
+        raise ValueError(f"座標が範囲外です（北緯{MIN_LAT:g}〜{MAX_LAT:g}度・東経{MIN_LNG:g}〜{MAX_LNG:g}度）: [{lng}, {lat}]")
+    return lat, lng
+
+
+def _unwrap(geojson: dict, kinds: Tuple[str, ...]) -> dict:
+    """Feature ならその geometry。type が kinds のいずれかであること"""
+    if not isinstance(geojson, dict):
+        raise ValueError("GeoJSON のオブジェクトを指定してください")
+    if geojson.get("type") == "Feature":
+        geojson = geojson.get("geometry") or {}
+    if geojson.get("type") not in kinds:
+        raise ValueError(f"geometry の type は {' / '.join(kinds)} のいずれかです")
+    if not isinstance(geojson.get("coordinates"), list):
+        raise ValueError("coordinates がありません")
+    return geojson
+
+
+def _check_size(count: int):
+    if count > MAX_VERTICES:
+        raise ValueError(f"頂点は合計 {MAX_VERTICES:,} 個までです")
+
+
+def _check_length(paths: List[List[LatLng]]):
+    length = sum(haversine(a[0], a[1], b[0], b[1]) for path in paths for a, b in zip(path, path[1:]))
+    if length > MAX_LENGTH_KM:
+        raise ValueError(f"辺・線分の長さは合計 {MAX_LENGTH_KM:,}km までです")
+
+
+class Polygon:
+    """外周と穴のリング（[(緯度, 経度), ...]）。偶奇規則で内外を判定する
+
+    緯度方向の帯ごとに、その帯にかかる辺だけを持つので、1点の判定で見る辺は帯の分だけ。
+    """
+
+    def __init__(self, rings: List[List[LatLng]]):
+        self.edges: List[Edge] = []
+        for ring in rings:
+            if ring[0] != ring[-1]:
+                ring = ring + [ring[0]]
+            self.edges.extend((a[0], a[1], b[0], b[1]) for a, b in zip(ring, ring[1:]) if a != b)
+        lats = [p[0] for ring in rings for p in ring]
+        lngs = [p[1] for ring in rings for p in ring]
+        self.bbox = (min(lats), max(lats), min(lngs), max(lngs))
+        span = self.bbox[1] - self.bbox[0]
+        self.band_deg = max(span / MAX_BANDS, 1e-6)
+        # 水平な辺は交差判定に関係しない
+        spans = [
+            (edge, self._band(min(edge[0], edge[2])), self._band(max(edge[0], edge[2])))
+            for edge in self.edges if edge[0] != edge[2]
+        ]
+        if sum(last - first + 1 for _, first, last in spans) > MAX_BAND_EDGES * MAX_BANDS:
+            raise ValueError("多角形が複雑すぎます（同じ緯度を横切る辺が多すぎます）")
+        self.bands: Dict[int, List[Edge]] = {}
+        for edge, first, last in spans:
+            for band in range(first, last + 1):
+                self.bands.setdefault(band, []).append(edge)
+
+    def _band(self, lat: float) -> int:
+        return int((lat - self.bbox[0]) / self.band_deg)
+
+    def contains(self, lat: float, lng: float) -> bool:
+        min_lat, max_lat, min_lng, max_lng = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+            return False
+        inside = False
+        for lat1, lng1, lat2, lng2 in self.bands.get(self._band(lat), ()):
+            if (lat1 > lat) != (lat2 > lat) and lng < lng1 + (lat - lat1) * (lng2 - lng1) / (lat2 - lat1):
+                inside = not inside
+        return inside
+
+
+def parse_polygons(geojson: dict) -> List[Polygon]:
+    """GeoJSON の Polygon / MultiPolygon（Feature 可）→ Polygon のリスト"""
+    geometry = _unwrap(geojson, ("Polygon", "MultiPolygon"))
+    coordinates = geometry["coordinates"]
+    parts = [coordinates] if geometry["type"] == "Polygon" else coordinates
+    _check_size(sum(len(ring) for part in parts for ring in part if isinstance(ring, list)))
+    parsed = []
+    for part in parts:
+        if not isinstance(part, list) or not part:
+            raise ValueError("Polygon にはリングが1つ以上必要です")
+        rings = []
+        for ring in part:
+            if not isinstance(ring, list):
+                raise ValueError("リングは座標の配列で指定してください")
+            points = [_position(p) for p in ring]
+            if len(set(points)) < 3:
+                raise ValueError("リングには異なる3点以上が必要です")
+            rings.append(points)
+        parsed.append(rings)
+    if not parsed:
+        raise ValueError("Polygon がありません")
+    _check_length([ring + ring[:1] for rings in parsed for ring in rings])
+    return [Polygon(rings) for rings in parsed]
+
+
+def parse_lines(geojson: dict) -> List[List[LatLng]]:
+    """GeoJSON の LineString / MultiLineString（Feature 可）→ 折れ線のリスト"""
+    geometry = _unwrap(geojson, ("LineString", "MultiLineString"))
+    coordinates = geometry["coordinates"]
+    parts = [coordinates] if geometry["type"] == "LineString" else coordinates
+    _check_size(sum(len(part) for part in parts if isinstance(part, list)))
+    lines = []
+    for part in parts:
+        if not isinstance(part, list) or len(part) < 2:
+            raise ValueError("LineString には2点以上が必要です")
+        lines.append([_position(p) for p in part])
+    if not lines:
+        raise ValueError("LineString がありません")
+    _check_length(lines)
+    return lines
+
+
+def segment_distance(lat: float, lng: float, a: LatLng, b: LatLng) -> float:
+    """点から線分 a-b までの距離km（線分付近の正距円筒図法の平面で近似）"""
+    k = math.cos(math.radians((a[0] + b[0]) / 2))
+    ax, ay = (a[1] - lng) * k, a[0] - lat
+    dx, dy = (b[1] - a[1]) * k, b[0] - a[0]
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else min(1.0, max(0.0, -(ax * dx + ay * dy) / length2))
+    return math.hypot(ax + t * dx, ay + t * dy) * KM_PER_DEG
+
+
+def split_segment(a: LatLng, b: LatLng, max_deg: float) -> List[Tuple[LatLng, LatLng]]:
+    """線分を緯度・経度とも max_deg 以下の区間に等分する"""
+    n = max(1, math.ceil(max(abs(b[0] - a[0]), abs(b[1] - a[1])) / max_deg))
+    points = [(a[0] + (b[0] - a[0]) * j / n, a[1] + (b[1] - a[1]) * j / n) for j in range(n + 1)]
+    return list(zip(points, points[1:]))
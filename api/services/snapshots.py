@@ -0,0 +1,251 @@
+"""分析用の列指向スナップショット（Parquet）
+
+インポートの最後に施設・診療科・病床・介護事業所を Parquet に書き出し、
+ファイル一覧・行数・チェックサムを manifest.json にまとめる。
+BIツールはAPIを叩かずにこれらのファイルを直接読み込める。
+
+診療科の診療時間・受付時間はパック表現を展開し、曜日ごとの開始・終了（0時からの分）の列にする。
+pyarrow は任意依存。無い環境では build_snapshots() が RuntimeError を送出する。
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..config import SNAPSHOT_DIR, DATA_DATE
+from ..models import Facility, Prefecture, Specialty, SpecialtyMaster, HospitalBed
+from ..kaigo_models import KaigoFacility
+from .schedule import DAYS, NO_TIME, PACKED, load_schedule, pack_schedule
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 任意依存
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+FETCH_SIZE = 5000
+BATCH_ROWS = 50000     # Parquet の row group 単位
+
+# 診療科の展開列: mon_start, mon_end, ..., hol_end, mon_reception_start, ...
+SCHEDULE_COLUMNS = [f"{day}_{edge}" for day in DAYS for edge in ("start", "end")]
+RECEPTION_COLUMNS = [f"{day}_reception_{edge}" for day in DAYS for edge in ("start", "end")]
+
+
+def _schema():
+    """スナップショット名 → pyarrow スキーマ"""
+    minutes = [(name, pa.uint16()) for name in SCHEDULE_COLUMNS + RECEPTION_COLUMNS]
+    return {
+        "facilities": pa.schema([
+            ("id", pa.string()), ("facility_type", pa.int8()), ("name", pa.string()),
+            ("name_kana", pa.string()), ("prefecture_code", pa.string()), ("prefecture_name", pa.string()),
+            ("city_code", pa.string()), ("address", pa.string()),
+            ("latitude", pa.float64()), ("longitude", pa.float64()),
+            ("website_url", pa.string()), ("closed_holiday", pa.bool_()),
+            ("corporate_number", pa.string()), ("data_date", pa.date32()),
+        ]),
+        "specialities": pa.schema([
+            ("facility_id", pa.string()), ("specialty_code", pa.string()), ("specialty_name", pa.string()),
+            ("time_slot", pa.string()), *minutes,
+        ]),
+        "beds": pa.schema([
+            ("facility_id", pa.string()), ("general", pa.int32()), ("recuperation", pa.int32()),
+            ("recuperation_medical", pa.int32()), ("recuperation_nursing", pa.int32()),
+            ("psychiatric", pa.int32()), ("tuberculosis", pa.int32()), ("infectious", pa.int32()),
+            ("total", pa.int32()),
+        ]),
+        "kaigo": pa.schema([
+            ("id", pa.string()), ("service_code", pa.string()), ("service_type", pa.string()),
+            ("name", pa.string()), ("prefecture_code", pa.string()), ("prefecture_name", pa.string()),
+            ("city_code", pa.string()), ("city_name", pa.string()), ("address", pa.string()),
+            ("latitude", pa.float64()), ("longitude", pa.float64()), ("phone", pa.string()),
+            ("corporate_number", pa.string()), ("corporate_name", pa.string()),
+            ("capacity", pa.int32()), ("available_days_mask", pa.int16()), ("website_url", pa.string()),
+        ]),
+    }
+
+
+def _minutes(blob: Optional[bytes]) -> list:
+    """パック表現 → 16列分の分（時間帯の無い曜日はNone）"""
+    if blob is None:
+        return [None] * 16
+    return [None if v == NO_TIME else v for v in PACKED.unpack(blob)]
+
+
+# --- 行の読み出し（いずれもスキーマと同じ列順のタプルを返す） ---
+
+def _facility_rows(db: Session) -> Iterable[tuple]:
+    return (
+        db.query(
+            Facility.id, Facility.facility_type, Facility.name, Facility.name_kana,
+            Facility.prefecture_code, Prefecture.name, Facility.city_code, Facility.address,
+            Facility.latitude, Facility.longitude, Facility.website_url, Facility.closed_holiday,
+            Facility.corporate_number, Facility.data_date,
+        )
+        .outerjoin(Prefecture, Prefecture.code == Facility.prefecture_code)
+        .order_by(Facility.id)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+
+
+def _specialty_rows(db: Session) -> Iterator[tuple]:
+    master = dict(db.query(SpecialtyMaster.code, SpecialtyMaster.name).all())
+    rows = (
+        db.query(
+            Specialty.facility_id, Specialty.specialty_code, Specialty.specialty_name, Specialty.time_slot,
+            Specialty.schedule, Specialty.schedule_packed, Specialty.reception, Specialty.reception_packed,
+        )
+        .order_by(Specialty.facility_id, Specialty.id)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+    for fid, code, name, slot, schedule, schedule_packed, reception, reception_packed in rows:
+        if schedule_packed is None and schedule is not None:
+            schedule_packed = pack_schedule(load_schedule(schedule))
+        if reception_packed is None and reception is not None:
+            reception_packed = pack_schedule(load_schedule(reception))
+        yield (
+            fid, code, name or master.get(code), slot,
+            *_minutes(schedule_packed), *_minutes(reception_packed),
+        )
+
+
+def _bed_rows(db: Session) -> Iterable[tuple]:
+    return (
+        db.query(
+            HospitalBed.facility_id, HospitalBed.general, HospitalBed.recuperation,
+            HospitalBed.recuperation_medical, HospitalBed.recuperation_nursing, HospitalBed.psychiatric,
+            HospitalBed.tuberculosis, HospitalBed.infectious, HospitalBed.total,
+        )
+        .order_by(HospitalBed.facility_id)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+
+
+def _kaigo_rows(db: Session) -> Iterable[tuple]:
+    names = _schema()["kaigo"].names
+    return (
+        db.query(*(getattr(KaigoFacility, c) for c in names))
+        .order_by(KaigoFacility.id, KaigoFacility.service_code)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+
+
+# スナップショット名 → (行の読み出し, 医療DBか介護DBか)
+SNAPSHOTS: List[Tuple[str, Callable[[Session], Iterable[tuple]], str]] = [
+    ("facilities", _facility_rows, "medical"),
+    ("specialities", _specialty_rows, "medical"),
+    ("beds", _bed_rows, "medical"),
+    ("kaigo", _kaigo_rows, "kaigo"),
+]
+
+
+def _write_parquet(rows: Iterable[tuple], schema, path: Path) -> int:
+    """BATCH_ROWS 行ずつ列に転置して書き出す。行数を返す"""
+    count = 0
+    tmp = Path(f"{path}.tmp")
+    with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        columns = [[] for _ in schema.names]
+        for row in rows:
+            for col, value in zip(columns, row):
+                col.append(value)
+            if len(columns[0]) >= BATCH_ROWS:
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+                count += len(columns[0])
+                columns = [[] for _ in schema.names]
+        if columns[0] or count == 0:
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            count += len(columns[0])
+    tmp.replace(path)
+    return count
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def build_snapshots(db: Session, kaigo_db: Optional[Session], out_dir: Path = SNAPSHOT_DIR) -> dict:
+    """全スナップショットと manifest.json を out_dir に書き出して manifest を返す
+
+    kaigo_db が None、または介護テーブルが読めない場合は kaigo を含めない。
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow がインストールされていません（pip install pyarrow）")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    schemas = _schema()
+
+    files = []
+    for name, read_rows, source in SNAPSHOTS:
+        session = db if source == "medical" else kaigo_db
+        if session is None:
+            continue
+        path = out_dir / f"{name}.parquet"
+        try:
+            rows = _write_parquet(read_rows(session), schemas[name], path)
+        except Exception as e:
+            if source == "medical":
+                raise
+            logger.warning(f"Snapshot {name} skipped: {e}")
+            continue
+        files.append({
+            "name": name,
+            "path": path.name,
+            "media_type": PARQUET_MEDIA_TYPE,
+            "rows": rows,
+            "bytes": path.stat().st_size,
+            "sha256": _sha256(path),
+            "columns": [{"name": f.name, "type": str(f.type)} for f in schemas[name]],
+        })
+        logger.info(f"Snapshot: {name} {rows:,} rows")
+
+    manifest = {
+        "data_date": DATA_DATE,
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "files": files,
+    }
+    tmp = out_dir / f"{MANIFEST_NAME}.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, out_dir / MANIFEST_NAME)
+    return manifest
+
+
+# (mtime_ns, manifest)
+_manifest_cache: dict = {}
+
+
+def load_manifest(out_dir: Path = SNAPSHOT_DIR) -> Optional[dict]:
+    """manifest.json（未生成ならNone）。ファイルが更新されるまで読み直さない"""
+    path = Path(out_dir) / MANIFEST_NAME
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    cached = _manifest_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _manifest_cache[path] = (mtime, json.loads(path.read_text(encoding="utf-8")))
+    return cached[1]
+
+
+def snapshot_path(name: str, out_dir: Path = SNAPSHOT_DIR) -> Optional[Path]:
+    """manifest に載っているファイル名なら実ファイルのパス"""
+    manifest = load_manifest(out_dir)
+    if manifest is None:
+        return None
+    for entry in manifest["files"]:
+        if entry["path"] == name:
+            path = Path(out_dir) / name
+            return path if path.exists() else None
+    return None
@@ -0,0 +1,197 @@
+"""施設の空間インデックス（メモリ上の格子）
+
+緯度経度を CELL_DEG 度の格子に区切り、セルごとに行番号を持つ。
+施設種別ごとにパーティションを分けるので、種別で絞る検索は該当パーティションだけを見る。
+データバージョン（api/cache.py）が変わるまで使い回し、DBへは結果行の取得でしか触れない。
+"""
+import heapq
+import logging
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.orm import Session, load_only
+
+from ..cache import engine_version
+from ..models import Facility
+from . import grid
+from .geo import haversine
+from .grid import Cell, Extent
+from .search import facility_ids_with_specialty
+
+logger = logging.getLogger(__name__)
+
+CELL_DEG = 0.02          # 緯度方向 約2.2km
+BATCH_CHUNK = 200        # 一括検索で結果行をまとめて取得する地点数
+
+# 一覧の出力に必要な列だけ読む
+_list_columns = load_only(
+    Facility.id, Facility.facility_type, Facility.name, Facility.prefecture_code,
+    Facility.city_code, Facility.address, Facility.latitude, Facility.longitude,
+    Facility.website_url,
+)
+
+
+class GridIndex:
+    """1パーティション分の格子インデックス（施設がまばらな集合はセルを大きくする）"""
+
+    __slots__ = ("cell_deg", "ids", "lats", "lngs", "cells", "extent")
+
+    def __init__(self, cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self.ids: List[str] = []
+        self.lats = array("d")
+        self.lngs = array("d")
+        self.cells: Dict[Cell, array] = {}
+        self.extent: Extent = grid.EMPTY
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, facility_id: str, lat: float, lng: float):
+        cell = grid.cell_of(lat, lng, self.cell_deg)
+        self.cells.setdefault(cell, array("I")).append(len(self.ids))
+        self.extent = grid.grow(self.extent, cell)
+        self.ids.append(facility_id)
+        self.lats.append(lat)
+        self.lngs.append(lng)
+
+    def nearest(
+        self, lat: float, lng: float, k: int, max_km: float, allowed: Optional[Set[str]] = None,
+    ) -> List[Tuple[float, str]]:
+        """半径 max_km 以内で近い順に最大 k 件の (距離km, id)
+
+        中心セルから1リングずつ広げ（grid.rings）、k件目の距離が「まだ見ていないセルまでの最短距離」
+        以下になった時点で打ち切る。
+        """
+        found: List[Tuple[float, str]] = []   # 距離の大きい順のヒープ（符号反転）
+        for bound, cells in grid.rings(self.cells, self.extent, self.cell_deg, lat, lng, max_km):
+            for cell in cells:
+                for i in self.cells[cell]:
+                    fid = self.ids[i]
+                    if allowed is not None and fid not in allowed:
+                        continue
+                    dist = haversine(lat, lng, self.lats[i], self.lngs[i])
+                    if dist > max_km:
+                        continue
+                    if len(found) < k:
+                        heapq.heappush(found, (-dist, fid))
+                    elif dist < -found[0][0]:
+                        heapq.heapreplace(found, (-dist, fid))
+            if bound > max_km or (len(found) == k and -found[0][0] <= bound):
+                break
+
+        return sorted((-d, fid) for d, fid in found)
+
+    def count_within(self, lat: float, lng: float, max_km: float) -> int:
+        """半径 max_km 以内の件数"""
+        return sum(
+            1
+            for _, cells in grid.rings(self.cells, self.extent, self.cell_deg, lat, lng, max_km)
+            for cell in cells for i in self.cells[cell]
+            if haversine(lat, lng, self.lats[i], self.lngs[i]) <= max_km
+        )
+
+
+class SpatialIndex:
+    """施設種別ごとのパーティションを持つ空間インデックス"""
+
+    def __init__(self, rows: Iterable[Tuple[str, int, float, float]]):
+        self.partitions: Dict[int, GridIndex] = {}
+        for facility_id, facility_type, lat, lng in rows:
+            self.partitions.setdefault(facility_type, GridIndex()).add(facility_id, lat, lng)
+
+    def __len__(self):
+        return sum(len(p) for p in self.partitions.values())
+
+    def _selected(self, types: Optional[Sequence[int]]):
+        if not types:
+            return self.partitions.items()
+        return [(t, self.partitions[t]) for t in types if t in self.partitions]
+
+    def nearest(
+        self, lat: float, lng: float, k: int, max_km: float,
+        types: Optional[Sequence[int]] = None, allowed: Optional[Set[str]] = None,
+    ) -> List[Tuple[float, str]]:
+        """全パーティション（または types のみ）を通して近い順に最大 k 件"""
+        per_type = [p.nearest(lat, lng, k, max_km, allowed) for _, p in self._selected(types)]
+        return list(heapq.merge(*per_type))[:k]
+
+    def nearest_by_type(
+        self, lat: float, lng: float, max_km: float,
+        types: Optional[Sequence[int]] = None, allowed: Optional[Set[str]] = None,
+    ) -> Dict[int, Tuple[float, str]]:
+        """種別ごとに最寄り1件 {facility_type: (距離km, id)}。見つからない種別は含まない"""
+        result = {}
+        for facility_type, partition in self._selected(types):
+            hit = partition.nearest(lat, lng, 1, max_km, allowed)
+            if hit:
+                result[facility_type] = hit[0]
+        return result
+
+
+# engine → (データバージョン, SpatialIndex)
+_indexes = {}
+
+
+def get_spatial_index(db: Session) -> SpatialIndex:
+    engine = db.get_bind()
+    version = engine_version(engine)
+    cached = _indexes.get(engine)
+    if cached is None or cached[0] != version:
+        rows = (
+            db.query(Facility.id, Facility.facility_type, Facility.latitude, Facility.longitude)
+            .filter(Facility.latitude.isnot(None), Facility.longitude.isnot(None))
+        )
+        index = SpatialIndex(rows)
+        logger.info(f"Spatial index: {len(index):,} facilities")
+        cached = _indexes[engine] = (version, index)
+    return cached[1]
+
+
+def search_nearest_by_type(
+    db: Session,
+    lat: float,
+    lng: float,
+    max_km: float = 50.0,
+    facility_types: Optional[List[int]] = None,
+    specialty: Optional[str] = None,
+) -> List[Tuple[int, Facility, float]]:
+    """種別ごとの最寄り施設 [(種別, 施設, 距離km), ...]（種別コード順）"""
+    allowed = facility_ids_with_specialty(db, specialty) if specialty else None
+    hits = get_spatial_index(db).nearest_by_type(lat, lng, max_km, facility_types, allowed)
+    if not hits:
+        return []
+    facilities = {
+        f.id: f for f in db.query(Facility).options(_list_columns)
+        .filter(Facility.id.in_([fid for _, fid in hits.values()]))
+    }
+    return [
+        (facility_type, facilities[fid], round(dist, 2))
+        for facility_type, (dist, fid) in sorted(hits.items()) if fid in facilities
+    ]
+
+
+def search_nearby_batch(
+    db: Session,
+    points: Sequence[Tuple[float, float]],
+    radius_km: float = 5.0,
+    facility_types: Optional[List[int]] = None,
+    specialty: Optional[str] = None,
+    limit: int = 5,
+) -> Iterator[Tuple[int, List[Tuple[Facility, float]]]]:
+    """複数地点の近隣検索。地点ごとに (入力順の番号, [(施設, 距離km), ...]) を順に返す"""
+    index = get_spatial_index(db)
+    allowed = facility_ids_with_specialty(db, specialty) if specialty else None
+
+    for start in range(0, len(points), BATCH_CHUNK):
+        chunk = points[start:start + BATCH_CHUNK]
+        hits = [index.nearest(lat, lng, limit, radius_km, facility_types, allowed) for lat, lng in chunk]
+
+        ids = {fid for h in hits for _, fid in h}
+        facilities = {
+            f.id: f for f in db.query(Facility).options(_list_columns).filter(Facility.id.in_(ids))
+        } if ids else {}
+
+        for offset, h in enumerate(hits):
+            yield start + offset, [(facilities[fid], round(dist, 2)) for dist, fid in h if fid in facilities]
+        db.expunge_all()
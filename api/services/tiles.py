@@ -0,0 +1,120 @@
+"""ベクトルタイルのキャッシュ（MBTiles形式のSQLite）
+
+インポート時に全タイルを生成して gzip 済みのまま tiles テーブルに保存し、
+リクエスト時は1行読んでそのバイト列を返すだけにする。
+
+MBTiles の tile_row は TMS（y軸が南から）なので、XYZ の y とは 2^z - 1 - y で変換する。
+"""
+import gzip
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..config import TILES_PATH
+from .mvt import LayerBuilder, encode_tile, project, EXTENT
+
+logger = logging.getLogger(__name__)
+
+MIN_ZOOM = 6
+MAX_ZOOM = 14
+
+# (レイヤー名, [(lat, lng, properties), ...])
+LayerSource = Tuple[str, Iterable[Tuple[float, float, dict]]]
+
+
+def build_mbtiles(
+    layers: List[LayerSource],
+    path: Path = TILES_PATH,
+    min_zoom: int = MIN_ZOOM,
+    max_zoom: int = MAX_ZOOM,
+) -> int:
+    """全ズームのタイルを生成して path に書き出す（既存ファイルは置き換え）。タイル数を返す"""
+    # 先にメルカトル座標へ変換しておき、ズームごとに使い回す
+    projected = []
+    for name, points in layers:
+        projected.append((name, [(*project(lat, lng), props) for lat, lng, props in points]))
+
+    tmp = Path(f"{path}.tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    conn.executescript("""
+        CREATE TABLE metadata (name TEXT, value TEXT);
+        CREATE TABLE tiles (
+            zoom_level  INTEGER,
+            tile_column INTEGER,
+            tile_row    INTEGER,
+            tile_data   BLOB
+        );
+        CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+    """)
+    conn.executemany("INSERT INTO metadata VALUES (?, ?)", [
+        ("name", "facilities"),
+        ("format", "pbf"),
+        ("type", "overlay"),
+        ("minzoom", str(min_zoom)),
+        ("maxzoom", str(max_zoom)),
+        ("bounds", "122,20,154,46"),
+    ])
+
+    count = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        n = 1 << zoom
+        tiles: Dict[Tuple[int, int], Dict[str, LayerBuilder]] = {}
+        for name, points in projected:
+            for x, y, props in points:
+                wx, wy = x * n, y * n
+                tx, ty = int(wx), int(wy)
+                layer = tiles.setdefault((tx, ty), {}).get(name)
+                if layer is None:
+                    layer = tiles[(tx, ty)][name] = LayerBuilder(name)
+                layer.add_point(int((wx - tx) * EXTENT), int((wy - ty) * EXTENT), props)
+
+        conn.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", (
+            (zoom, tx, n - 1 - ty, gzip.compress(encode_tile(by_name.values()), mtime=0))
+            for (tx, ty), by_name in tiles.items()
+        ))
+        conn.commit()
+        count += len(tiles)
+        logger.info(f"Tiles: z{zoom} {len(tiles):,} tiles")
+
+    conn.close()
+    tmp.replace(path)
+    return count
+
+
+# スレッドごとの読み取り専用接続（ファイルが作り直されたら開き直す）
+_local = threading.local()
+
+
+def _connection() -> Optional[sqlite3.Connection]:
+    try:
+        mtime = os.stat(TILES_PATH).st_mtime_ns
+    except OSError:
+        return None
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.mtime == mtime:
+        return conn
+    if conn is not None:
+        conn.close()
+    _local.conn = sqlite3.connect(f"file:{TILES_PATH}?mode=ro", uri=True, check_same_thread=False)
+    _local.mtime = mtime
+    return _local.conn
+
+
+def tiles_available() -> bool:
+    return Path(TILES_PATH).exists()
+
+
+def get_tile(z: int, x: int, y: int) -> Optional[bytes]:
+    """gzip 済みのMVT。タイルが無ければNone"""
+    conn = _connection()
+    if conn is None:
+        return None
+    row = conn.execute(
+        "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+        (z, x, (1 << z) - 1 - y),
+    ).fetchone()
+    return row[0] if row else None
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""一覧レスポンスのシリアライズCPU時間ベンチマーク（通常経路 vs FAST_JSON）
+
+  python scripts/bench_json.py            # 合成データ100件（DB不要、シリアライズ部分だけを比較）
+  python scripts/bench_json.py --live     # 実DBで /facilities, /facilities/nearby, /kaigo を比較
+
+1リクエストあたりのプロセスCPU時間（time.process_time）を計測する。
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.fastjson import FastJSONResponse, orjson
+from api.schemas import FacilityListOut, FacilityListResponse, PaginationOut
+
+
+def _cpu_per_request(client, path, n) -> float:
+    client.get(path)  # warm up
+    start = time.process_time()
+    for _ in range(n):
+        r = client.get(path)
+        assert r.status_code == 200, r.text
+    return (time.process_time() - start) / n * 1000
+
+
+def _rows(count):
+    return [SimpleNamespace(
+        id=f"{i:013d}", facility_type=2, name=f"渋谷区道玄坂クリニック{i}",
+        prefecture_code="13", prefecture=SimpleNamespace(name="東京都"), city_code="113",
+        address=f"東京都渋谷区道玄坂{i}-1", latitude=35.658 + i * 1e-4, longitude=139.702,
+        website_url=f"https://example.com/{i}",
+    ) for i in range(count)]
+
+
+def bench_synthetic(n, per_page):
+    from api.routes.facilities import _facility_to_list, _facility_row
+
+    rows = _rows(per_page)
+    pref_names = {"13": "東京都"}
+    pagination = {"page": 1, "per_page": per_page, "total": 12000, "pages": 120}
+    app = FastAPI()
+
+    @app.get("/pydantic", response_model=FacilityListResponse)
+    def pydantic_path():
+        return FacilityListResponse(
+            data=[_facility_to_list(f) for f in rows],
+            pagination=PaginationOut(**pagination),
+        )
+
+    @app.get("/fast", response_model=FacilityListResponse)
+    def fast_path():
+        return FastJSONResponse({
+            "data": [_facility_row(f, pref_names) for f in rows],
+            "pagination": pagination,
+        })
+
+    @app.get("/pydantic-nearby", response_model=List[FacilityListOut])
+    def pydantic_nearby():
+        return [_facility_to_list(f, 0.5) for f in rows]
+
+    @app.get("/fast-nearby", response_model=List[FacilityListOut])
+    def fast_nearby():
+        return FastJSONResponse([_facility_row(f, pref_names, 0.5) for f in rows])
+
+    client = TestClient(app)
+    assert client.get("/pydantic").json() == client.get("/fast").json()
+    return [
+        (f"list {per_page}件", _cpu_per_request(client, "/pydantic", n), _cpu_per_request(client, "/fast", n)),
+        (f"nearby {per_page}件", _cpu_per_request(client, "/pydantic-nearby", n),
+         _cpu_per_request(client, "/fast-nearby", n)),
+    ]
+
+
+def bench_live(n):
+    from api.main import app
+    from api.routes import facilities, kaigo
+
+    client = TestClient(app)
+    paths = [
+        "/api/v1/facilities?per_page=100",
+        "/api/v1/facilities/nearby?lat=35.658&lng=139.702&radius=3&limit=100",
+        "/api/v1/kaigo?per_page=100",
+    ]
+    results = []
+    for path in paths:
+        facilities.FAST_JSON = kaigo.FAST_JSON = False
+        slow = _cpu_per_request(client, path, n)
+        facilities.FAST_JSON = kaigo.FAST_JSON = True
+        fast = _cpu_per_request(client, path, n)
+        results.append((path, slow, fast))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="実DBのエンドポイントで計測")
+    parser.add_argument("-n", type=int, default=200, help="リクエスト回数")
+    parser.add_argument("--per-page", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'json (stdlib)'}")
+    results = bench_live(args.n) if args.live else bench_synthetic(args.n, args.per_page)
+
+    print(f"{'case':<70} {'pydantic':>10} {'fast':>10} {'saved':>8}")
+    for name, slow, fast in results:
+        saved = (1 - fast / slow) * 100 if slow else 0
+        print(f"{name:<70} {slow:>8.2f}ms {fast:>8.2f}ms {saved:>7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""SQLite 接続プロファイル（SQLITE_PROFILE）ごとのレイテンシのベンチマーク
+
+  python scripts/bench_sqlite.py                      # default / read / immutable を比較
+  python scripts/bench_sqlite.py -n 300 --profiles default read
+
+tests/test_smoke.py の主なクエリを、プロファイルごとに別プロセス（エンジンは import 時に作られるため）で
+ウォームアップ後に n 回ずつ実行し、1リクエストの経過時間の中央値と p95 を比べる。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# tests/test_smoke.py のクエリ（SQLite に行を取りに行くもの）。{facility} {kaigo} は実在するID
+PATHS = [
+    "/api/v1/facilities?per_page=5",
+    "/api/v1/facilities?q=渋谷&per_page=3",
+    "/api/v1/facilities?specialty=内科&per_page=3",
+    "/api/v1/facilities?prefecture=13&facets=type,city,specialty&facet_limit=500",
+    "/api/v1/facilities?q=渋谷&open_now=true&per_page=3",
+    "/api/v1/facilities?per_page=5&page=2",
+    "/api/v1/facilities/nearby?lat=35.658&lng=139.702&radius=1",
+    "/api/v1/facilities/nearby?lat=35.658&lng=139.702&radius=1&specialty=内科",
+    "/api/v1/facilities/nearest-by-type?lat=35.658&lng=139.702",
+    "/api/v1/nearby/all?lat=35.658&lng=139.702&radius=3&limit=50",
+    "/api/v1/facilities/{facility}",
+    "/api/v1/kaigo?per_page=3",
+    "/api/v1/kaigo?facets=service,prefecture,available_day",
+    "/api/v1/kaigo?available_day=sat,sun&per_page=100",
+    "/api/v1/kaigo/{kaigo}",
+]
+PROFILES = ("default", "read", "immutable")
+
+
+def measure(n: int) -> dict:
+    """このプロセスのプロファイルで各クエリを計測 {path: [中央値ms, p95ms]}"""
+    from fastapi.testclient import TestClient
+    from api.main import app
+
+    client = TestClient(app)
+    ids = {
+        "facility": client.get("/api/v1/facilities?per_page=1").json()["data"][0]["id"],
+        "kaigo": client.get("/api/v1/kaigo?per_page=1").json()["data"][0]["id"],
+    }
+    results = {}
+    for template in PATHS:
+        path = template.format(**ids)
+        assert client.get(path).status_code == 200, path   # ウォームアップ（インデックス・キャッシュの構築）
+        times = []
+        for _ in range(n):
+            start = time.perf_counter()
+            client.get(path)
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        results[template] = [statistics.median(times), times[int(len(times) * 0.95) - 1]]
+    return results
+
+
+def run_profile(profile: str, n: int) -> dict:
+    env = dict(os.environ, SQLITE_PROFILE=profile)
+    out = subprocess.run(
+        [sys.executable, __file__, "--measure", "-n", str(n)], env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=200, help="クエリごとのリクエスト回数")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES))
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.n)))
+        return
+
+    results = {profile: run_profile(profile, args.n) for profile in args.profiles}
+    base = args.profiles[0]
+    print(f"中央値ms（p95ms）、変化は {base} 比")
+    print(f"{'query':<72}" + "".join(f"{p:>22}" for p in args.profiles))
+    for path in PATHS:
+        cells = []
+        for profile in args.profiles:
+            median, p95 = results[profile][path]
+            change = (median / results[base][path][0] - 1) * 100
+            cells.append(f"{median:7.2f} ({p95:6.2f})" + (f" {change:+4.0f}%" if profile != base else "      "))
+        print(f"{path:<72}" + "".join(f"{c:>22}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""1kmメッシュのカバレッジ分析（最寄り病院までの距離・2km以内の薬局数）を一括生成
+
+  python scripts/build_coverage.py                       # 全都道府県 → data/coverage/<DATA_DATE>/
+  python scripts/build_coverage.py 13 14 --specialty 小児科
+  python scripts/build_coverage.py --workers 8           # プロセス数（デフォルト COVERAGE_WORKERS / CPU数）
+
+生成済みの結果は /api/v1/analytics/coverage がそのまま返す。再インポート時に import_data.py が消す。
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.config import COVERAGE_DIR, DATA_DATE
+from api.database import SessionLocal
+from api.services import coverage
+from api.services.search import get_prefecture_names
+
+
+def build_coverage(prefectures=None, specialty=None, workers=0):
+    print(f"🗾 カバレッジ分析（{DATA_DATE}）...")
+    start = time.time()
+    db = SessionLocal()
+    try:
+        if specialty:
+            specialty = coverage.resolve_specialty(db, specialty)
+        for pref in prefectures or sorted(get_prefecture_names(db)):
+            t = time.time()
+            result = coverage.compute_coverage(db, pref, specialty, workers=workers)
+            coverage.save_coverage(result, coverage.coverage_path(pref, specialty))
+            s = result["summary"]
+            print(
+                f"   {pref} {s['cells']:>7,}メッシュ  病院10km超 {s['cells_hospital_over_10km']:>6,}"
+                f"  薬局なし {s['cells_without_pharmacy']:>6,}  {time.time() - t:.1f}秒"
+            )
+    finally:
+        db.close()
+    print(f"   ✅ {time.time() - start:.1f}秒 → {COVERAGE_DIR / DATA_DATE}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="1kmメッシュのカバレッジ分析を生成")
+    parser.add_argument("prefectures", nargs="*", help="都道府県コード（省略時は全都道府県）")
+    parser.add_argument("--specialty", help="最寄り病院を診療科で絞る")
+    parser.add_argument("--workers", type=int, default=0, help="プロセス数")
+    args = parser.parse_args()
+    build_coverage(args.prefectures, args.specialty, args.workers)
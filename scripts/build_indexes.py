@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""ビットマップインデックス（ID・座標・属性値・診療時間）をフラットファイルに書き出す
+
+  python scripts/build_indexes.py                  # → data/index/facilities.idx, kaigo.idx
+  python scripts/build_indexes.py kaigo
+
+import_data.py / import_kaigo.py の最後にも実行される。APIの各ワーカーは起動時に
+このファイルを mmap するだけで、SQLite からインデックスを作らない（DBが更新されていれば作る）。
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.database import SessionLocal, KaigoSessionLocal
+from api.services.bitmap_index import index_path, write_index_file
+
+SESSIONS = {"facilities": SessionLocal, "kaigo": KaigoSessionLocal}
+
+
+def build_indexes(kinds=None):
+    print("🗂️  インデックスファイル生成...")
+    for kind in kinds or SESSIONS:
+        start = time.time()
+        db = SESSIONS[kind]()
+        try:
+            index = write_index_file(kind, db)
+        finally:
+            db.close()
+        path = index_path(kind)
+        print(f"   {kind:<11} {len(index):>9,}行 {path.stat().st_size / 1024 / 1024:6.1f}MB {time.time() - start:.1f}秒")
+    print(f"   ✅ → {index_path('facilities').parent}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ビットマップインデックスのファイルを生成")
+    parser.add_argument("kinds", nargs="*", help="facilities / kaigo（省略時は両方）")
+    args = parser.parse_args()
+    unknown = set(args.kinds) - set(SESSIONS)
+    if unknown:
+        parser.error(f"不明な種類: {', '.join(sorted(unknown))}")
+    build_indexes(args.kinds)
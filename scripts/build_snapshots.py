@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""分析用の列指向スナップショット（Parquet + manifest.json）を生成
+
+  pip install pyarrow                              # 任意依存
+  python scripts/build_snapshots.py                # → data/snapshots/
+
+import_data.py / import_kaigo.py の最後にも実行される（pyarrow が無ければスキップ）。
+ファイル: facilities / specialities（曜日別の開始・終了を列に展開）/ beds / kaigo
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.config import SNAPSHOT_DIR
+from api.database import SessionLocal, KaigoSessionLocal
+from api.services import snapshots
+
+
+def build_snapshots():
+    if snapshots.pa is None:
+        print("📦 スナップショット: pyarrow が無いためスキップ（pip install pyarrow）")
+        return
+    print("📦 列指向スナップショット生成...")
+    start = time.time()
+    db = SessionLocal()
+    kaigo_db = KaigoSessionLocal()
+    try:
+        manifest = snapshots.build_snapshots(db, kaigo_db, SNAPSHOT_DIR)
+    finally:
+        db.close()
+        kaigo_db.close()
+    for f in manifest["files"]:
+        print(f"   {f['name']:<14} {f['rows']:>10,}行 {f['bytes'] / 1024 / 1024:6.1f}MB")
+    print(f"   ✅ {time.time() - start:.1f}秒 → {SNAPSHOT_DIR}")
+
+
+if __name__ == "__main__":
+    build_snapshots()
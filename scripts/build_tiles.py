@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""医療施設・介護事業所のベクトルタイル（MBTiles）を生成
+
+  python scripts/build_tiles.py                    # z6〜z14 → data/tiles.mbtiles
+  python scripts/build_tiles.py --maxzoom 12       # ズーム範囲を指定
+
+import_data.py / import_kaigo.py の最後にも実行される。
+レイヤー: facilities（type=施設種別, id, name）/ kaigo（type=サービスコード, id, name）
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.config import TILES_PATH
+from api.database import SessionLocal, KaigoSessionLocal
+from api.models import Facility
+from api.kaigo_models import KaigoFacility
+from api.services.tiles import build_mbtiles, MIN_ZOOM, MAX_ZOOM
+
+
+def _facility_points():
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Facility.latitude, Facility.longitude, Facility.facility_type, Facility.id, Facility.name)
+            .filter(Facility.latitude.isnot(None), Facility.longitude.isnot(None))
+            .all()
+        )
+    finally:
+        db.close()
+    return [(lat, lng, {"type": t, "id": fid, "name": name}) for lat, lng, t, fid, name in rows]
+
+
+def _kaigo_points():
+    db = KaigoSessionLocal()
+    try:
+        rows = (
+            db.query(KaigoFacility.latitude, KaigoFacility.longitude, KaigoFacility.service_code,
+                     KaigoFacility.id, KaigoFacility.name)
+            .filter(KaigoFacility.latitude.isnot(None), KaigoFacility.longitude.isnot(None))
+            .all()
+        )
+    except Exception as e:
+        print(f"   ⚠️ 介護データを読めないためスキップ: {e}")
+        return []
+    finally:
+        db.close()
+    return [(lat, lng, {"type": code, "id": fid, "name": name}) for lat, lng, code, fid, name in rows]
+
+
+def build_tiles(min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    print(f"🗺️  ベクトルタイル生成 (z{min_zoom}〜z{max_zoom})...")
+    start = time.time()
+    facilities = _facility_points()
+    kaigo = _kaigo_points()
+    n = build_mbtiles([("facilities", facilities), ("kaigo", kaigo)], TILES_PATH, min_zoom, max_zoom)
+    size = TILES_PATH.stat().st_size / 1024 / 1024
+    print(f"   ✅ {n:,}タイル（施設 {len(facilities):,} / 介護 {len(kaigo):,}）"
+          f" {size:.1f}MB {time.time() - start:.1f}秒 → {TILES_PATH}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ベクトルタイル（MBTiles）を生成")
+    parser.add_argument("--minzoom", type=int, default=MIN_ZOOM)
+    parser.add_argument("--maxzoom", type=int, default=MAX_ZOOM)
+    args = parser.parse_args()
+    build_tiles(args.minzoom, args.maxzoom)
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
-"""厚労省オープンデータのダウンロード"""
+"""厚労省オープンデータのダウンロード
+
+ZIPは展開しない。import_data.py がZIP内のCSVを直接読み込む。
+"""
 
-import os
-import requests
-import zipfile
 from pathlib import Path
 
+from fetcher import fetch_many
+
 BASE_URL = "https://www.mhlw.go.jp/content/11121000"
 RAW_DIR = Path(__file__).parent.parent / "data" / "raw"
 
@@ -25,33 +27,18 @@ DEFAULT_DATE = "20251201"
 
 
 def fetch_all(date: str = DEFAULT_DATE):
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-
+    jobs = []
     for name, template in DATASETS.items():
         filename = template.format(date=date)
-        url = f"{BASE_URL}/{filename}"
-        dest = RAW_DIR / filename
-
-        if dest.exists():
-            print(f"⏭️  {filename} already exists, skipping")
-            continue
-
-        print(f"⬇️  Downloading {filename}...")
-        r = requests.get(url, stream=True)
-        r.raise_for_status()
-
-        with open(dest, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        print(f"   {dest.stat().st_size:,} bytes")
+        jobs.append((f"{BASE_URL}/{filename}", filename))
 
-        # Extract
-        with zipfile.ZipFile(dest) as zf:
-            zf.extractall(RAW_DIR)
-            print(f"   Extracted: {', '.join(zf.namelist())}")
+    results = fetch_many(jobs, RAW_DIR)
 
-    print("\n✅ All datasets downloaded")
+    failed = [r for r in results if r["status"] in ("failed", "missing")]
+    if failed:
+        print(f"\n⚠️  {len(failed)} dataset(s) failed: {', '.join(r['name'] for r in failed)}")
+    else:
+        print("\n✅ All datasets downloaded")
 
 
 if __name__ == "__main__":
@@ -5,11 +5,10 @@
 URL形式: https://www.mhlw.go.jp/content/12300000/jigyosho_XXX.csv
 """
 
-import sys
-import time
-import requests
 from pathlib import Path
 
+from fetcher import fetch_many
+
 BASE_URL = "https://www.mhlw.go.jp/content/12300000"
 RAW_DIR = Path(__file__).parent.parent / "data" / "raw" / "kaigo"
 
@@ -54,46 +53,22 @@ SERVICE_CODES = {
 
 
 def fetch_all():
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-    
-    success = 0
-    failed = []
-    
+    jobs = []
     for code in sorted(SERVICE_CODES.keys()):
         filename = f"jigyosho_{code}.csv"
-        url = f"{BASE_URL}/{filename}"
-        dest = RAW_DIR / filename
-        
-        if dest.exists() and dest.stat().st_size > 100:
-            print(f"⏭️  {filename} already exists ({dest.stat().st_size:,} bytes), skipping")
-            success += 1
-            continue
-        
-        print(f"⬇️  Downloading {filename} ({SERVICE_CODES[code]})...")
-        try:
-            r = requests.get(url, timeout=30)
-            if r.status_code == 404:
-                print(f"   ⚠️  404 Not Found — skipping")
-                failed.append((code, "404"))
-                continue
-            r.raise_for_status()
-            
-            with open(dest, "wb") as f:
-                f.write(r.content)
-            
-            print(f"   ✅ {dest.stat().st_size:,} bytes")
-            success += 1
-            time.sleep(0.5)  # be polite
-            
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
-            failed.append((code, str(e)))
-    
+        jobs.append((f"{BASE_URL}/{filename}", filename))
+
+    results = fetch_many(jobs, RAW_DIR)
+
+    success = sum(1 for r in results if r["status"] in ("downloaded", "resumed", "not_modified"))
+    failed = [(r["name"], r.get("error") or "404") for r in results
+              if r["status"] in ("failed", "missing")]
+
     print(f"\n📊 結果: {success}件成功, {len(failed)}件失敗")
     if failed:
         print("失敗一覧:")
-        for code, reason in failed:
-            print(f"  {code}: {reason}")
+        for name, reason in sorted(failed):
+            print(f"  {name}: {reason}")
 
 
 if __name__ == "__main__":
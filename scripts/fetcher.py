@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""共通ダウンローダ — 並列・レジューム・条件付きGET・チェックサム
+
+fetch_data.py / fetch_kaigo.py から利用する。
+
+- 並列数を制限したダウンロード（ThreadPoolExecutor）
+- `.part` ファイルへの書き込み + HTTP Range による途中再開
+- マニフェストに記録した ETag / Last-Modified で条件付きGET（304ならスキップ）
+- 取得したファイルの SHA-256 をマニフェストに記録し、スキップ時にも整合性を検証
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
+MANIFEST_NAME = "manifest.json"
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 60
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    """スレッドごとにSessionを持ち、コネクションを再利用する"""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(dest_dir: Path) -> dict:
+    path = Path(dest_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def save_manifest(dest_dir: Path, manifest: dict):
+    """一時ファイル経由で書き込み（中断時にマニフェストが壊れないように）"""
+    path = Path(dest_dir) / MANIFEST_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _is_intact(dest: Path, entry: dict) -> bool:
+    """ローカルファイルがマニフェストのサイズ・チェックサムと一致するか"""
+    if not dest.exists() or not entry.get("sha256"):
+        return False
+    if entry.get("size") is not None and dest.stat().st_size != entry["size"]:
+        return False
+    return sha256_file(dest) == entry["sha256"]
+
+
+def _range_validator(headers) -> str:
+    """If-Range に使える版（強いETag、無ければ Last-Modified）。どちらも無ければ空文字"""
+    etag = headers.get("ETag") or ""
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified") or ""
+
+
+def download(url: str, dest: Path, entry: dict = None, timeout: int = DEFAULT_TIMEOUT) -> dict:
+    """1ファイルをダウンロードし、結果とマニフェスト用エントリを返す。
+
+    status: downloaded / resumed / not_modified / missing / failed
+    """
+    dest = Path(dest)
+    entry = dict(entry or {})
+    part = dest.with_name(dest.name + ".part")
+    result = {"name": dest.name, "url": url, "status": "failed", "entry": entry}
+
+    headers = {}
+    intact = _is_intact(dest, entry)
+    if intact:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    offset = part.stat().st_size if part.exists() else 0
+    validator = entry.get("part_validator")
+    if offset and not validator:
+        # .part を書いたときの版が分からない → 続きが同じファイルか確かめられないので最初から
+        part.unlink()
+        offset = 0
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        # 途中で更新されていたら全体を返してもらう
+        headers["If-Range"] = validator
+
+    try:
+        r = _session().get(url, headers=headers, stream=True, timeout=timeout)
+        with r:
+            if r.status_code == 304:
+                result["status"] = "not_modified"
+                return result
+            if r.status_code == 404:
+                result["status"] = "missing"
+                return result
+            if r.status_code == 416 and offset:
+                # .partが既に完全 or サーバ側で縮んだ → 最初からやり直す
+                part.unlink()
+                entry.pop("part_validator", None)
+                return download(url, dest, entry, timeout)
+            r.raise_for_status()
+
+            h = hashlib.sha256()
+            if r.status_code == 206 and offset:
+                with open(part, "rb") as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        h.update(chunk)
+                mode = "ab"
+                result["status"] = "resumed"
+            else:
+                mode = "wb"
+                result["status"] = "downloaded"
+
+            validator = _range_validator(r.headers)
+            if validator:
+                entry["part_validator"] = validator
+            else:
+                entry.pop("part_validator", None)
+            with open(part, mode) as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    h.update(chunk)
+    except requests.RequestException as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+        # 途中まで書けた.partは次回のレジュームに使う
+        result["entry"] = entry
+        return result
+
+    os.replace(part, dest)
+    entry.pop("part_validator", None)
+    entry.update({
+        "url": url,
+        "size": dest.stat().st_size,
+        "sha256": h.hexdigest(),
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+    })
+    result["entry"] = entry
+    return result
+
+
+def fetch_many(jobs, dest_dir: Path, max_workers: int = DEFAULT_WORKERS,
+               timeout: int = DEFAULT_TIMEOUT, verbose: bool = True) -> list:
+    """(url, filename) のリストを並列ダウンロード。結果dictのリストを返す。
+
+    マニフェスト(dest_dir/manifest.json)はファイルごとに更新する。
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(dest_dir)
+    lock = threading.Lock()
+    results = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(download, url, dest_dir / filename, manifest.get(filename), timeout): filename
+            for url, filename in jobs
+        }
+        for future in as_completed(futures):
+            filename = futures[future]
+            result = future.result()
+            with lock:
+                if result["status"] != "missing":
+                    manifest[filename] = result["entry"]
+                save_manifest(dest_dir, manifest)
+            results.append(result)
+            if verbose:
+                _report(result)
+
+    return results
+
+
+def _report(result: dict):
+    status = result["status"]
+    name = result["name"]
+    size = result["entry"].get("size") or 0
+    if status == "not_modified":
+        print(f"⏭️  {name} not modified, skipping")
+    elif status in ("downloaded", "resumed"):
+        label = "resumed" if status == "resumed" else "downloaded"
+        print(f"⬇️  {name} {label} ({size:,} bytes)")
+    elif status == "missing":
+        print(f"⚠️  {name} 404 Not Found — skipping")
+    else:
+        print(f"❌ {name} error: {result.get('error')}")
@@ -1,20 +1,37 @@
 #!/usr/bin/env python3
-"""厚労省CSVをDBにインポート"""
+"""厚労省CSVをDBにインポート
+
+ダウンロードしたZIPは展開せず、CSVメンバーを直接ストリーム読み込みする。
+（展開済みCSVが data/raw/ にあればそれも読める）
+"""
 
 import csv
+import io
 import sys
 import json
+import zipfile
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 from datetime import date
 
 # プロジェクトルートをパスに追加
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from sqlalchemy import text
+
 from api.database import engine, SessionLocal, Base
 from api.models import (
     Prefecture, City, SpecialtyMaster,
     Facility, Specialty, HospitalBed, BusinessHour
 )
+from api.services.schedule import pack_schedule
+from api.services.documents import build_facility_documents
+from api.services.coverage import clear_coverage
+from api.services.fts import create_fts_table, rebuild_fts_index
+from build_indexes import build_indexes
+from build_tiles import build_tiles
+from build_snapshots import build_snapshots
 
 RAW_DIR = Path(__file__).parent.parent / "data" / "raw"
 
@@ -42,6 +59,66 @@ SPECIALTY_CATEGORIES = {
 DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun", "hol"]
 DATA_DATE = date(2025, 12, 1)
 
+# --compact: 主キーが非整数で行の小さいテーブルは WITHOUT ROWID にする
+COMPACT_WITHOUT_ROWID = ["prefectures", "cities", "specialty_master", "hospital_beds"]
+
+
+# 「ZIP名.csv」→ (パス, ZIPメンバー名)。単一CSVのZIPの別名で、raw_sources() とは別に引く
+_raw_aliases = {}
+
+
+@lru_cache(maxsize=1)
+def raw_sources() -> dict:
+    """取り込み可能なCSV一覧 {CSVファイル名: (パス, ZIPメンバー名 or None)}
+
+    1つのCSVは1件だけ（全件を読む import_cities が同じCSVを2回読まないように）。
+    単一CSVのZIPは「ZIP名.csv」でも開けるが、その別名は _raw_aliases に入れる。
+    """
+    sources = {}
+    _raw_aliases.clear()
+    for zpath in sorted(RAW_DIR.glob("*.zip")):
+        try:
+            with zipfile.ZipFile(zpath) as zf:
+                members = [n for n in zf.namelist() if n.lower().endswith(".csv")]
+        except zipfile.BadZipFile:
+            print(f"   ⚠️ {zpath.name} is not a valid zip, skipping")
+            continue
+        for member in members:
+            sources.setdefault(Path(member).name, (zpath, member))
+        if len(members) == 1:
+            _raw_aliases.setdefault(f"{zpath.stem}.csv", (zpath, members[0]))
+    for cpath in sorted(RAW_DIR.glob("*.csv")):
+        sources.setdefault(cpath.name, (cpath, None))
+    return sources
+
+
+def _raw_source(filename):
+    """CSVファイル名（または「ZIP名.csv」）→ (パス, ZIPメンバー名 or None)。無ければNone"""
+    sources = raw_sources()
+    if filename in sources:
+        return sources[filename]
+    return _raw_aliases.get(filename)
+
+
+def raw_csv_exists(filename) -> bool:
+    return _raw_source(filename) is not None
+
+
+@contextmanager
+def open_raw_csv(filename):
+    """CSVをテキストストリームとして開く（ZIPメンバーはディスクに展開しない）"""
+    source = _raw_source(filename)
+    if source is None:
+        raise KeyError(filename)
+    path, member = source
+    if member is None:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            yield f
+        return
+    with zipfile.ZipFile(path) as zf, zf.open(member) as raw:
+        with io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as f:
+            yield f
+
 
 def safe_int(v):
     """空文字やNoneを安全にintに変換"""
@@ -117,8 +194,8 @@ def import_cities(session):
     print("🏘️  市区町村マスタ...")
     cities = {}
 
-    for fname in RAW_DIR.glob("*.csv"):
-        with open(fname, encoding="utf-8-sig") as f:
+    for fname in raw_sources():
+        with open_raw_csv(fname) as f:
             reader = csv.reader(f)
             header = next(reader)
 
@@ -158,13 +235,12 @@ def import_cities(session):
 
 def import_facility_file(session, filename, facility_type, bed_start_col=None, bed_cols=None):
     """施設CSVを取り込み"""
-    filepath = RAW_DIR / filename
-    if not filepath.exists():
+    if not raw_csv_exists(filename):
         print(f"   ⚠️ {filename} not found, skipping")
         return 0
 
     count = 0
-    with open(filepath, encoding="utf-8-sig") as f:
+    with open_raw_csv(filename) as f:
         reader = csv.reader(f)
         header = next(reader)
 
@@ -234,18 +310,26 @@ def import_facility_file(session, filename, facility_type, bed_start_col=None, b
     return count
 
 
-def import_speciality_file(session, filename):
-    """診療科CSVを取り込み（バルクインサート）"""
-    filepath = RAW_DIR / filename
-    if not filepath.exists():
+def import_speciality_file(session, filename, compact=False):
+    """診療科CSVを取り込み（バルクインサート）
+
+    診療時間は常にパック表現（カレンダー・open_now はこちらを読む）でも保存する。
+    compact=True: マスタと同名の診療科名はNULL（コードから引く）、
+    診療時間のJSONは保存しない。
+    """
+    if not raw_csv_exists(filename):
         print(f"   ⚠️ {filename} not found, skipping")
         return 0
 
+    master_names = {}
+    if compact:
+        master_names = dict(session.query(SpecialtyMaster.code, SpecialtyMaster.name).all())
+
     count = 0
     batch = []
     BATCH_SIZE = 5000
 
-    with open(filepath, encoding="utf-8-sig") as f:
+    with open_raw_csv(filename) as f:
         reader = csv.reader(f)
         next(reader)  # header
 
@@ -255,15 +339,29 @@ def import_speciality_file(session, filename):
 
             schedule = parse_schedule(row, 4)
             reception = parse_schedule(row, 20)
-
-            batch.append({
-                "facility_id": row[0].strip(),
-                "specialty_code": row[1].strip() or None,
-                "specialty_name": row[2].strip(),
-                "time_slot": row[3].strip() or None,
-                "schedule": json.dumps(schedule, ensure_ascii=False),
-                "reception": json.dumps(reception, ensure_ascii=False),
-            })
+            code = row[1].strip() or None
+            name = row[2].strip()
+
+            if compact:
+                batch.append({
+                    "facility_id": row[0].strip(),
+                    "specialty_code": code,
+                    "specialty_name": None if master_names.get(code) == name else name,
+                    "time_slot": row[3].strip() or None,
+                    "schedule_packed": pack_schedule(schedule),
+                    "reception_packed": pack_schedule(reception),
+                })
+            else:
+                batch.append({
+                    "facility_id": row[0].strip(),
+                    "specialty_code": code,
+                    "specialty_name": name,
+                    "time_slot": row[3].strip() or None,
+                    "schedule": json.dumps(schedule, ensure_ascii=False),
+                    "reception": json.dumps(reception, ensure_ascii=False),
+                    "schedule_packed": pack_schedule(schedule),
+                    "reception_packed": pack_schedule(reception),
+                })
             count += 1
 
             if len(batch) >= BATCH_SIZE:
@@ -287,10 +385,9 @@ def import_specialty_master(session):
     for fname in ["01-2_hospital_speciality_hours_20251201.csv",
                    "02-2_clinic_speciality_hours_20251201.csv",
                    "03-2_dental_speciality_hours_20251201.csv"]:
-        filepath = RAW_DIR / fname
-        if not filepath.exists():
+        if not raw_csv_exists(fname):
             continue
-        with open(filepath, encoding="utf-8-sig") as f:
+        with open_raw_csv(fname) as f:
             reader = csv.reader(f)
             next(reader)
             for row in reader:
@@ -307,16 +404,22 @@ def import_specialty_master(session):
     print(f"   {len(seen)}件")
 
 
-def import_business_hours_pharmacy(session):
+def _business_hour(fac_id, slot_number, hour_type, schedule, compact):
+    return BusinessHour(facility_id=fac_id, slot_number=slot_number, hour_type=hour_type,
+                        schedule=None if compact else schedule,
+                        schedule_packed=pack_schedule(schedule))
+
+
+def import_business_hours_pharmacy(session, compact=False):
     """薬局の営業時間帯を取り込み"""
-    filepath = RAW_DIR / "05_pharmacy_20251201.csv"
-    if not filepath.exists():
+    filename = "05_pharmacy_20251201.csv"
+    if not raw_csv_exists(filename):
         return 0
 
     print("🕐 薬局営業時間...")
     count = 0
 
-    with open(filepath, encoding="utf-8-sig") as f:
+    with open_raw_csv(filename) as f:
         reader = csv.reader(f)
         next(reader)
 
@@ -327,12 +430,7 @@ def import_business_hours_pharmacy(session):
                 base = 64 + slot * 16
                 schedule = parse_schedule(row, base)
                 if any(v is not None for v in schedule.values()):
-                    session.add(BusinessHour(
-                        facility_id=fac_id,
-                        slot_number=slot + 1,
-                        hour_type="business",
-                        schedule=schedule,
-                    ))
+                    session.add(_business_hour(fac_id, slot + 1, "business", schedule, compact))
                     count += 1
 
             if count % 10000 == 0 and count > 0:
@@ -342,16 +440,16 @@ def import_business_hours_pharmacy(session):
     return count
 
 
-def import_business_hours_maternity(session):
+def import_business_hours_maternity(session, compact=False):
     """助産所の就業時間・受付時間を取り込み"""
-    filepath = RAW_DIR / "04_maternity_home_20251201.csv"
-    if not filepath.exists():
+    filename = "04_maternity_home_20251201.csv"
+    if not raw_csv_exists(filename):
         return 0
 
     print("🕐 助産所営業時間...")
     count = 0
 
-    with open(filepath, encoding="utf-8-sig") as f:
+    with open_raw_csv(filename) as f:
         reader = csv.reader(f)
         next(reader)
 
@@ -362,12 +460,7 @@ def import_business_hours_maternity(session):
                 base = 57 + slot * 16
                 schedule = parse_schedule(row, base)
                 if any(v is not None for v in schedule.values()):
-                    session.add(BusinessHour(
-                        facility_id=fac_id,
-                        slot_number=slot + 1,
-                        hour_type="business",
-                        schedule=schedule,
-                    ))
+                    session.add(_business_hour(fac_id, slot + 1, "business", schedule, compact))
                     count += 1
 
             # 外来受付時間帯 3スロット (col 105-152)
@@ -375,22 +468,39 @@ def import_business_hours_maternity(session):
                 base = 105 + slot * 16
                 schedule = parse_schedule(row, base)
                 if any(v is not None for v in schedule.values()):
-                    session.add(BusinessHour(
-                        facility_id=fac_id,
-                        slot_number=slot + 1,
-                        hour_type="reception",
-                        schedule=schedule,
-                    ))
+                    session.add(_business_hour(fac_id, slot + 1, "reception", schedule, compact))
                     count += 1
 
     session.commit()
     return count
 
 
-def main():
-    print("🗄️  テーブル作成...")
+def create_tables(compact=False):
+    """テーブル作成（compact=True なら一部を WITHOUT ROWID で作る）"""
+    if compact and engine.dialect.name == "sqlite":
+        for name in COMPACT_WITHOUT_ROWID:
+            Base.metadata.tables[name].dialect_options["sqlite"]["with_rowid"] = False
     Base.metadata.create_all(engine)
 
+
+def finalize_db():
+    """ANALYZEで統計を更新し、VACUUMで空きページを詰める（SQLiteのみ）"""
+    if engine.dialect.name != "sqlite":
+        return
+    print("🧹 ANALYZE / VACUUM...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+        conn.execute(text("VACUUM"))
+        size = conn.execute(text(
+            "SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()"
+        )).scalar()
+    print(f"   ✅ {size / 1024 / 1024:.1f}MB")
+
+
+def main(compact=False):
+    print("🗄️  テーブル作成..." + ("（コンパクト）" if compact else ""))
+    create_tables(compact)
+
     session = SessionLocal()
     try:
         # マスタ
@@ -435,29 +545,51 @@ def main():
 
         # 診療科
         print("📋 病院 診療科...")
-        n = import_speciality_file(session, "01-2_hospital_speciality_hours_20251201.csv")
+        n = import_speciality_file(session, "01-2_hospital_speciality_hours_20251201.csv", compact=compact)
         print(f"   ✅ {n:,}件")
 
         print("📋 診療所 診療科...")
-        n = import_speciality_file(session, "02-2_clinic_speciality_hours_20251201.csv")
+        n = import_speciality_file(session, "02-2_clinic_speciality_hours_20251201.csv", compact=compact)
         print(f"   ✅ {n:,}件")
 
         print("📋 歯科 診療科...")
-        n = import_speciality_file(session, "03-2_dental_speciality_hours_20251201.csv")
+        n = import_speciality_file(session, "03-2_dental_speciality_hours_20251201.csv", compact=compact)
         print(f"   ✅ {n:,}件")
 
         # 営業時間
-        n = import_business_hours_pharmacy(session)
+        n = import_business_hours_pharmacy(session, compact=compact)
         print(f"   ✅ 薬局営業時間 {n:,}件")
 
-        n = import_business_hours_maternity(session)
+        n = import_business_hours_maternity(session, compact=compact)
         print(f"   ✅ 助産所営業時間 {n:,}件")
 
-        print("\n🎉 インポート完了!")
+        # 詳細レスポンスの事前レンダリング
+        print("📄 施設詳細ドキュメント...")
+        n = build_facility_documents(session, compress=compact)
+        print(f"   ✅ {n:,}件")
+
+        # フリーワード検索（API の起動時に作ると DB が書き換わり、インデックスファイルが古くなる）
+        print("🔍 FTS5インデックス構築...")
+        if create_fts_table(session):
+            n = rebuild_fts_index(session)
+            print(f"   ✅ {n:,}件")
 
     finally:
         session.close()
 
+    if compact:
+        finalize_db()
+    build_indexes(["facilities"])
+    build_tiles()
+    build_snapshots()
+    clear_coverage()   # 同じデータ公開日で再インポートした場合の古い分析結果（scripts/build_coverage.py で再生成）
+    print("\n🎉 インポート完了!")
+
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="厚労省CSVをDBにインポート")
+    parser.add_argument("--compact", action="store_true",
+                        help="省サイズ構成（診療科名のコード化・診療時間のパック表現・WITHOUT ROWID・VACUUM）")
+    args = parser.parse_args()
+    main(compact=args.compact)
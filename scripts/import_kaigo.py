@@ -8,6 +8,18 @@ import sys
 from pathlib import Path
 from datetime import datetime
 
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from api.services.documents import build_kaigo_documents
+from api.services.kaigo_search import DAY_BITS, available_days_mask
+from build_indexes import build_indexes
+from build_tiles import build_tiles
+from build_snapshots import build_snapshots
+
 RAW_DIR = Path(__file__).parent.parent / "data" / "raw" / "kaigo"
 DB_PATH = Path(__file__).parent.parent / "data" / "kaigo.db"
 
@@ -59,16 +71,16 @@ SERVICE_CATEGORIES = {
 }
 
 
-def parse_available_days(raw: str) -> str:
-    """利用可能曜日文字列→JSON"""
-    result = {d: False for d in ["mon", "tue", "wed", "thu", "fri", "sat", "sun", "holiday"]}
+def parse_available_days(raw: str) -> dict:
+    """利用可能曜日文字列→{"mon": bool, ...}"""
+    result = {d: False for d in DAY_BITS}
     if not raw:
-        return json.dumps(result, ensure_ascii=False)
+        return result
     for part in raw.split(","):
         part = part.strip()
         for key in DAY_MAP.get(part, []):
             result[key] = True
-    return json.dumps(result, ensure_ascii=False)
+    return result
 
 
 def safe_float(v):
@@ -90,6 +102,20 @@ def safe_int(v):
         return None
 
 
+# import_csv_file の行の並び（INSERT は列名を指定するので、テーブル上の列順とは無関係）
+FACILITY_COLUMNS = (
+    "id", "service_code", "service_type", "name", "name_kana", "prefecture_code", "city_code",
+    "prefecture_name", "city_name", "address", "address_detail", "latitude", "longitude", "phone", "fax",
+    "corporate_number", "corporate_name", "available_days", "available_days_mask", "available_days_note",
+    "capacity", "website_url", "shared_service", "nursing_care_standard", "welfare_standard", "note",
+    "data_date", "created_at", "updated_at",
+)
+INSERT_FACILITY = (
+    f"INSERT OR REPLACE INTO kaigo_facilities ({', '.join(FACILITY_COLUMNS)}) "
+    f"VALUES({', '.join('?' * len(FACILITY_COLUMNS))})"
+)
+
+
 def create_tables(conn):
     """テーブル作成"""
     conn.executescript("""
@@ -121,6 +147,7 @@ def create_tables(conn):
             corporate_number      TEXT,
             corporate_name        TEXT,
             available_days        TEXT,
+            available_days_mask   INTEGER,
             available_days_note   TEXT,
             capacity              INTEGER,
             website_url           TEXT,
@@ -133,12 +160,18 @@ def create_tables(conn):
             updated_at            TEXT,
             PRIMARY KEY (id, service_code)
         );
-
+    """)
+    # API が ALTER TABLE で列を足した既存DB（列は末尾）・列の無い旧DB のどちらでも、列名で INSERT する
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(kaigo_facilities)")}
+    if "available_days_mask" not in columns:
+        conn.execute("ALTER TABLE kaigo_facilities ADD COLUMN available_days_mask INTEGER")
+    conn.executescript("""
         CREATE INDEX IF NOT EXISTS idx_kaigo_service_code ON kaigo_facilities(service_code);
         CREATE INDEX IF NOT EXISTS idx_kaigo_service_type ON kaigo_facilities(service_type);
         CREATE INDEX IF NOT EXISTS idx_kaigo_pref_city ON kaigo_facilities(prefecture_code, city_code);
         CREATE INDEX IF NOT EXISTS idx_kaigo_latlng ON kaigo_facilities(latitude, longitude);
         CREATE INDEX IF NOT EXISTS idx_kaigo_corporate ON kaigo_facilities(corporate_number);
+        CREATE INDEX IF NOT EXISTS idx_kaigo_available_days ON kaigo_facilities(available_days_mask);
     """)
 
 
@@ -213,6 +246,7 @@ def import_csv_file(conn, filepath, service_code):
             # マスタにCSVの実名称を反映
             service_type = service_type_from_csv or SERVICE_CATEGORIES.get(service_code, ("不明",))[0]
 
+            days = parse_available_days(row[16].strip() if len(row) > 16 else "")
             batch.append((
                 facility_id,
                 service_code,
@@ -231,7 +265,8 @@ def import_csv_file(conn, filepath, service_code):
                 row[12].strip() or None if len(row) > 12 else None,  # fax
                 row[13].strip() or None if len(row) > 13 else None,  # corporate_number
                 row[14].strip() or None if len(row) > 14 else None,  # corporate_name
-                parse_available_days(row[16].strip() if len(row) > 16 else ""),
+                json.dumps(days, ensure_ascii=False),  # available_days
+                available_days_mask(days),
                 row[17].strip() or None if len(row) > 17 else None,  # available_days_note
                 safe_int(row[18]) if len(row) > 18 else None,  # capacity
                 row[19].strip() or None if len(row) > 19 else None,  # website_url
@@ -246,20 +281,12 @@ def import_csv_file(conn, filepath, service_code):
             count += 1
 
             if len(batch) >= BATCH_SIZE:
-                conn.executemany("""
-                    INSERT OR REPLACE INTO kaigo_facilities VALUES(
-                        ?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?
-                    )
-                """, batch)
+                conn.executemany(INSERT_FACILITY, batch)
                 conn.commit()
                 batch = []
 
     if batch:
-        conn.executemany("""
-            INSERT OR REPLACE INTO kaigo_facilities VALUES(
-                ?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?
-            )
-        """, batch)
+        conn.executemany(INSERT_FACILITY, batch)
         conn.commit()
 
     return count
@@ -295,6 +322,14 @@ def main():
     fts_count = create_fts(conn)
     print(f"   ✅ {fts_count:,}件インデックス化")
 
+    # 詳細レスポンスの事前レンダリング
+    print("\n📄 事業所詳細ドキュメント...")
+    doc_engine = create_engine(f"sqlite:///{DB_PATH}")
+    with Session(doc_engine) as db:
+        doc_count = build_kaigo_documents(db)
+    doc_engine.dispose()
+    print(f"   ✅ {doc_count:,}件")
+
     # 統計
     print("\n📊 統計:")
     for row in conn.execute("""
@@ -311,6 +346,11 @@ def main():
     print(f"   ユニーク事業所数: {unique_facilities:,}")
 
     conn.close()
+
+    print()
+    build_indexes(["kaigo"])
+    build_tiles()
+    build_snapshots()
     print("\n🎉 完了!")
 
 
@@ -12,6 +12,13 @@ from typing import Optional
 from collections import defaultdict
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.database import SessionLocal
+from api.services.documents import build_facility_documents
+from build_indexes import build_indexes
+from build_snapshots import build_snapshots
+
 DATA_DIR = Path(__file__).parent.parent / "data"
 DB_PATH = DATA_DIR / "medical.db"
 HOUJIN_DIR = DATA_DIR / "houjin"
@@ -220,6 +227,20 @@ def run():
     print(f"  合計: {gm:,}/{gt:,} ({gm/gt*100:.1f}%)")
 
     conn.close()
+    rebuild_derived()
+
+
+def rebuild_derived():
+    """法人番号を含む生成物（施設詳細ドキュメント・インデックスファイル・スナップショット）を作り直す"""
+    print("\n📄 施設詳細ドキュメント...")
+    session = SessionLocal()
+    try:
+        n = build_facility_documents(session)
+    finally:
+        session.close()
+    print(f"   ✅ {n:,}件")
+    build_indexes(["facilities"])
+    build_snapshots()
 
 
 def _type_compatible(corp_name: str, facility_type: int) -> bool:
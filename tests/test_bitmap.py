@@ -0,0 +1,95 @@
+"""ビットマップとビットマップインデックスのテスト — SQLでの絞り込み・素朴な集合演算と比較"""
+import random
+
+import pytest
+
+from api.database import SessionLocal, KaigoSessionLocal
+from api.services import search, kaigo_search, facets
+from api.services.bitmap import Bitmap
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def kaigo_db():
+    session = KaigoSessionLocal()
+    yield session
+    session.close()
+
+
+def test_bitmap_ops():
+    rng = random.Random(1)
+    for size in (10, 3000, 5000, 100000):
+        a = set(rng.sample(range(300000), size))
+        b = set(rng.sample(range(300000), rng.randint(0, size)))
+        ba, bb = Bitmap.from_values(a), Bitmap.from_values(b)
+        assert list(ba & bb) == sorted(a & b)
+        assert list(ba | bb) == sorted(a | b)
+        assert list(ba - bb) == sorted(a - b)
+        assert len(ba & bb) == len(a & b)
+        ordered = sorted(a)
+        for offset in (0, 7, 70000, size):
+            assert ba.slice(offset, 20) == ordered[offset:offset + 20]
+        assert all(v in ba for v in ordered[:50])
+        assert 300001 not in ba
+
+
+def test_union_all():
+    rng = random.Random(2)
+    for sizes in ([], [5], [3] * 2000, [10, 4000, 9000, 30]):
+        parts = [set(rng.sample(range(200000), n)) for n in sizes]
+        union = Bitmap.union_all(Bitmap.from_values(p) for p in parts)
+        expected = sorted(set().union(*parts))
+        assert list(union) == expected and len(union) == len(expected)
+
+
+FILTERS = [
+    {},
+    {"prefecture": "13"},
+    {"facility_types": [1, 2]},
+    {"specialty": "内科"},
+    {"specialty": "小児科", "prefecture": "13", "facility_types": [2]},
+    {"city": "103"},
+    {"q": "クリニック"},
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_search_matches_sql(db, monkeypatch, filters):
+    fast = search.search_facilities(db, **filters, page=2, per_page=20)
+    monkeypatch.setattr(search, "bitmap_candidates", lambda *a, **k: None)
+    slow = search.search_facilities(db, **filters, page=2, per_page=20)
+    assert fast[1] == slow[1]
+    assert [f.id for f in fast[0]] == [f.id for f in slow[0]]
+
+
+@pytest.mark.parametrize("filters", [
+    {}, {"service": "訪問系"}, {"service": "110", "prefecture": "13"}, {"available_day": "sat,sun"}, {"city": "1130"},
+])
+def test_kaigo_search_matches_sql(kaigo_db, monkeypatch, filters):
+    fast = kaigo_search.search_kaigo(kaigo_db, **filters, page=1, per_page=50)
+    monkeypatch.setattr(kaigo_search, "kaigo_bitmap_candidates", lambda *a, **k: None)
+    slow = kaigo_search.search_kaigo(kaigo_db, **filters, page=1, per_page=50)
+    assert fast[1] == slow[1]
+    assert [(f.id, f.service_code) for f in fast[0]] == [(f.id, f.service_code) for f in slow[0]]
+
+
+def test_facets_match_sql(db, monkeypatch):
+    names = ["type", "prefecture", "city", "specialty"]
+    fast = facets.facility_facets(db, names, limit=2000, prefecture="13")
+    monkeypatch.setattr(facets, "bitmap_candidates", lambda *a, **k: None)
+    slow = facets.facility_facets(db, names, limit=2000, prefecture="13")
+    assert fast == slow
+
+
+def test_kaigo_facets_match_sql(kaigo_db, monkeypatch):
+    names = ["service", "prefecture", "city", "available_day"]
+    fast = facets.kaigo_facets(kaigo_db, names, limit=2000, service="訪問系")
+    monkeypatch.setattr(facets, "kaigo_bitmap_candidates", lambda *a, **k: None)
+    slow = facets.kaigo_facets(kaigo_db, names, limit=2000, service="訪問系")
+    assert fast == slow
@@ -0,0 +1,151 @@
+"""診療カレンダー・祝日のテスト — 診療時間(JSON)と休診日を1施設ずつ判定した結果と比較"""
+import json
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.database import SessionLocal
+from api.main import app
+from api.models import Facility
+from api.services.bitmap_index import get_facility_bitmap_index
+from api.services.calendar import DAYS, SLOT_MINUTES, SLOTS_PER_DAY, day_kind, schedule_rows
+from api.services.holidays import jp_holidays, is_holiday
+from api.services.open_now import JST
+from api.services.schedule import unpack_schedule
+
+client = TestClient(app)
+
+START = datetime(2026, 11, 1, tzinfo=JST)   # 11/3 文化の日、11/11 は第2水曜
+
+
+@pytest.fixture(scope="module")
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def load_reference(db) -> dict:
+    """施設ID → (schedule(JSON)のリスト, closed_holiday, closed_weekly, closed_weeks)"""
+    schedules = {}
+    for fid, blob in schedule_rows(db):
+        schedules.setdefault(fid, []).append(unpack_schedule(blob))
+    facilities = {}
+    for fid, holiday, weekly, weeks in db.query(
+        Facility.id, Facility.closed_holiday, Facility.closed_weekly, Facility.closed_weeks,
+    ):
+        load = lambda v: (json.loads(v) if isinstance(v, str) else v) or {}
+        facilities[fid] = (schedules.get(fid, []), holiday, load(weekly), load(weeks))
+    return facilities
+
+
+@pytest.fixture(scope="module")
+def reference(db):
+    return load_reference(db)
+
+
+def _is_open(entry, when: datetime) -> bool:
+    schedules, closed_holiday, weekly, weeks = entry
+    day = when.date()
+    if is_holiday(day):
+        if closed_holiday:
+            return False
+        key = "hol"
+    else:
+        key = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")[day.weekday()]
+        if weekly.get(key) or weeks.get(f"week{(day.day - 1) // 7 + 1}", {}).get(key):
+            return False
+    hhmm = when.strftime("%H:%M")
+    return any(s.get(key) and s[key]["start"] <= hhmm <= s[key]["end"] for s in schedules)
+
+
+def test_holidays():
+    assert [d.strftime("%m/%d") for d in jp_holidays(2026)] == [
+        "01/01", "01/12", "02/11", "02/23", "03/20", "04/29", "05/03", "05/04", "05/05", "05/06",
+        "07/20", "08/11", "09/21", "09/22", "09/23", "10/12", "11/03", "11/23",
+    ]
+    assert jp_holidays(2025)[date(2025, 11, 24)] == "振替休日"
+    assert jp_holidays(2019)[date(2019, 4, 30)] == "国民の休日"
+    assert jp_holidays(2021)[date(2021, 7, 23)] == "スポーツの日"
+
+
+def test_open_at(db, reference):
+    index = get_facility_bitmap_index(db)
+    for minutes in range(0, 15 * 24 * 60, 97):
+        when = START + timedelta(minutes=minutes)
+        got = set(index.keys_at(index.calendar.open_at(when)))
+        assert got == {fid for fid, entry in reference.items() if _is_open(entry, when)}, when
+
+
+def test_slot_bitmaps(db, reference):
+    # 枠の full の施設は枠の中ずっと診療中、full にも partial にも無い施設は枠の中ずっと休み
+    index = get_facility_bitmap_index(db)
+    calendar = index.calendar
+    days = {}
+    for n in range(1, 15):
+        day = START.date() + timedelta(days=n)
+        days.setdefault(day_kind(day), day)
+    assert len(days) == len(DAYS)
+    for kind, day in days.items():
+        closed = calendar.closed_on(day)
+        for slot in range(SLOTS_PER_DAY):
+            full = calendar.full[kind * SLOTS_PER_DAY + slot]
+            touched = full | calendar.partial[kind * SLOTS_PER_DAY + slot]
+            full_ids = set(index.keys_at(full - closed))
+            touched_ids = set(index.keys_at(touched))
+            for offset in (0, SLOT_MINUTES // 2, SLOT_MINUTES - 1):
+                when = datetime.combine(day, time(0), tzinfo=JST) + timedelta(minutes=slot * SLOT_MINUTES + offset)
+                expected = {fid for fid, entry in reference.items() if _is_open(entry, when)}
+                assert full_ids <= expected <= touched_ids, when
+                assert set(index.keys_at(calendar.open_at(when))) == expected, when
+
+
+@pytest.mark.parametrize("when,minutes", [
+    (datetime(2026, 11, 2, 23, 30), 60),     # 平日から祝日へ日付をまたぐ
+    (datetime(2026, 11, 11, 8, 45), 30),     # 第2水曜
+    (datetime(2026, 11, 14, 12, 0), 0),
+    (datetime(2026, 11, 15, 17, 59), 121),
+])
+def test_open_within(db, reference, when, minutes):
+    index = get_facility_bitmap_index(db)
+    got = set(index.keys_at(index.calendar.open_within(when, minutes)))
+    times = [when.replace(tzinfo=JST) + timedelta(minutes=m) for m in range(minutes + 1)]
+    assert got == {fid for fid, entry in reference.items() if any(_is_open(entry, t) for t in times)}
+
+
+def test_next_change(db):
+    calendar = get_facility_bitmap_index(db).calendar
+    when = START + timedelta(hours=7, minutes=13)
+    for _ in range(40):
+        change = calendar.next_change(when)
+        assert change > when
+        assert calendar.open_at(when) == calendar.open_at(change - timedelta(minutes=1))
+        when = change
+
+
+def test_facilities_open_at(db):
+    when = datetime(2026, 11, 3, 10, 0, tzinfo=JST)
+    index = get_facility_bitmap_index(db)
+    expected = len(index.calendar.open_at(when) & index.any_of("prefecture", ["13"]))
+    r = client.get("/api/v1/facilities", params={"prefecture": "13", "open_at": "2026-11-03T10:00:00"})
+    assert r.status_code == 200
+    assert r.json()["pagination"]["total"] == expected
+
+    r = client.get("/api/v1/facilities/nearby", params={
+        "lat": 35.68, "lng": 139.76, "radius": 50, "open_at": "2026-11-03T10:00:00+09:00", "open_within": 30,
+    })
+    assert r.status_code == 200
+    open_ids = set(index.keys_at(index.calendar.open_within(when, 30)))
+    assert all(f["id"] in open_ids for f in r.json())
+
+
+@pytest.mark.parametrize("open_at", ["0001-01-01T10:00:00", "1979-12-31T23:59:00", "2100-01-01T00:00:00", "9999-12-31T23:59:00"])
+def test_open_at_out_of_range(open_at):
+    r = client.get("/api/v1/facilities", params={"open_at": open_at, "open_within": 60})
+    assert r.status_code == 422
+    r = client.get("/api/v1/facilities/nearby", params={"lat": 35.68, "lng": 139.76, "open_at": open_at})
+    assert r.status_code == 422
+    geometry = {"type": "Polygon", "coordinates": [[[139.6, 35.6], [139.8, 35.6], [139.7, 35.8], [139.6, 35.6]]]}
+    r = client.post("/api/v1/facilities/within", json={"geometry": geometry, "open_at": open_at})
+    assert r.status_code == 422
@@ -0,0 +1,138 @@
+"""--compact ビルドのテスト — 同じCSVから通常版とコンパクト版を作り、施設詳細の違いが文書どおり（診療時間の正規化）だけか
+（元CSVの一覧・ZIPの別名も）"""
+import csv
+import json
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from api.database import Base  # noqa: E402
+from api.models import Facility  # noqa: E402
+from api.services import documents  # noqa: E402
+from api.services.schedule import pack_schedule, unpack_schedule  # noqa: E402
+from scripts import import_data  # noqa: E402
+
+HOURS = [  # 8曜日 × (開始, 終了)
+    ["9:00", "12:00", "00:00", "24時間", "13:00", "", "", "18:00", "08:30", "17:30", "", "", "", "", "10:00", "12:00"],
+    ["09:00", "12:30", "14:00", "18:00", "", "", "09:00", "12:00", "09:00", "12:00", "09:00", "12:00", "", "", "", ""],
+]
+
+
+def _write(path: Path, rows, width: int):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([f"c{i}" for i in range(width)])
+        for row in rows:
+            writer.writerow(row + [""] * (width - len(row)))
+
+
+@pytest.fixture
+def raw_dir(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    clinics = []
+    for i in range(2):
+        row = [""] * 70
+        row[:13] = [f"02100000000{i}0", f"クリニック{i}", "", "", "", "", "", "13", "113",
+                    "東京都渋谷区神南1", "35.66", "139.70", ""]
+        clinics.append(row)
+    _write(raw / "02-1_clinic_facility_info_20251201.csv", clinics, 70)
+    specialities = [
+        [clinics[0][0], "01001", "内科", "1"] + HOURS[0] + HOURS[1],
+        [clinics[0][0], "01991", "漢方内科", "2"] + HOURS[1] + HOURS[0],
+        [clinics[1][0], "01001", "内科", "1"] + HOURS[1] + HOURS[1],
+    ]
+    _write(raw / "02-2_clinic_speciality_hours_20251201.csv", specialities, 36)
+    pharmacy = [""] * 130
+    pharmacy[:10] = ["0510000000000", "薬局", "", "", "", "13", "113", "東京都渋谷区神南2", "35.66", "139.70"]
+    pharmacy[64:80] = HOURS[0]
+    pharmacy[80:96] = HOURS[1]
+    _write(raw / "05_pharmacy_20251201.csv", [pharmacy], 130)
+
+    monkeypatch.setattr(import_data, "RAW_DIR", raw)
+    monkeypatch.setattr(documents, "_known_tables", set())
+    import_data.raw_sources.cache_clear()
+    yield raw
+    import_data.raw_sources.cache_clear()
+
+
+def _build(path: Path, compact: bool) -> dict:
+    """施設ID → 詳細レスポンス（import_data.main と同じ手順の医療施設部分）"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    try:
+        with Session(engine) as session:
+            import_data.import_prefectures(session)
+            import_data.import_cities(session)
+            import_data.import_specialty_master(session)
+            import_data.import_facility_file(session, "02-1_clinic_facility_info_20251201.csv", facility_type=2)
+            import_data.import_facility_file(session, "05_pharmacy_20251201.csv", facility_type=5)
+            import_data.import_speciality_file(session, "02-2_clinic_speciality_hours_20251201.csv", compact=compact)
+            import_data.import_business_hours_pharmacy(session, compact=compact)
+            documents.build_facility_documents(session, compress=compact)
+            return {
+                fid: json.loads(documents.get_facility_document(session, fid))
+                for (fid,) in session.query(Facility.id)
+            }
+    finally:
+        engine.dispose()
+
+
+def _normalized(schedule):
+    return unpack_schedule(pack_schedule(schedule)) if schedule is not None else None
+
+
+def test_compact_differs_only_in_schedule_normalization(raw_dir, tmp_path):
+    normal = _build(tmp_path / "normal.db", compact=False)
+    compact = _build(tmp_path / "compact.db", compact=True)
+    assert normal.keys() == compact.keys() and len(normal) == 3
+
+    # 通常版は CSV の値のまま
+    first = normal["0210000000000"]["specialities"][0]
+    assert first["schedule"]["mon"] == {"start": "9:00", "end": "12:00"}
+    assert first["schedule"]["tue"] == {"start": "00:00", "end": "24時間"}
+    assert compact["0210000000000"]["specialities"][0]["schedule"]["tue"] is None
+
+    differs = 0
+    for fid, doc in normal.items():
+        expected = json.loads(json.dumps(doc))
+        for spec in expected["specialities"]:
+            spec["schedule"] = _normalized(spec["schedule"])
+            spec["reception"] = _normalized(spec["reception"])
+        for hours in expected["business_hours"] or []:
+            hours["schedule"] = _normalized(hours["schedule"])
+        assert compact[fid] == expected, fid
+        differs += compact[fid] != doc
+    assert differs == 2
+
+
+def test_raw_zip_alias(raw_dir, monkeypatch):
+    # 単一CSVのZIPは「ZIP名.csv」でも開けるが、一覧（import_cities が全件読む）には1回だけ
+    csv_path = raw_dir / "02-1_clinic_facility_info_20251201.csv"
+    with zipfile.ZipFile(raw_dir / "clinic.zip", "w") as zf:
+        zf.write(csv_path, "inner/clinic_info.csv")
+    csv_path.unlink()
+    import_data.raw_sources.cache_clear()
+
+    sources = import_data.raw_sources()
+    assert "clinic_info.csv" in sources and "clinic.csv" not in sources
+    assert len(set(sources.values())) == len(sources)
+    assert import_data.raw_csv_exists("clinic.csv")
+    with import_data.open_raw_csv("clinic.csv") as a, import_data.open_raw_csv("clinic_info.csv") as b:
+        assert a.read() == b.read()
+
+    opened = []
+    open_raw_csv = import_data.open_raw_csv
+    monkeypatch.setattr(import_data, "open_raw_csv", lambda name: opened.append(name) or open_raw_csv(name))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        import_data.import_prefectures(session)
+        import_data.import_cities(session)
+    assert sorted(opened) == sorted(sources)
@@ -0,0 +1,83 @@
+"""カバレッジ分析のテスト — メッシュごとの値を全施設の総当たりと比較"""
+import pytest
+from fastapi.testclient import TestClient
+
+from api.database import SessionLocal
+from api.main import app
+from api.models import Facility
+from api.services import coverage
+from api.services.geo import haversine
+from api.services.search import get_specialty_names
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="module")
+def tokyo(db):
+    return coverage.compute_coverage(db, "13", workers=1)
+
+
+def test_mesh_code():
+    assert coverage.mesh_code(coverage.mesh_of(35.681236, 139.767125)) == "53394611"   # 東京駅
+    lat, lng = coverage.mesh_center(coverage.mesh_of(43.0686, 141.3508))
+    assert coverage.mesh_code(coverage.mesh_of(lat, lng)) == "64414288"                 # 札幌駅
+
+
+def test_cells_match_brute_force(db, tokyo):
+    rows = db.query(
+        Facility.id, Facility.facility_type, Facility.prefecture_code, Facility.latitude, Facility.longitude,
+    ).filter(Facility.latitude.isnot(None)).all()
+    hospitals = [(r.latitude, r.longitude) for r in rows if r.facility_type == coverage.HOSPITAL]
+    pharmacies = [(r.latitude, r.longitude) for r in rows if r.facility_type == coverage.PHARMACY]
+    assert tokyo["summary"]["cells"] == len(tokyo["cells"]) > 0
+    for cell in tokyo["cells"][::7]:
+        lat, lng = cell["lat"], cell["lng"]
+        owner = min(rows, key=lambda r: haversine(lat, lng, r.latitude, r.longitude))
+        assert owner.prefecture_code == "13"
+        assert haversine(lat, lng, owner.latitude, owner.longitude) <= coverage.TERRITORY_KM
+        # 格子の計算と総当たりで丸めが1桁ずれることがある
+        assert cell["nearest_hospital_km"] == pytest.approx(min(haversine(lat, lng, *h) for h in hospitals), abs=0.01)
+        assert cell["pharmacies_2km"] == sum(1 for p in pharmacies if haversine(lat, lng, *p) <= coverage.PHARMACY_KM)
+
+
+def test_process_pool_matches(db, tokyo, monkeypatch):
+    monkeypatch.setattr(coverage, "CHUNK_CELLS", 40)
+    assert coverage.compute_coverage(db, "13", workers=2) == tokyo
+
+
+def test_resolve_specialty(db):
+    names = get_specialty_names(db)
+    code = next(code for code, name in names.items() if name == "小児科")
+    assert coverage.resolve_specialty(db, "小児科") == coverage.resolve_specialty(db, code) == code
+    for value in ("存在しない診療科", "x" * 300, "科"):
+        with pytest.raises(ValueError):
+            coverage.resolve_specialty(db, value)
+
+
+def test_route_caches_per_release(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(coverage, "COVERAGE_DIR", tmp_path)
+    monkeypatch.setattr(coverage, "_cache", {})
+    code = coverage.resolve_specialty(db, "小児科")
+    r = client.get("/api/v1/analytics/coverage", params={"prefecture": "13", "specialty": "小児科"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["specialty"] == code and body["specialty_name"] == "小児科" and body["cells"]
+    assert coverage.coverage_path("13", code).exists()
+
+    # 保存済みのファイルから読む（メモリのキャッシュを消しても、コードで指定しても同じ結果）
+    monkeypatch.setattr(coverage, "compute_coverage", None)
+    coverage._cache.clear()
+    assert client.get("/api/v1/analytics/coverage", params={"prefecture": "13", "specialty": code}).json() == body
+
+    assert client.get("/api/v1/analytics/coverage", params={"prefecture": "99"}).status_code == 404
+    # マスタに無い診療科は計算も保存もしない
+    r = client.get("/api/v1/analytics/coverage", params={"prefecture": "13", "specialty": "x" * 300})
+    assert r.status_code == 422
+    assert sorted(p.name for p in (tmp_path / coverage.DATA_DATE).iterdir()) == [f"13_{code}.json"]
@@ -0,0 +1,46 @@
+"""SQLite 接続プロファイル（database.make_engine）のテスト"""
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from api.cache import engine_version
+from api.database import make_engine
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    path = tmp_path / "t.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (a INTEGER)")
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
+
+
+def _pragma(conn, name):
+    return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_default_profile_writes(sqlite_url):
+    engine = make_engine(sqlite_url, "default")
+    with engine.begin() as conn:
+        assert _pragma(conn, "journal_mode") == "wal"
+        assert _pragma(conn, "query_only") == 0
+        conn.execute(text("INSERT INTO t VALUES (2)"))
+
+
+@pytest.mark.parametrize("profile", ["read", "immutable"])
+def test_read_profiles(sqlite_url, profile):
+    engine = make_engine(sqlite_url, profile)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 1
+        assert _pragma(conn, "query_only") == 1
+        assert _pragma(conn, "temp_store") == 2          # MEMORY
+        assert _pragma(conn, "cache_size") < 0           # KiB 指定
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+    # immutable でも URL はファイルのパスのまま（データバージョンをファイルの stat で作れる）
+    assert engine_version(engine).split("|")[1]
@@ -0,0 +1,92 @@
+"""詳細ドキュメント（documents.py）のテスト — 圧縮の有無で同じレスポンスになるか、元テーブルの中身で作り直しを判定するか、
+診療時間はJSON列を優先するか（旧DBのパック表現の補完も）"""
+import json
+import sqlite3
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from api.database import engine, make_engine
+from api.models import FacilityDocument
+from api.services import documents
+from api.services.calendar import ensure_packed_schedules
+from api.services.schedule import pack_schedule
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = tmp_path / "medical.db"
+    with sqlite3.connect(engine.url.database) as src, sqlite3.connect(path) as dst:
+        src.backup(dst)
+    monkeypatch.setattr(documents, "_known_tables", set())
+    copy = make_engine(f"sqlite:///{path}", "default")
+    session = Session(copy)
+    yield session
+    session.close()
+    copy.dispose()
+
+
+def _bodies(db):
+    return dict(db.query(FacilityDocument.id, FacilityDocument.body))
+
+
+def test_compressed_documents(db):
+    count = documents.build_facility_documents(db, compress=False)
+    plain = _bodies(db)
+    assert count == len(plain) > 0 and not documents.facility_documents_stale(db)
+
+    assert documents.build_facility_documents(db, compress=True) == count
+    packed = _bodies(db)
+    assert sum(map(len, packed.values())) * 2 < sum(map(len, plain.values()))
+    for fid in list(plain)[::50]:
+        assert documents.get_facility_document(db, fid) == plain[fid]
+        json.loads(plain[fid])
+
+    # 件数が同じでも中身が変われば古い（scripts/match_corporate.py の法人番号の付与）。作り直しは前回と同じく圧縮する
+    fid = min(plain)
+    db.connection().exec_driver_sql("UPDATE facilities SET corporate_number = '1234567890123' WHERE id = ?", (fid,))
+    db.commit()
+    assert documents.facility_documents_stale(db)
+    documents.build_facility_documents(db)
+    assert not documents.facility_documents_stale(db)
+    assert json.loads(documents.get_facility_document(db, fid))["corporate_number"] == "1234567890123"
+    assert documents.get_facility_document(db, fid) != plain[fid] and db.get(FacilityDocument, fid).body[:1] == b"x"
+
+    # 施設数が変わっても古い
+    for table in ("specialities", "business_hours", "hospital_beds"):
+        db.connection().exec_driver_sql(f"DELETE FROM {table} WHERE facility_id = ?", (fid,))
+    db.connection().exec_driver_sql("DELETE FROM facilities WHERE id = ?", (fid,))
+    db.commit()
+    assert documents.facility_documents_stale(db)
+    assert documents.build_facility_documents(db) == db.query(func.count(FacilityDocument.id)).scalar() == count - 1
+
+
+def test_detail_keeps_json_schedule(db):
+    # JSON列があれば元の値を返す（パック表現だと "9:00" → "09:00"、"24時間" → null になる）
+    raw = {"mon": {"start": "9:00", "end": "24時間"}, "tue": {"start": "08:30", "end": "12:00"}, "wed": None}
+    spec_id, fid = db.connection().exec_driver_sql("SELECT id, facility_id FROM specialities LIMIT 1").one()
+    db.connection().exec_driver_sql(
+        "UPDATE specialities SET schedule = ?, schedule_packed = ? WHERE id = ?",
+        (json.dumps(json.dumps(raw, ensure_ascii=False)), pack_schedule(raw), spec_id),
+    )
+    db.commit()
+    documents.build_facility_documents(db)
+    detail = json.loads(documents.get_facility_document(db, fid))
+    assert raw in [s["schedule"] for s in detail["specialities"]]
+
+
+def test_pack_schedules_backfill(db):
+    # パック表現の無い旧DB: 列を足して JSON から埋める
+    before = dict(db.connection().exec_driver_sql("SELECT id, schedule_packed FROM specialities").fetchall())
+    db.connection().exec_driver_sql("UPDATE specialities SET schedule_packed = NULL, reception_packed = NULL")
+    db.connection().exec_driver_sql("ALTER TABLE business_hours DROP COLUMN schedule_packed")
+    db.commit()
+    filled = ensure_packed_schedules(db)
+    assert filled >= len(before)
+    after = dict(db.connection().exec_driver_sql("SELECT id, schedule_packed FROM specialities").fetchall())
+    assert after == before
+    assert db.connection().exec_driver_sql(
+        "SELECT count(*) FROM business_hours WHERE schedule_packed IS NULL AND schedule IS NOT NULL"
+    ).scalar() == 0
+    assert ensure_packed_schedules(db) == 0
@@ -0,0 +1,138 @@
+"""共通ダウンローダのテスト — ローカルHTTPサーバーを相手に検証"""
+import hashlib
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from scripts.fetcher import fetch_many, download, MANIFEST_NAME
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    """Range / ETag / If-None-Match / If-Range に対応した最小限のサーバー"""
+    files = {}
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        name = self.path.lstrip("/")
+        self.requests_seen.append((name, dict(self.headers)))
+        body = self.files.get(name)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (if_range is None or if_range == etag):
+            start = int(range_header.split("=")[1].split("-")[0])
+            if start >= len(body):
+                self.send_response(416)
+                self.end_headers()
+                return
+            chunk = body[start:]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            chunk = body
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Mon, 01 Dec 2025 00:00:00 GMT")
+        self.send_header("Content-Length", str(len(chunk)))
+        self.end_headers()
+        self.wfile.write(chunk)
+
+
+@pytest.fixture()
+def server():
+    _StandIn.files = {
+        "a.zip": b"A" * 300_000,
+        "b.csv": "事業所,住所\n".encode("utf-8") * 1000,
+        "c.csv": b"c" * 10,
+    }
+    _StandIn.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def _jobs(base, names):
+    return [(f"{base}/{n}", n) for n in names]
+
+
+def test_downloads_and_writes_manifest(server, tmp_path):
+    results = fetch_many(_jobs(server, ["a.zip", "b.csv", "c.csv"]), tmp_path, max_workers=3, verbose=False)
+    assert sorted(r["status"] for r in results) == ["downloaded"] * 3
+
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text(encoding="utf-8"))
+    for name, body in _StandIn.files.items():
+        assert (tmp_path / name).read_bytes() == body
+        assert manifest[name]["sha256"] == hashlib.sha256(body).hexdigest()
+        assert manifest[name]["etag"]
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_conditional_get_skips_unchanged(server, tmp_path):
+    fetch_many(_jobs(server, ["a.zip"]), tmp_path, verbose=False)
+    results = fetch_many(_jobs(server, ["a.zip"]), tmp_path, verbose=False)
+    assert results[0]["status"] == "not_modified"
+    assert "If-None-Match" in _StandIn.requests_seen[-1][1]
+
+
+def test_changed_remote_is_refetched(server, tmp_path):
+    fetch_many(_jobs(server, ["c.csv"]), tmp_path, verbose=False)
+    _StandIn.files["c.csv"] = b"changed"
+    results = fetch_many(_jobs(server, ["c.csv"]), tmp_path, verbose=False)
+    assert results[0]["status"] == "downloaded"
+    assert (tmp_path / "c.csv").read_bytes() == b"changed"
+
+
+def test_corrupted_local_file_is_refetched_without_condition(server, tmp_path):
+    fetch_many(_jobs(server, ["b.csv"]), tmp_path, verbose=False)
+    (tmp_path / "b.csv").write_bytes(b"broken")
+    results = fetch_many(_jobs(server, ["b.csv"]), tmp_path, verbose=False)
+    assert results[0]["status"] == "downloaded"
+    assert "If-None-Match" not in _StandIn.requests_seen[-1][1]
+    assert (tmp_path / "b.csv").read_bytes() == _StandIn.files["b.csv"]
+
+
+def test_resumes_partial_download(server, tmp_path):
+    body = _StandIn.files["a.zip"]
+    (tmp_path / "a.zip.part").write_bytes(body[:100_000])
+    etag = '"%s"' % hashlib.md5(body).hexdigest()
+    result = download(f"{server}/a.zip", tmp_path / "a.zip", {"part_validator": etag})
+    assert result["status"] == "resumed"
+    assert _StandIn.requests_seen[-1][1]["Range"] == "bytes=100000-"
+    assert _StandIn.requests_seen[-1][1]["If-Range"] == etag
+    assert (tmp_path / "a.zip").read_bytes() == body
+    assert result["entry"]["sha256"] == hashlib.sha256(body).hexdigest()
+    assert "part_validator" not in result["entry"]
+
+
+def test_partial_without_validator_restarts(server, tmp_path):
+    # .part の版が記録されていなければ Range を送らず最初から
+    body = _StandIn.files["a.zip"]
+    (tmp_path / "a.zip.part").write_bytes(b"X" * 100_000)
+    result = download(f"{server}/a.zip", tmp_path / "a.zip")
+    assert result["status"] == "downloaded"
+    assert "Range" not in _StandIn.requests_seen[-1][1]
+    assert (tmp_path / "a.zip").read_bytes() == body
+
+
+def test_missing_file_is_reported(server, tmp_path):
+    results = fetch_many(_jobs(server, ["nope.csv"]), tmp_path, verbose=False)
+    assert results[0]["status"] == "missing"
+    assert not (tmp_path / "nope.csv").exists()
@@ -0,0 +1,55 @@
+"""介護CSVインポートのテスト — 既存DBの列順に関係なく正しい列に入るか"""
+import csv
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from scripts import import_kaigo  # noqa: E402
+
+OLD_SCHEMA = """
+    CREATE TABLE kaigo_facilities (
+        id TEXT NOT NULL, service_code TEXT NOT NULL, service_type TEXT NOT NULL, name TEXT NOT NULL,
+        name_kana TEXT, prefecture_code TEXT NOT NULL, city_code TEXT NOT NULL, prefecture_name TEXT,
+        city_name TEXT, address TEXT, address_detail TEXT, latitude REAL, longitude REAL, phone TEXT, fax TEXT,
+        corporate_number TEXT, corporate_name TEXT, available_days TEXT, available_days_note TEXT,
+        capacity INTEGER, website_url TEXT, shared_service TEXT, nursing_care_standard TEXT,
+        welfare_standard TEXT, note TEXT, data_date TEXT, created_at TEXT, updated_at TEXT,
+        PRIMARY KEY (id, service_code)
+    )
+"""
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    row = [""] * 24
+    row[0], row[2], row[3], row[4] = "131130", "東京都", "渋谷区", "ケアセンター渋谷"
+    row[6], row[9], row[10], row[15] = "訪問介護", "35.658", "139.702", "1311000001"
+    row[16], row[18], row[19] = "平日,土曜日", "25", "https://example.com/"
+    path = tmp_path / "jigyosho_110.csv"
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        csv.writer(f).writerows([[f"h{i}" for i in range(24)], row])
+    return path
+
+
+@pytest.mark.parametrize("migrated", [False, True])
+def test_import_into_existing_schema(tmp_path, csv_path, migrated):
+    conn = sqlite3.connect(tmp_path / "kaigo.db")
+    conn.execute(OLD_SCHEMA)
+    if migrated:
+        # API の起動時の移行（ensure_available_days_mask）と同じく末尾に追加された列
+        conn.execute("ALTER TABLE kaigo_facilities ADD COLUMN available_days_mask INTEGER")
+    import_kaigo.create_tables(conn)
+    assert import_kaigo.import_csv_file(conn, csv_path, "110") == 1
+
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM kaigo_facilities").fetchone()
+    assert row["id"] == "1311000001" and row["name"] == "ケアセンター渋谷"
+    assert row["available_days_mask"] == import_kaigo.available_days_mask(
+        import_kaigo.parse_available_days("平日,土曜日")
+    )
+    assert row["capacity"] == 25 and row["website_url"] == "https://example.com/"
+    conn.close()
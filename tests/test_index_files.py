@@ -0,0 +1,107 @@
+"""インデックスファイル（index_files.py）のテスト — 書き出して mmap で読んだものが SQLite から作ったものと一致するか"""
+import random
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import Session
+
+from api.cache import source_version
+from api.database import SessionLocal, KaigoSessionLocal, kaigo_engine, make_engine
+from api.services import bitmap_index
+from api.services.bitmap import Bitmap
+from api.services.calendar import JST
+
+
+@pytest.fixture(scope="module")
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def test_bitmap_bytes_round_trip():
+    rnd = random.Random(0)
+    sparse = Bitmap.from_values(rnd.sample(range(300000), 3000))
+    dense = Bitmap.from_sorted(range(50000, 140000, 3))
+    for bm in (Bitmap(), sparse, dense, sparse | dense):
+        loaded = Bitmap.from_buffer(memoryview(bm.to_bytes()))
+        assert loaded == bm and len(loaded) == len(bm)
+        assert loaded & dense == bm & dense and loaded - sparse == bm - sparse
+        assert loaded.slice(100, 50) == bm.slice(100, 50)
+
+
+def test_facility_index_round_trip(db, tmp_path):
+    built = bitmap_index.build_facility_index(db)
+    bitmap_index.save_index(built, tmp_path / "facilities.idx", "v1")
+    assert bitmap_index.load_index(tmp_path / "facilities.idx", "v2") is None
+    mapped = bitmap_index.load_index(tmp_path / "facilities.idx", "v1")
+
+    assert list(mapped.keys) == list(built.keys)
+    assert mapped.of_keys(built.keys[::5] + ["missing"]) == built.of_keys(built.keys[::5])
+    for name, postings in built.fields.items():
+        assert dict(mapped.fields[name]) == postings
+    assert mapped.points.nearest(35.68, 139.76, mapped.all, 20) == built.points.nearest(35.68, 139.76, built.all, 20)
+    for hour in range(0, 24, 2):
+        when = datetime(2025, 12, 1 + hour % 7, hour, 40, tzinfo=JST)
+        assert mapped.calendar.open_at(when) == built.calendar.open_at(when)
+        assert mapped.calendar.open_within(when, 120) == built.calendar.open_within(when, 120)
+        assert mapped.calendar.next_change(when) == built.calendar.next_change(when)
+
+
+def test_cached_index_maps_current_file(db, tmp_path, monkeypatch):
+    kaigo_db = KaigoSessionLocal()
+    try:
+        monkeypatch.setattr(bitmap_index, "INDEX_DIR", tmp_path)
+        monkeypatch.setattr(bitmap_index, "_indexes", {})
+        built = bitmap_index.write_index_file("kaigo", kaigo_db)
+        index = bitmap_index.get_kaigo_bitmap_index(kaigo_db)
+        assert index is not built and isinstance(index.keys, bitmap_index.KeyTable)
+        assert list(index.keys) == built.keys and index.labels == built.labels
+        assert index.counts("service", index.all) == built.counts("service", built.all)
+
+        # 元DBの版が違うファイルは使わず SQLite から作る
+        bitmap_index.save_index(built, bitmap_index.index_path("facilities"), "old|" + source_version(db.get_bind()))
+        assert isinstance(bitmap_index.get_facility_bitmap_index(db).keys, list)
+    finally:
+        kaigo_db.close()
+
+
+FRESH_VERSION = """
+import sys
+from api.cache import source_version
+from api.database import make_engine
+engine = make_engine(sys.argv[1], "default")
+with engine.connect() as conn:
+    conn.exec_driver_sql("SELECT count(*) FROM kaigo_facilities").one()
+engine.dispose()
+print(source_version(engine))
+"""
+
+
+def test_index_file_version_in_fresh_process(tmp_path, monkeypatch):
+    # インポートの終わりと同じ状態: WAL にフレームがあり、渡すセッションの接続は読み取りトランザクション中
+    path = tmp_path / "kaigo.db"
+    with sqlite3.connect(kaigo_engine.url.database) as src, sqlite3.connect(path) as dst:
+        src.backup(dst)
+    url = f"sqlite:///{path}"
+    engine = make_engine(url, "default")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE kaigo_facilities SET capacity = coalesce(capacity, 0) + 1")
+    db = Session(engine)
+    db.connection().exec_driver_sql("BEGIN")
+    db.connection().exec_driver_sql("SELECT count(*) FROM kaigo_facilities").one()
+
+    monkeypatch.setattr(bitmap_index, "INDEX_DIR", tmp_path)
+    bitmap_index.write_index_file("kaigo", db)
+    engine.dispose()   # プロセスの終了と同じく最後の接続を閉じる（残った WAL はここで書き戻される）
+
+    root = Path(__file__).parent.parent
+    fresh = subprocess.run(
+        [sys.executable, "-c", FRESH_VERSION, url], cwd=root, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    index_file = bitmap_index.load_index(tmp_path / "kaigo.idx", fresh)
+    assert index_file is not None, fresh
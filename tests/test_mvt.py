@@ -0,0 +1,116 @@
+"""MVTエンコーダとタイルエンドポイントのテスト"""
+import gzip
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.services import tiles
+from api.services.mvt import LayerBuilder, encode_tile
+
+client = TestClient(app)
+
+
+# --- 最小限のprotobufデコーダ（検証用） ---
+
+def _varint(buf, i):
+    result = shift = 0
+    while True:
+        b = buf[i]
+        i += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, i
+        shift += 7
+
+
+def _fields(buf):
+    i = 0
+    while i < len(buf):
+        key, i = _varint(buf, i)
+        if key & 7 == 0:
+            value, i = _varint(buf, i)
+        else:
+            n, i = _varint(buf, i)
+            value, i = buf[i:i + n], i + n
+        yield key >> 3, value
+
+
+def _packed(buf):
+    i, out = 0, []
+    while i < len(buf):
+        v, i = _varint(buf, i)
+        out.append(v)
+    return out
+
+
+def _unzigzag(v):
+    return (v >> 1) ^ -(v & 1)
+
+
+def decode(tile: bytes) -> dict:
+    layers = {}
+    for field, layer_buf in _fields(tile):
+        assert field == 3
+        name, keys, values, features, extent = None, [], [], [], None
+        for f, v in _fields(layer_buf):
+            if f == 1:
+                name = v.decode()
+            elif f == 3:
+                keys.append(v.decode())
+            elif f == 4:
+                ((vf, vv),) = list(_fields(v))
+                values.append(vv.decode() if vf == 1 else _unzigzag(vv))
+            elif f == 5:
+                extent = v
+            elif f == 2:
+                features.append(dict(_fields(v)))
+        decoded = []
+        for feat in features:
+            tags = _packed(feat.get(2, b""))
+            cmd, x, y = _packed(feat[4])
+            assert feat[3] == 1 and cmd == 9
+            props = {keys[tags[i]]: values[tags[i + 1]] for i in range(0, len(tags), 2)}
+            decoded.append(((_unzigzag(x), _unzigzag(y)), props))
+        layers[name] = {"extent": extent, "features": decoded}
+    return layers
+
+
+def test_encode_roundtrip():
+    layer = LayerBuilder("facilities")
+    layer.add_point(10, 4095, {"type": 2, "id": "1310000000001", "name": "渋谷クリニック"})
+    layer.add_point(0, 0, {"type": -1, "id": "1310000000002", "name": None})
+    kaigo = LayerBuilder("kaigo")
+    empty = LayerBuilder("empty")
+    kaigo.add_point(2048, 2048, {"type": "110", "id": "1311000001", "name": "ケアセンター"})
+
+    layers = decode(encode_tile([layer, kaigo, empty]))
+    assert set(layers) == {"facilities", "kaigo"}
+    assert layers["facilities"]["extent"] == 4096
+    assert layers["facilities"]["features"] == [
+        ((10, 4095), {"type": 2, "id": "1310000000001", "name": "渋谷クリニック"}),
+        ((0, 0), {"type": -1, "id": "1310000000002"}),
+    ]
+    assert layers["kaigo"]["features"] == [((2048, 2048), {"type": "110", "id": "1311000001", "name": "ケアセンター"})]
+
+
+def test_tile_endpoint(tmp_path, monkeypatch):
+    path = tmp_path / "tiles.mbtiles"
+    monkeypatch.setattr(tiles, "TILES_PATH", path)
+    assert client.get("/tiles/10/909/403.mvt").status_code == 404
+
+    points = [(35.658, 139.702, {"type": 1, "id": "A", "name": "渋谷"}), (35.681, 139.767, {"type": 5, "id": "B", "name": "東京"})]
+    tiles.build_mbtiles([("facilities", points)], path, 6, 10)
+
+    # z10 で渋谷・東京駅を含むタイル
+    r = client.get("/tiles/10/909/403.mvt")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+    features = decode(r.content)["facilities"]["features"]
+    assert {p["id"] for _, p in features} == {"A", "B"}
+
+    # 生成済みバイト列（gzip）がそのまま返ること
+    assert gzip.compress(r.content, mtime=0) == tiles.get_tile(10, 909, 403)
+
+    assert client.get("/tiles/10/0/0.mvt").status_code == 204
+    assert client.get("/tiles/12/3638/1613.mvt").status_code == 204
+    assert client.get("/tiles/2/4/0.mvt").status_code == 404
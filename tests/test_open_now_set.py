@@ -0,0 +1,53 @@
+"""診療中の施設IDの集合のテスト — 診療カレンダーで直接判定した結果と比較"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.database import SessionLocal
+from api.main import app
+from api.models import Facility
+from api.services import search
+from api.services.open_now import JST
+from api.services.open_now_set import get_open_now_set
+from test_calendar import _is_open, load_reference
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def test_matches_calendar(db):
+    # 診療時間(JSON)と休診日から1施設ずつ判定した結果と比べる（インデックスの open_at は使わない）
+    reference = load_reference(db)
+    start = datetime(2026, 11, 2, tzinfo=JST)   # 月曜（翌日は祝日）
+    pharmacies = {fid for (fid,) in db.query(Facility.id).filter(Facility.facility_type == 5)}
+    for minutes in range(0, 7 * 24 * 60, 131):
+        now = start + timedelta(minutes=minutes)
+        current = get_open_now_set(db, now)
+        assert current.ids == {fid for fid, entry in reference.items() if _is_open(entry, now)}, now
+        # 有効期限の直前まで集合は変わらない
+        assert current.computed_at <= now < current.valid_until
+        last = current.valid_until - timedelta(minutes=1)
+        assert {fid for fid, entry in reference.items() if _is_open(entry, last)} == current.ids, last
+    # 営業時間（business_hours）だけを持つ薬局も判定対象
+    weekday_noon = start + timedelta(hours=12)
+    assert get_open_now_set(db, weekday_noon).ids & pharmacies
+
+
+def test_nearby_open_now(db):
+    lat, lng = 35.68, 139.76
+    everything = search.search_nearby(db, lat=lat, lng=lng, radius_km=50, limit=100000)
+    open_ids = get_open_now_set(db).ids
+    got = search.search_nearby(db, lat=lat, lng=lng, radius_km=50, open_now=True, limit=100000)
+    assert [f.id for f, _ in got] == [f.id for f, _ in everything if f.id in open_ids]
+
+
+def test_health_reports_staleness(db):
+    get_open_now_set(db)
+    data = TestClient(app).get("/api/v1/health").json()
+    assert data["open_now"]["stale_seconds"] == 0
+    assert data["open_now"]["open_facilities"] >= 0
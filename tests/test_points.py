@@ -0,0 +1,132 @@
+"""位置での絞り込み・距離順（points.py）のテスト — SQLの候補を総当たりで距離順にした結果と比較"""
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.database import SessionLocal, KaigoSessionLocal
+from api.main import app
+from api.models import Facility
+from api.kaigo_models import KaigoFacility
+from api.services import points, search, kaigo_search
+from api.services.bitmap import Bitmap
+from api.services.geo import haversine
+from api.services.points import PointGrid
+
+client = TestClient(app)
+
+SHIBUYA = (35.658, 139.702)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def kaigo_db():
+    session = KaigoSessionLocal()
+    yield session
+    session.close()
+
+
+def _brute(coords, lat, lng, candidates, radius_km=None):
+    hits = [
+        (haversine(lat, lng, *coords[i]), i) for i in candidates
+        if coords[i][0] is not None and coords[i][1] is not None
+    ]
+    return sorted(h for h in hits if radius_km is None or h[0] <= radius_km)
+
+
+@pytest.mark.parametrize("direct_max", [5000, 0])
+def test_grid_matches_brute_force(monkeypatch, direct_max):
+    monkeypatch.setattr(points, "DIRECT_MAX", direct_max)
+    rnd = random.Random(0)
+    coords = [
+        (None, None) if rnd.random() < 0.05 else (33 + rnd.random() * 4, 132 + rnd.random() * 8)
+        for _ in range(8000)
+    ]
+    grid = PointGrid(coords)
+    for _ in range(20):
+        lat, lng = 32 + rnd.random() * 6, 131 + rnd.random() * 10
+        candidates = Bitmap.from_values(rnd.sample(range(len(coords)), rnd.choice([50, 3000, 8000])))
+        expected = _brute(coords, lat, lng, candidates)
+        assert grid.nearest(lat, lng, candidates, 15) == expected[:15]
+        assert list(grid.within(lat, lng, 40.0, candidates)) == sorted(i for _, i in _brute(
+            coords, lat, lng, candidates, 40.0,
+        ))
+
+
+@pytest.mark.parametrize("conditions", [
+    {"q": "クリニック"},
+    {"specialty": "内科", "prefecture": "13"},
+    {"facility_types": [5]},
+])
+@pytest.mark.parametrize("direct_max", [5000, 0])
+def test_search_near_matches_sql(db, monkeypatch, conditions, direct_max):
+    monkeypatch.setattr(points, "DIRECT_MAX", direct_max)
+    lat, lng = SHIBUYA
+    query = search.filter_facilities(db, db.query(Facility.id, Facility.latitude, Facility.longitude), **conditions)
+    expected = sorted(
+        (haversine(lat, lng, la, ln), fid) for fid, la, ln in query if la is not None and ln is not None
+    )
+    results, total = search.search_facilities_near(db, lat, lng, page=3, per_page=20, **conditions)
+    assert total == len(expected)
+    assert [f.id for f, _ in results] == [fid for _, fid in expected[40:60]]
+
+    results, total = search.search_facilities_near(db, lat, lng, radius_km=2.0, per_page=100, **conditions)
+    within = [fid for dist, fid in expected if dist <= 2.0]
+    assert total == len(within)
+    assert [f.id for f, _ in results] == within[:100]
+
+
+def test_kaigo_search_near_matches_sql(kaigo_db):
+    lat, lng = SHIBUYA
+    query = kaigo_search.filter_kaigo(
+        kaigo_db,
+        kaigo_db.query(KaigoFacility.id, KaigoFacility.service_code, KaigoFacility.latitude, KaigoFacility.longitude),
+        service="訪問系",
+    )
+    expected = sorted(
+        (haversine(lat, lng, la, ln), (kid, code)) for kid, code, la, ln in query if la is not None and ln is not None
+    )
+    results, total = kaigo_search.search_kaigo_near(kaigo_db, lat, lng, radius_km=3.0, per_page=50, service="訪問系")
+    within = [key for dist, key in expected if dist <= 3.0]
+    assert total == len(within)
+    assert [(f.id, f.service_code) for f, _ in results] == within[:50]
+
+
+def test_nearest_far_from_data():
+    rnd = random.Random(2)
+    coords = [(33 + rnd.random() * 4, 132 + rnd.random() * 8) for _ in range(8000)]
+    grid = PointGrid(coords)
+    candidates = Bitmap.from_sorted(range(0, 8000, 2))
+    # データの範囲外・高緯度からでもリングはデータのあるセルの範囲に切り詰める
+    for lat, lng in [(89.0, 139.0), (-89.0, -179.0), (45.9, 153.9)]:
+        assert grid.nearest(lat, lng, candidates, 5) == _brute(coords, lat, lng, candidates)[:5]
+
+
+def test_routes_near():
+    lat, lng = SHIBUYA
+    r = client.get("/api/v1/facilities", params={
+        "q": "クリニック", "lat": lat, "lng": lng, "radius": 1, "facets": "type", "per_page": 50,
+    })
+    assert r.status_code == 200
+    body = r.json()
+    distances = [row["distance_km"] for row in body["data"]]
+    assert distances == sorted(distances) and all(d <= 1 for d in distances)
+    assert sum(f["count"] for f in body["facets"]["type"]) == body["pagination"]["total"]
+
+    r = client.get("/api/v1/kaigo", params={"lat": lat, "lng": lng, "radius": 1, "facets": "service"})
+    assert r.status_code == 200
+    body = r.json()
+    distances = [row["distance_km"] for row in body["data"]]
+    assert distances == sorted(distances)
+    assert sum(f["count"] for f in body["facets"]["service"]) == body["pagination"]["total"]
+
+    assert client.get("/api/v1/facilities", params={"lat": lat}).status_code == 400
+    assert client.get("/api/v1/facilities", params={"lat": 89, "lng": lng}).status_code == 422
+    assert client.get("/api/v1/kaigo", params={"lat": lat, "lng": -179}).status_code == 422
+    assert client.get("/api/v1/kaigo", params={"radius": 1}).status_code == 400
@@ -0,0 +1,73 @@
+"""診療時間パック表現のテスト（DB不要）"""
+import json
+from datetime import datetime
+
+from api.schemas import SpecialtyOut
+from api.services.open_now import JST, is_open_now, is_open_now_packed
+from api.services.schedule import PACKED, load_schedule, pack_schedule, unpack_schedule, day_slots
+
+SCHEDULE = {
+    "mon": {"start": "09:00", "end": "12:30"},
+    "tue": {"start": "14:00", "end": "18:00"},
+    "wed": None, "thu": None, "fri": {"start": "08:30", "end": "17:00"},
+    "sat": None, "sun": None, "hol": {"start": "10:00", "end": "12:00"},
+}
+
+
+def test_round_trip():
+    blob = pack_schedule(SCHEDULE)
+    assert len(blob) == PACKED.size == 32
+    assert unpack_schedule(blob) == SCHEDULE
+
+
+def test_unparseable_time_is_empty_day():
+    blob = pack_schedule({"mon": {"start": "午前", "end": "12:00"}})
+    assert unpack_schedule(blob)["mon"] is None
+
+
+def test_packing_normalizes_times():
+    # パック表現は元の文字列を持たない: 時・分は2桁に揃い、読めない時刻・片方だけの曜日は None
+    unpacked = unpack_schedule(pack_schedule({
+        "mon": {"start": "9:00", "end": "17:30"},
+        "tue": {"start": "24時間", "end": ""},
+        "wed": {"start": "09:00", "end": None},
+        "thu": {"start": " 8:05 ", "end": "24:00"},
+    }))
+    assert unpacked["mon"] == {"start": "09:00", "end": "17:30"}
+    assert unpacked["tue"] is None and unpacked["wed"] is None
+    assert unpacked["thu"] == {"start": "08:05", "end": "24:00"}
+
+
+def test_load_schedule_prefers_json():
+    raw = {"mon": {"start": "9:00", "end": "24時間"}, "tue": None}
+    packed = pack_schedule(raw)
+    assert load_schedule(json.dumps(raw, ensure_ascii=False), packed) == raw
+    assert load_schedule(raw, packed) == raw
+    # JSONを持たない --compact のDBだけパック表現から
+    assert load_schedule(None, packed)["mon"] is None
+    assert load_schedule(None, None) is None
+
+
+def test_packed_smaller_than_json():
+    text = json.dumps(SCHEDULE, ensure_ascii=False).encode()
+    assert len(pack_schedule(SCHEDULE)) * 4 < len(text)
+
+
+def test_day_slots_strided():
+    blobs = [pack_schedule(SCHEDULE), pack_schedule({"mon": {"start": "07:00", "end": "08:00"}})]
+    starts, ends = day_slots(blobs, 0)
+    assert list(starts) == [540, 420]
+    assert list(ends) == [750, 480]
+
+
+def test_open_now_packed_matches_json():
+    blobs = [pack_schedule(SCHEDULE)]
+    for day, hhmm in [(15, "10:00"), (15, "12:31"), (16, "14:00"), (17, "10:00"), (19, "17:00")]:
+        now = datetime(2025, 12, day, int(hhmm[:2]), int(hhmm[3:]), tzinfo=JST)
+        assert is_open_now_packed(blobs, now) == is_open_now([SCHEDULE], now)
+
+
+def test_specialty_out_accepts_packed():
+    out = SpecialtyOut(specialty_name="内科", schedule=pack_schedule(SCHEDULE), reception=None)
+    assert out.schedule == SCHEDULE
+    assert out.reception is None
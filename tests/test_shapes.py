@@ -0,0 +1,157 @@
+"""多角形・経路沿いの検索のテスト — 全点を1件ずつ判定した結果と比較"""
+import math
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.database import SessionLocal, KaigoSessionLocal
+from api.main import app
+from api.models import Facility
+from api.kaigo_models import KaigoFacility
+from api.services import search, kaigo_search
+from api.services.bitmap import Bitmap
+from api.services.points import PointGrid
+from api.services.shapes import parse_lines, parse_polygons, segment_distance
+
+client = TestClient(app)
+
+# 東京23区付近の星形（凹多角形）＋穴
+STAR = {
+    "type": "Polygon",
+    "coordinates": [
+        [
+            [139.70 + 0.12 * (1 if k % 2 == 0 else 0.45) * math.cos(k * math.pi / 6),
+             35.68 + 0.10 * (1 if k % 2 == 0 else 0.45) * math.sin(k * math.pi / 6)]
+            for k in range(12)
+        ],
+        [[139.69, 35.67], [139.71, 35.67], [139.71, 35.69], [139.69, 35.69], [139.69, 35.67]],
+    ],
+}
+ROUTE = {"type": "LineString", "coordinates": [[139.60, 35.60], [139.70, 35.66], [139.77, 35.68], [139.80, 35.75]]}
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def _reference_contains(rings, lat, lng):
+    inside = False
+    for ring in rings:
+        for (lng1, lat1), (lng2, lat2) in zip(ring, ring[1:] + ring[:1]):
+            if (lat1 > lat) != (lat2 > lat) and lng < lng1 + (lat - lat1) * (lng2 - lng1) / (lat2 - lat1):
+                inside = not inside
+    return inside
+
+
+def _line_distance(lines, lat, lng):
+    return min(segment_distance(lat, lng, a, b) for line in lines for a, b in zip(line, line[1:]))
+
+
+def test_grid_shapes_match_brute_force():
+    rnd = random.Random(0)
+    coords = [(35.5 + rnd.random() * 0.4, 139.5 + rnd.random() * 0.5) for _ in range(20000)]
+    grid = PointGrid(coords)
+    candidates = Bitmap.from_values(rnd.sample(range(len(coords)), 15000))
+
+    (polygon,) = parse_polygons(STAR)
+    expected = [i for i in candidates if _reference_contains(STAR["coordinates"], *coords[i])]
+    assert expected and list(grid.in_polygon(polygon, candidates)) == expected
+
+    lines = parse_lines(ROUTE)
+    found = grid.near_lines(lines, 1.5, candidates)
+    distances = {i: _line_distance(lines, *coords[i]) for i in candidates}
+    expected = {i: d for i, d in distances.items() if d <= 1.5}
+    assert sorted(found) == sorted(expected)
+    assert all(math.isclose(found[i], expected[i]) for i in found)
+
+
+def test_near_lines_wide_buffer():
+    rnd = random.Random(1)
+    coords = [(33 + rnd.random() * 10, 130 + rnd.random() * 12) for _ in range(20000)]
+    grid = PointGrid(coords)
+    candidates = Bitmap.from_sorted(range(0, len(coords), 3))
+    lines = parse_lines({"type": "MultiLineString", "coordinates": [
+        [[139.7, 35.6], [141.3, 43.0], [130.4, 33.6]], [[135.5, 34.7], [135.6, 34.8]],
+    ]})
+    found = grid.near_lines(lines, 50.0, candidates)
+    expected = {i for i in candidates if _line_distance(lines, *coords[i]) <= 50.0}
+    assert set(found) == expected
+    assert all(math.isclose(found[i], _line_distance(lines, *coords[i])) for i in found)
+
+
+def test_parse_errors():
+    with pytest.raises(ValueError):
+        parse_polygons({"type": "Point", "coordinates": [139.7, 35.6]})
+    with pytest.raises(ValueError):
+        parse_polygons({"type": "Polygon", "coordinates": [[[139.7, 35.6], [139.8, 35.6], [139.7, 35.6]]]})
+    with pytest.raises(ValueError):
+        parse_lines({"type": "LineString", "coordinates": [[139.7, 95.0], [139.8, 35.6]]})
+    # 日本の範囲の外・長すぎる線・同じ緯度を横切る辺が多すぎる多角形
+    with pytest.raises(ValueError):
+        parse_lines({"type": "LineString", "coordinates": [[139.7, 35.6], [139.7, 89.0]]})
+    with pytest.raises(ValueError):
+        parse_lines({"type": "LineString", "coordinates": [[123, 21], [153, 45]] * 10})
+    zigzag = [[135 + 5 * k / 100, 35.0 if k % 2 else 35.5] for k in range(100)] + [[140.0, 34.0]]
+    with pytest.raises(ValueError):
+        parse_polygons({"type": "Polygon", "coordinates": [zigzag]})
+    feature = {"type": "Feature", "properties": {}, "geometry": STAR}
+    assert len(parse_polygons(feature)) == 1
+
+
+def test_search_within_and_along_match_sql(db):
+    conditions = {"facility_types": [2], "specialty": "内科"}
+    rows = search.filter_facilities(
+        db, db.query(Facility.id, Facility.latitude, Facility.longitude), **conditions,
+    ).order_by(Facility.id).all()
+    rows = [r for r in rows if r.latitude is not None]
+
+    inside = [r.id for r in rows if _reference_contains(STAR["coordinates"], r.latitude, r.longitude)]
+    facilities, total = search.search_facilities_within(db, parse_polygons(STAR), page=2, per_page=10, **conditions)
+    assert total == len(inside)
+    assert [f.id for f in facilities] == inside[10:20]
+
+    lines = parse_lines(ROUTE)
+    near = [r.id for r in rows if _line_distance(lines, r.latitude, r.longitude) <= 2.0]
+    results, total = search.search_facilities_along(db, lines, 2.0, per_page=1000, **conditions)
+    assert total == len(near)
+    assert [f.id for f, _ in results] == near
+    assert all(d <= 2.0 for _, d in results)
+
+
+def test_kaigo_within_matches_sql():
+    kaigo_db = KaigoSessionLocal()
+    try:
+        rows = kaigo_db.query(
+            KaigoFacility.id, KaigoFacility.service_code, KaigoFacility.latitude, KaigoFacility.longitude,
+        ).order_by(KaigoFacility.id, KaigoFacility.service_code).all()
+        inside = [
+            (r.id, r.service_code) for r in rows
+            if r.latitude is not None and _reference_contains(STAR["coordinates"], r.latitude, r.longitude)
+        ]
+        facilities, total = kaigo_search.search_kaigo_within(kaigo_db, parse_polygons(STAR), per_page=1000)
+        assert total == len(inside)
+        assert [(f.id, f.service_code) for f in facilities] == inside
+    finally:
+        kaigo_db.close()
+
+
+def test_routes():
+    r = client.post("/api/v1/facilities/within", json={"geometry": STAR, "type": [1, 2], "per_page": 5})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["pagination"]["total"] > 0 and len(body["data"]) <= 5
+
+    r = client.post("/api/v1/facilities/along", json={"line": {"type": "Feature", "geometry": ROUTE}, "buffer": 0.5})
+    assert r.status_code == 200
+    assert all(row["distance_km"] <= 0.5 for row in r.json()["data"])
+
+    r = client.post("/api/v1/kaigo/along", json={"line": ROUTE, "buffer": 1, "service": "訪問系"})
+    assert r.status_code == 200
+    assert all(row["distance_km"] <= 1 for row in r.json()["data"])
+
+    assert client.post("/api/v1/kaigo/within", json={"geometry": ROUTE}).status_code == 422
+    assert client.post("/api/v1/facilities/along", json={"line": ROUTE, "buffer": 100}).status_code == 422
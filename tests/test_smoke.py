@@ -1,7 +1,16 @@
 """Smoke tests — 全エンドポイントが200を返すことを確認"""
+import csv
+import gzip
+import io
+import json
+
 import pytest
 from fastapi.testclient import TestClient
+from api import cache
+from api.database import SessionLocal, KaigoSessionLocal
 from api.main import app
+from api.models import Facility
+from api.services import export, kaigo_search
 
 client = TestClient(app)
 
@@ -36,6 +45,36 @@ class TestHealthAndMeta:
         assert data["@type"] == "dcat:Catalog"
         assert len(data["dcat:dataset"]) > 0
 
+    @pytest.mark.parametrize("path", [
+        "/api/v1/stats", "/api/v1/prefectures", "/api/v1/specialities",
+        "/api/v1/catalog", "/api/v1/kaigo/services", "/api/v1/kaigo/stats",
+    ])
+    def test_cached_etag(self, path):
+        r = client.get(path)
+        assert r.status_code == 200
+        assert "max-age" in r.headers["cache-control"]
+        etag = r.headers["etag"]
+
+        r = client.get(path, headers={"If-None-Match": etag})
+        assert r.status_code == 304
+        assert r.headers["etag"] == etag
+
+    def test_specialities_category(self):
+        all_specs = client.get("/api/v1/specialities").json()
+        category = next(s["category"] for s in all_specs if s["category"])
+        r = client.get("/api/v1/specialities", params={"category": category})
+        assert r.status_code == 200
+        assert r.json() == [s for s in all_specs if s["category"] == category]
+
+    def test_specialities_unknown_category(self):
+        client.get("/api/v1/specialities")   # カテゴリの判定に使う絞り込み無しの一覧
+        before = len(cache._entries)
+        for i in range(20):
+            r = client.get("/api/v1/specialities", params={"category": f"存在しない{i}"})
+            assert r.status_code == 200
+            assert r.json() == []
+        assert len(cache._entries) == before
+
     def test_openapi(self):
         r = client.get("/openapi.json")
         assert r.status_code == 200
@@ -77,6 +116,26 @@ class TestFacilitySearch:
         assert r.status_code == 200
         # 件数は時間帯による。200が返ればOK
 
+    def test_facets(self):
+        r = client.get("/api/v1/facilities?prefecture=13&facets=type,city,specialty&facet_limit=500").json()
+        facets = r["facets"]
+        assert sum(f["count"] for f in facets["type"]) == r["pagination"]["total"]
+        assert sum(f["count"] for f in facets["city"]) == r["pagination"]["total"]
+        for f in facets["type"]:
+            total = client.get(f"/api/v1/facilities?prefecture=13&type={f['value']}").json()["pagination"]["total"]
+            assert f["count"] == total
+        top = facets["specialty"][0]
+        total = client.get(f"/api/v1/facilities?prefecture=13&specialty={top['value']}").json()["pagination"]["total"]
+        assert top["count"] == total
+        assert client.get("/api/v1/facilities").json()["facets"] is None
+
+    def test_facets_open_now(self):
+        r = client.get("/api/v1/facilities?open_now=true&facets=type").json()
+        assert sum(f["count"] for f in r["facets"]["type"]) == r["pagination"]["total"]
+
+    def test_facets_invalid(self):
+        assert client.get("/api/v1/facilities?facets=type,foo").status_code == 422
+
     def test_pagination(self):
         r = client.get("/api/v1/facilities?per_page=5&page=2")
         assert r.status_code == 200
@@ -103,6 +162,143 @@ class TestNearbySearch:
         r = client.get("/api/v1/facilities/nearby?lat=35.658&lng=139.702&radius=1&specialty=内科")
         assert r.status_code == 200
 
+    def test_nearby_batch(self):
+        points = [{"lat": 35.658, "lng": 139.702}, {"lat": 35.690, "lng": 139.700}, {"lat": 26.2, "lng": 127.7}]
+        r = client.post("/api/v1/facilities/nearby:batch", json={"points": points, "radius": 1, "limit": 5})
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in r.text.splitlines()]
+        assert [line["index"] for line in lines] == [0, 1, 2]
+        assert lines[2]["results"] == []
+
+        single = client.get("/api/v1/facilities/nearby?lat=35.658&lng=139.702&radius=1&limit=5").json()
+        assert [f["distance_km"] for f in lines[0]["results"]] == [f["distance_km"] for f in single]
+
+    def test_nearby_batch_outside_japan(self):
+        points = [{"lat": 35.658, "lng": 139.702}, {"lat": 89.0, "lng": 139.7}]
+        r = client.post("/api/v1/facilities/nearby:batch", json={"points": points, "radius": 50})
+        assert r.status_code == 422
+
+    def test_nearest_by_type(self):
+        r = client.get("/api/v1/facilities/nearest-by-type?lat=35.658&lng=139.702")
+        assert r.status_code == 200
+        results = r.json()
+        assert results
+        types = [x["facility_type"] for x in results]
+        assert types == sorted(set(types))
+        for x in results:
+            nearest = client.get(
+                f"/api/v1/facilities/nearby?lat=35.658&lng=139.702&radius=50&limit=1&type={x['facility_type']}"
+            ).json()[0]
+            assert x["facility"]["distance_km"] == nearest["distance_km"]
+
+    def test_nearest_by_type_outside_japan(self):
+        r = client.get("/api/v1/facilities/nearest-by-type?lat=85&lng=139.7&max_distance=200")
+        assert r.status_code == 422
+
+    def test_nearest_by_type_specialty(self):
+        r = client.get("/api/v1/facilities/nearest-by-type?lat=35.658&lng=139.702&type=1&type=2&specialty=内科")
+        assert r.status_code == 200
+        assert {x["facility_type"] for x in r.json()} <= {1, 2}
+
+    def test_nearby_all(self):
+        r = client.get("/api/v1/nearby/all?lat=35.658&lng=139.702&radius=3&limit=50")
+        assert r.status_code == 200
+        results = r.json()
+        assert {f["kind"] for f in results} == {"medical", "kaigo"}
+        dists = [f["distance_km"] for f in results]
+        assert dists == sorted(dists)
+
+    def test_nearby_all_kind(self):
+        r = client.get("/api/v1/nearby/all?lat=35.658&lng=139.702&radius=3&kind=kaigo")
+        assert r.status_code == 200
+        assert all(f["kind"] == "kaigo" and "service_code" in f for f in r.json())
+
+
+class TestMapClusters:
+    BBOX = "122,20,154,46"
+
+    def test_clusters_cover_all_points(self):
+        coarse = client.get(f"/api/v1/map/clusters?bbox={self.BBOX}&zoom=4").json()
+        fine = client.get(f"/api/v1/map/clusters?bbox={self.BBOX}&zoom=15").json()
+        assert coarse["total"] == fine["total"] > 0
+        assert len(coarse["clusters"]) < len(fine["clusters"])
+        assert all(c["id"] for c in fine["clusters"] if c["count"] == 1)
+
+    def test_clusters_type_filter(self):
+        all_types = client.get(f"/api/v1/map/clusters?bbox={self.BBOX}&zoom=8").json()["total"]
+        by_type = sum(
+            client.get(f"/api/v1/map/clusters?bbox={self.BBOX}&zoom=8&type={t}").json()["total"]
+            for t in range(1, 6)
+        )
+        assert all_types == by_type
+
+    def test_kaigo_clusters(self):
+        r = client.get(f"/api/v1/map/kaigo/clusters?bbox={self.BBOX}&zoom=10&service=訪問系")
+        assert r.status_code == 200
+        assert r.json()["total"] > 0
+
+    def test_clusters_invalid_bbox(self):
+        assert client.get("/api/v1/map/clusters?bbox=140,36,139,35&zoom=5").status_code == 400
+        assert client.get("/api/v1/map/clusters?bbox=abc&zoom=5").status_code == 422
+
+
+class TestExport:
+    def test_ndjson_matches_search(self):
+        total = client.get("/api/v1/facilities?prefecture=13&type=2").json()["pagination"]["total"]
+        r = client.get("/api/v1/export?prefecture=13&type=2")
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "application/x-ndjson"
+        assert "attachment" in r.headers["content-disposition"]
+        rows = [json.loads(line) for line in r.text.splitlines()]
+        assert len(rows) == total > 0
+        assert all(row["prefecture_code"] == "13" and row["facility_type"] == 2 for row in rows)
+
+    def test_csv(self):
+        r = client.get("/api/v1/export?format=csv&prefecture=13")
+        assert r.content.startswith(b"\xef\xbb\xbf")
+        lines = list(csv.reader(io.StringIO(r.content.decode("utf-8-sig"))))
+        assert lines[0][:3] == ["id", "facility_type", "name"]
+        total = client.get("/api/v1/facilities?prefecture=13").json()["pagination"]["total"]
+        assert len(lines) - 1 == total
+
+    def test_keyword_not_truncated(self):
+        # フリーワードのFTSヒットを検索（1000件）のように打ち切らない
+        db = SessionLocal()
+        try:
+            expected = db.query(Facility).filter(Facility.name.contains("クリニック")).count()
+        finally:
+            db.close()
+        r = client.get("/api/v1/export?q=クリニック")
+        rows = [json.loads(line) for line in r.text.splitlines()]
+        assert len(rows) == expected
+        assert all("クリニック" in row["name"] for row in rows)
+
+    def test_geojson_gzip(self):
+        r = client.get("/api/v1/export?dataset=kaigo&format=geojson&gzip=true&service=訪問系")
+        assert r.headers["content-type"] == "application/gzip"
+        assert r.headers["content-disposition"].endswith('.geojson.gz"')
+        body = json.loads(gzip.decompress(r.content))
+        assert body["type"] == "FeatureCollection"
+        total = client.get("/api/v1/kaigo?service=訪問系").json()["pagination"]["total"]
+        assert len(body["features"]) == total > 0
+        located = [f for f in body["features"] if f["geometry"] is not None]
+        assert located
+        assert located[0]["geometry"]["type"] == "Point" and len(located[0]["geometry"]["coordinates"]) == 2
+        for feature in body["features"]:
+            assert feature["type"] == "Feature" and "latitude" not in feature["properties"]
+
+    def test_geojson_null_geometry(self):
+        # 座標の無い行は geometry: null の Feature（properties は他の行と同じ）
+        rows = [
+            {"id": "a", "name": "座標あり", "latitude": 35.0, "longitude": 139.0},
+            {"id": "b", "name": "座標なし", "latitude": None, "longitude": None},
+        ]
+        body = json.loads(b"".join(export._geojson(iter(rows), ["id", "name", "latitude", "longitude"])))
+        located, missing = body["features"]
+        assert located["geometry"] == {"type": "Point", "coordinates": [139.0, 35.0]}
+        assert missing == {"type": "Feature", "geometry": None, "properties": {"id": "b", "name": "座標なし"}}
+
 
 class TestFacilityDetail:
     def test_detail(self):
@@ -120,3 +316,85 @@ class TestFacilityDetail:
     def test_detail_not_found(self):
         r = client.get("/api/v1/facilities/0000000000000")
         assert r.status_code == 404
+
+
+class TestKaigo:
+    def test_kaigo_search(self):
+        r = client.get("/api/v1/kaigo?per_page=3")
+        assert r.status_code == 200
+        assert r.json()["pagination"]["total"] > 0
+
+    def test_kaigo_facets(self):
+        r = client.get("/api/v1/kaigo?facets=service,prefecture,available_day").json()
+        facets = r["facets"]
+        assert sum(f["count"] for f in facets["service"]) == r["pagination"]["total"]
+        sat = next(f for f in facets["available_day"] if f["value"] == "sat")
+        assert sat["count"] == client.get("/api/v1/kaigo?available_day=sat").json()["pagination"]["total"]
+
+    def test_kaigo_detail(self):
+        r = client.get("/api/v1/kaigo?per_page=1")
+        fac_id = r.json()["data"][0]["id"]
+
+        r = client.get(f"/api/v1/kaigo/{fac_id}")
+        assert r.status_code == 200
+        data = r.json()
+        assert len(data) > 0
+        assert all(d["id"] == fac_id for d in data)
+
+    def test_kaigo_detail_not_found(self):
+        r = client.get("/api/v1/kaigo/0000000000")
+        assert r.status_code == 404
+
+    def test_kaigo_available_days(self):
+        sat = client.get("/api/v1/kaigo?available_day=sat&per_page=100").json()
+        both = client.get("/api/v1/kaigo?available_day=sat,sun&per_page=100").json()
+        assert 0 < both["pagination"]["total"] <= sat["pagination"]["total"]
+        for item in both["data"]:
+            assert item["available_days"]["sat"] and item["available_days"]["sun"]
+
+    def test_kaigo_service_category(self):
+        r = client.get("/api/v1/kaigo?service=訪問系&per_page=100")
+        assert r.status_code == 200
+        data = r.json()["data"]
+        assert data and {d["service_code"] for d in data} <= {"110", "120", "130", "140", "710", "720"}
+
+        # 名称は部分一致なので「夜間対応型訪問介護」なども含む（コード指定の件数以上）
+        services = client.get("/api/v1/kaigo/services").json()
+        codes = {s["code"] for s in services if "訪問介護" in s["name"]}
+        by_name = client.get("/api/v1/kaigo?service=訪問介護&per_page=1").json()["pagination"]["total"]
+        totals = {code: client.get(f"/api/v1/kaigo?service={code}&per_page=1").json()["pagination"]["total"]
+                  for code in codes}
+        assert by_name >= sum(totals.values()) >= totals["110"] > 0
+
+    def test_kaigo_service_terms_follow_data_version(self, monkeypatch):
+        db = KaigoSessionLocal()
+        try:
+            terms = kaigo_search.get_service_terms(db)
+            assert kaigo_search.get_service_terms(db) is terms
+            # 再インポート後（データバージョンが変わったら）は作り直す
+            monkeypatch.setattr(kaigo_search, "engine_version", lambda engine: "reimported")
+            rebuilt = kaigo_search.get_service_terms(db)
+            assert rebuilt is not terms and rebuilt == terms
+        finally:
+            db.close()
+
+    def test_kaigo_available_days_invalid(self):
+        r = client.get("/api/v1/kaigo?available_day=someday")
+        assert r.status_code == 422
+
+
+class TestFastJSON:
+    """FAST_JSON 経路が通常経路と同じJSONを返すこと"""
+
+    @pytest.mark.parametrize("path", [
+        "/api/v1/facilities?per_page=50",
+        "/api/v1/facilities/nearby?lat=35.658&lng=139.702&radius=1",
+        "/api/v1/kaigo?per_page=50",
+        "/api/v1/kaigo/nearby?lat=35.658&lng=139.702&radius=1",
+    ])
+    def test_same_payload(self, path, monkeypatch):
+        from api.routes import facilities, kaigo
+        expected = client.get(path).json()
+        monkeypatch.setattr(facilities, "FAST_JSON", True)
+        monkeypatch.setattr(kaigo, "FAST_JSON", True)
+        assert client.get(path).json() == expected
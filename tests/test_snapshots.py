@@ -0,0 +1,65 @@
+"""列指向スナップショット（Parquet）のテスト — pyarrow が無ければスキップ"""
+import hashlib
+import json
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from api.database import SessionLocal, KaigoSessionLocal
+from api.models import Facility, Specialty, HospitalBed
+from api.services.schedule import load_schedule, to_minutes
+from api.services.snapshots import build_snapshots, load_manifest, MANIFEST_NAME
+
+
+@pytest.fixture(scope="module")
+def snapshot_dir(tmp_path_factory):
+    out = tmp_path_factory.mktemp("snapshots")
+    db, kaigo_db = SessionLocal(), KaigoSessionLocal()
+    try:
+        build_snapshots(db, kaigo_db, out)
+    finally:
+        db.close()
+        kaigo_db.close()
+    return out
+
+
+def test_manifest(snapshot_dir):
+    manifest = load_manifest(snapshot_dir)
+    assert manifest == json.loads((snapshot_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    files = {f["name"]: f for f in manifest["files"]}
+    assert set(files) == {"facilities", "specialities", "beds", "kaigo"}
+
+    db = SessionLocal()
+    try:
+        assert files["facilities"]["rows"] == db.query(Facility).count()
+        assert files["specialities"]["rows"] == db.query(Specialty).count()
+        assert files["beds"]["rows"] == db.query(HospitalBed).count()
+    finally:
+        db.close()
+
+    for f in files.values():
+        path = snapshot_dir / f["path"]
+        assert hashlib.sha256(path.read_bytes()).hexdigest() == f["sha256"]
+        assert pq.read_metadata(path).num_rows == f["rows"]
+        assert pq.read_schema(path).names == [c["name"] for c in f["columns"]]
+
+
+def test_specialities_schedule_columns(snapshot_dir):
+    table = pq.read_table(snapshot_dir / "specialities.parquet").slice(0, 50).to_pylist()
+    db = SessionLocal()
+    try:
+        for row in table:
+            sp = (
+                db.query(Specialty)
+                .filter(Specialty.facility_id == row["facility_id"], Specialty.specialty_code == row["specialty_code"],
+                        Specialty.time_slot == row["time_slot"])
+                .first()
+            )
+            schedule = load_schedule(sp.schedule, sp.schedule_packed) or {}
+            for day in ("mon", "sat", "hol"):
+                slot = schedule.get(day)
+                assert row[f"{day}_start"] == (to_minutes(slot["start"]) if slot else None)
+                assert row[f"{day}_end"] == (to_minutes(slot["end"]) if slot else None)
+    finally:
+        db.close()
@@ -0,0 +1,54 @@
+"""空間インデックス（格子）の単体テスト — 総当たりと同じ結果になること"""
+import random
+
+from api.services.geo import haversine
+from api.services.spatial import SpatialIndex
+
+
+def _rows(n=3000, seed=0):
+    rnd = random.Random(seed)
+    return [
+        (f"{i:013d}", rnd.choice([1, 2, 3, 5]), 35.5 + rnd.random() * 0.4, 139.5 + rnd.random() * 0.4)
+        for i in range(n)
+    ]
+
+
+def _brute(rows, lat, lng, k, max_km, types=None):
+    hits = sorted(
+        (haversine(lat, lng, r[2], r[3]), r[0]) for r in rows
+        if (not types or r[1] in types) and haversine(lat, lng, r[2], r[3]) <= max_km
+    )
+    return hits[:k]
+
+
+def test_nearest_matches_brute_force():
+    rows = _rows()
+    index = SpatialIndex(rows)
+    rnd = random.Random(1)
+    for _ in range(50):
+        lat, lng = 35.5 + rnd.random() * 0.4, 139.5 + rnd.random() * 0.4
+        assert index.nearest(lat, lng, 10, 3.0) == _brute(rows, lat, lng, 10, 3.0)
+        assert index.nearest(lat, lng, 5, 2.0, types=[2, 5]) == _brute(rows, lat, lng, 5, 2.0, {2, 5})
+
+
+def test_nearest_by_type_far_point():
+    rows = _rows(200)
+    index = SpatialIndex(rows)
+    # データ範囲の外（約30km先）からでも半径内なら見つかる
+    result = index.nearest_by_type(35.45, 139.2, 50.0)
+    assert set(result) == {1, 2, 3, 5}
+    for facility_type, hit in result.items():
+        assert hit == _brute(rows, 35.45, 139.2, 1, 50.0, {facility_type})[0]
+    assert index.nearest_by_type(35.45, 139.2, 1.0) == {}
+
+
+def test_far_and_high_latitude_points():
+    rows = _rows(500)
+    index = SpatialIndex(rows)
+    # データの範囲から遠い地点・高緯度でもリングはデータのあるセルまでしか広げない
+    assert index.nearest(89.0, 139.0, 5, 50.0) == []
+    assert index.nearest(-89.0, -179.0, 3, 20000.0) == _brute(rows, -89.0, -179.0, 3, 20000.0)
+    assert index.nearest(35.7, 141.0, 3, 200.0) == _brute(rows, 35.7, 141.0, 3, 200.0)
+    partition = index.partitions[1]
+    expected = sum(1 for r in rows if r[1] == 1 and haversine(60.0, 139.7, r[2], r[3]) <= 3000.0)
+    assert partition.count_within(60.0, 139.7, 3000.0) == expected